@@ -0,0 +1,190 @@
+"""
+多Key / 多接口负载均衡
+每个后端是一组 (接口地址, API Key, 模型)，各自有独立的请求间隔和健康状态：
+- 请求发往最早可用（余量最多）的健康后端
+- 连续失败达到阈值或返回429的后端进入冷却期，期间请求自动转到其他后端
+- summary() 给出各后端的请求数、成功率、平均延迟和吞吐，用于运行报告
+- 启用跨进程共享限速（rate_limiter，命令行入口默认启用）时，时间槽和429冷却从同一台机器上所有进程共用的表中预约
+
+后端配置文件示例（backends.json）：
+{
+  "backends": [
+    {"name": "key-a", "url": "https://api.deepseek.com/v1/chat/completions", "key": "sk-...", "model": "deepseek-chat", "min_interval": 0.1},
+    {"name": "key-b", "url": "https://api.deepseek.com/v1/chat/completions", "key": "sk-...", "model": "deepseek-chat", "min_interval": 0.1}
+  ]
+}
+"""
+
+import json
+import threading
+import time
+
+import rate_limiter
+from tracing import span, add_span, enabled as tracing_enabled
+
+class Backend:
+    def __init__(self, url, key, model="deepseek-chat", min_interval=0.1, name=None):
+        self.url = url
+        self.key = key
+        self.model = model
+        self.min_interval = min_interval
+        self.name = name or f"{model}@{url}"
+        self.next_slot = 0.0          # 下一次允许发请求的时间（time.monotonic）
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.stats = {"requests": 0, "successes": 0, "failures": 0, "latency": 0.0, "wait": 0.0}
+
+    def headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.key:
+            headers["Authorization"] = f"Bearer {self.key}"
+        return headers
+
+class NoHealthyBackend(Exception):
+    """
+    所有后端都处于冷却期
+    """
+
+class BackendPool:
+    def __init__(self, backends, failure_threshold=3, cooldown=30.0):
+        if not backends:
+            raise ValueError("至少需要配置一个后端")
+        self.backends = backends
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+    def total_rate(self):
+        """
+        所有后端合计的最大请求速率（次/秒）
+        """
+        return sum(1 / backend.min_interval if backend.min_interval > 0 else float("inf")
+                   for backend in self.backends)
+
+    def acquire(self):
+        """
+        选出可最早发送请求的健康后端并预约时间槽，必要时等待到该时间槽
+        """
+        lock_start = time.perf_counter()
+        with self.lock:
+            add_span("pool.lock_wait", lock_start, time.perf_counter())
+            now = time.monotonic()
+            healthy = [backend for backend in self.backends if backend.cooldown_until <= now]
+            if not healthy:
+                # 全部在冷却中时，选冷却最早结束的后端
+                healthy = [min(self.backends, key=lambda backend: backend.cooldown_until)]
+            backend = min(healthy, key=lambda b: (max(b.next_slot, b.cooldown_until, now), b.in_flight))
+            slot = max(backend.next_slot, backend.cooldown_until, now)
+            backend.next_slot = slot + backend.min_interval
+            backend.in_flight += 1
+            backend.stats["requests"] += 1
+        wait_time = slot - now
+        limiter = rate_limiter.limiter
+        if limiter is not None and backend.min_interval > 0:
+            # 同时遵守全机共享的时间槽（其他进程的请求也计入同一个Key的限额）
+            shared_wait = limiter.reserve(backend)
+            if shared_wait is not None:
+                wait_time = max(wait_time, shared_wait - (time.monotonic() - now))
+        if wait_time > 0:
+            with span("pool.slot_wait", backend=backend.name):
+                time.sleep(wait_time)
+        with self.lock:
+            backend.stats["wait"] += wait_time
+        return backend
+
+    def report_success(self, backend, latency):
+        with self.lock:
+            backend.in_flight -= 1
+            backend.consecutive_failures = 0
+            backend.stats["successes"] += 1
+            backend.stats["latency"] += latency
+
+    def report_failure(self, backend, rate_limited=False, retry_after=None):
+        with self.lock:
+            backend.in_flight -= 1
+            backend.consecutive_failures += 1
+            backend.stats["failures"] += 1
+            if rate_limited or backend.consecutive_failures >= self.failure_threshold:
+                backend.cooldown_until = time.monotonic() + (retry_after or self.cooldown)
+        if rate_limited and rate_limiter.limiter is not None and backend.min_interval > 0:
+            rate_limiter.limiter.cooldown(backend, retry_after or self.cooldown)
+
+    def post(self, session, data, timeout=30, stream=False, **kwargs):
+        """
+        通过负载均衡发送一次聊天请求，data 中的 model 由所选后端决定
+        失败时抛出异常，由调用方重试（重试时会自动换到其他健康后端）
+        stream=True 时收到响应头即返回，响应体由调用方逐行读取，延迟统计为首字节时间
+        """
+        backend = self.acquire()
+        payload = dict(data, model=backend.model)
+        start_time = time.perf_counter()
+        try:
+            if stream:
+                response = session.post(backend.url, headers=backend.headers(), json=payload, timeout=timeout,
+                                        stream=True, **kwargs)
+                add_span("http.ttfb", start_time, time.perf_counter(), backend=backend.name)
+            elif tracing_enabled():
+                # 追踪时先只等到响应头（首字节），再单独计时读取响应体
+                response = session.post(backend.url, headers=backend.headers(), json=payload, timeout=timeout,
+                                        stream=True, **kwargs)
+                headers_at = time.perf_counter()
+                add_span("http.ttfb", start_time, headers_at, backend=backend.name)
+                response.content
+                add_span("http.body", headers_at, time.perf_counter(), backend=backend.name)
+            else:
+                response = session.post(backend.url, headers=backend.headers(), json=payload, timeout=timeout, **kwargs)
+            response.raise_for_status()
+        except Exception as e:
+            response_obj = getattr(e, "response", None)
+            status = getattr(response_obj, "status_code", None)
+            retry_after = None
+            if response_obj is not None:
+                try:
+                    retry_after = float(response_obj.headers.get("Retry-After"))
+                except (TypeError, ValueError):
+                    retry_after = None
+            self.report_failure(backend, rate_limited=(status == 429), retry_after=retry_after)
+            raise
+        self.report_success(backend, time.perf_counter() - start_time)
+        return response
+
+    def summary(self):
+        """
+        各后端的运行统计
+        """
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        report = {}
+        for backend in self.backends:
+            stats = backend.stats
+            report[backend.name] = {
+                "请求数": stats["requests"],
+                "成功数": stats["successes"],
+                "失败数": stats["failures"],
+                "平均延迟(秒)": round(stats["latency"] / stats["successes"], 3) if stats["successes"] else None,
+                "累计排队等待(秒)": round(stats["wait"], 2),
+                "吞吐(次/秒)": round(stats["successes"] / elapsed, 2),
+                "状态": "冷却中" if backend.cooldown_until > time.monotonic() else "正常",
+            }
+        return report
+
+def load_backend_pool(filename, default_interval=0.1):
+    """
+    从JSON配置文件创建后端池
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    backends = [
+        Backend(item["url"], item.get("key", ""), item.get("model", "deepseek-chat"),
+                item.get("min_interval", default_interval), item.get("name"))
+        for item in config["backends"]
+    ]
+    return BackendPool(backends, config.get("failure_threshold", 3), config.get("cooldown", 30.0))
+
+def print_pool_summary(pool):
+    print(f"\n🔀 各后端运行统计:")
+    for name, stats in pool.summary().items():
+        details = ", ".join(f"{k}: {v}" for k, v in stats.items())
+        print(f"   {name} - {details}")
+    rate_limiter.print_limiter_summary()
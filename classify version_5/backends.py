@@ -0,0 +1,366 @@
+"""
+分类后端
+生成分类和逐条分类都通过后端完成，三种实现可以互相替换：
+- RemoteChatBackend：远程聊天API（DeepSeek 等），通过 api_pool 负载均衡
+- LocalOpenAIBackend：本地 OpenAI 兼容推理服务（如 llama.cpp server），使用本机CPU算力
+- OfflineBackend：纯Python离线分类，不发任何网络请求
+
+所有方法在请求失败时抛出异常，由调用方负责重试和兜底；后端内部已经重试过的失败抛出 RetriesExhausted，调用方不再重试
+
+聊天后端可开启流式分类（stream=True）：逐块解析 SSE 响应，一旦识别出完整的类别编号就关闭连接，
+不再等待模型在编号后追加的解释；每次分类从发起到得到类别编号的耗时记录在 label_latency 中
+"""
+
+import threading
+import time
+from collections import Counter
+
+from api_pool import Backend, BackendPool
+from prompts import (
+    DEFAULT_NUM2NAME, DEFAULT_NUM2DESC, build_categories_prompt, parse_categories_response,
+    build_classify_prompt, parse_category_code, match_category_prefix, build_batch_prompt, parse_batch_response,
+    build_multi_classify_prompt, parse_multi_response, category_confidence, build_refine_prompt,
+)
+from rules import build_rule_table, apply_rules
+from http_client import get_session, iter_sse_chunks
+from tracing import span, add_span, LatencyRecorder
+
+# llama.cpp server 默认监听地址
+DEFAULT_LOCAL_URL = "http://127.0.0.1:8080/v1/chat/completions"
+
+# 当前线程正在分类的名称的放弃时间（time.monotonic，截止时间模式下由 core.classify_single_item 设置），
+# 在后端内部重试的实现（如模型级联的升级请求）到点后不再等待重试
+request_limits = threading.local()
+
+def current_give_up_at():
+    return getattr(request_limits, "give_up_at", None)
+
+class RetriesExhausted(Exception):
+    """
+    后端内部已重试仍失败（如模型级联的升级请求），调用方直接兜底，不再重试
+    """
+
+class ClassifierBackend:
+    """
+    后端接口
+    """
+    name = "base"
+
+    def __init__(self):
+        # 收到响应中的 usage 时调用（用于Token预算统计）
+        self.usage_callback = None
+
+    def classify_name(self, name, num2name, num2desc):
+        """
+        返回类别编号（如'类别3'）
+        """
+        raise NotImplementedError
+
+    def classify_name_scored(self, name, num2name, num2desc):
+        """
+        返回：(类别编号, 置信度 0~1)，无法给出置信度时为 None（用于模型级联）
+        """
+        return self.classify_name(name, num2name, num2desc), None
+
+    def classify_batch(self, names, num2name, num2desc):
+        """
+        返回与 names 等长的类别编号列表，无法识别的位置为 None（内部已重试仍失败的位置可以是 RetriesExhausted）
+        """
+        return [self.classify_name(name, num2name, num2desc) for name in names]
+
+    def classify_multi(self, name, taxonomies):
+        """
+        返回名称在每个分类体系（[(num2name, num2desc)]）下的类别编号列表，无法识别的位置为 None
+        默认逐个体系分类，聊天后端在一次请求中完成
+        """
+        return [self.classify_name(name, num2name, num2desc) for num2name, num2desc in taxonomies]
+
+    def generate_categories(self, purchaser_names):
+        """
+        返回：编号到名称的映射、编号到解释的映射
+        """
+        raise NotImplementedError
+
+    def refine_categories(self, num2name, num2desc, issues, examples):
+        """
+        按质量评估发现的问题（issues）和问题类别的名称示例（{类别名称: [名称]}）修订分类
+        返回：修订后的编号到名称的映射、编号到解释的映射
+        """
+        raise NotImplementedError
+
+class ChatBackend(ClassifierBackend):
+    """
+    基于聊天补全接口的后端，子类只需实现 post_chat
+    """
+    def __init__(self, model="deepseek-chat", temperature=0.3, timeout=30, classify_max_tokens=None, stream=False):
+        super().__init__()
+        self.model = model
+        self.temperature = temperature
+        self.timeout = timeout
+        self.classify_max_tokens = classify_max_tokens
+        self.stream = stream
+        # 逐条分类从发起到得到类别编号的耗时（按 流式/非流式 分开统计）
+        self.label_latency = LatencyRecorder()
+        self.stream_stats = {"流式请求数": 0, "识别后提前关闭": 0}
+        self.stats_lock = threading.Lock()
+
+    def post_chat(self, data):
+        """
+        发送请求并返回响应JSON
+        """
+        raise NotImplementedError
+
+    def post_chat_stream(self, data):
+        """
+        发送流式请求，返回可逐行读取（iter_lines）并可提前关闭（close）的响应
+        """
+        raise NotImplementedError
+
+    def complete(self, prompt, max_tokens=None):
+        data = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature
+        }
+        if max_tokens:
+            data["max_tokens"] = max_tokens
+        response_json = self.post_chat(data)
+        if self.usage_callback is not None:
+            self.usage_callback(response_json.get('usage'))
+        with span("parse"):
+            return response_json['choices'][0]['message']['content'].strip()
+
+    def classify_name(self, name, num2name, num2desc):
+        start_time = time.perf_counter()
+        prompt = build_classify_prompt(name, num2name, num2desc)
+        if self.stream:
+            code = self.stream_category_code(prompt, num2name)
+        else:
+            content = self.complete(prompt, self.classify_max_tokens)
+            with span("parse"):
+                code = parse_category_code(content)
+        end_time = time.perf_counter()
+        add_span("time_to_label", start_time, end_time, stream=self.stream)
+        self.label_latency.record("流式" if self.stream else "非流式", end_time - start_time)
+        return code
+
+    def stream_category_code(self, prompt, num2name):
+        """
+        流式分类：边接收边解析，识别出完整的类别编号后立即关闭连接
+        提前关闭时收不到 usage，按本地估算的tokens计入预算
+        """
+        data = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if self.classify_max_tokens:
+            data["max_tokens"] = self.classify_max_tokens
+        response = self.post_chat_stream(data)
+        content = ""
+        chunks = 0
+        usage = None
+        code = None
+        try:
+            for delta, chunk_usage in iter_sse_chunks(response):
+                usage = chunk_usage or usage
+                content += delta
+                chunks += 1
+                with span("parse"):
+                    code = match_category_prefix(content, num2name)
+                if code is not None:
+                    break
+        finally:
+            response.close()
+        with self.stats_lock:
+            self.stream_stats["流式请求数"] += 1
+            if code is not None:
+                self.stream_stats["识别后提前关闭"] += 1
+        if usage is None:
+            from planner import estimate_tokens
+            prompt_tokens = estimate_tokens(prompt)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": chunks,
+                     "total_tokens": prompt_tokens + chunks}
+        if self.usage_callback is not None:
+            self.usage_callback(usage)
+        if code is not None:
+            return code
+        with span("parse"):
+            return parse_category_code(content)
+
+    def classify_name_scored(self, name, num2name, num2desc):
+        """
+        请求逐token的对数概率（logprobs），置信度为组成类别编号的token概率之积
+        """
+        data = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": build_classify_prompt(name, num2name, num2desc)}],
+            "temperature": self.temperature,
+            "logprobs": True,
+        }
+        if self.classify_max_tokens:
+            data["max_tokens"] = self.classify_max_tokens
+        response_json = self.post_chat(data)
+        if self.usage_callback is not None:
+            self.usage_callback(response_json.get('usage'))
+        with span("parse"):
+            choice = response_json['choices'][0]
+            code = parse_category_code(choice['message']['content'])
+            if code not in num2name:
+                return code, None
+            return code, category_confidence((choice.get('logprobs') or {}).get('content'), code, num2name)
+
+    def classify_batch(self, names, num2name, num2desc):
+        content = self.complete(build_batch_prompt(names, num2name, num2desc))
+        with span("parse", batch_size=len(names)):
+            index2num = parse_batch_response(content, len(names))
+        return [index2num.get(i) for i in range(len(names))]
+
+    def classify_multi(self, name, taxonomies):
+        max_tokens = self.classify_max_tokens * len(taxonomies) if self.classify_max_tokens else None
+        content = self.complete(build_multi_classify_prompt(name, taxonomies), max_tokens)
+        with span("parse", taxonomies=len(taxonomies)):
+            return parse_multi_response(content, taxonomies)
+
+    def generate_categories(self, purchaser_names):
+        return parse_categories_response(self.complete(build_categories_prompt(purchaser_names)))
+
+    def refine_categories(self, num2name, num2desc, issues, examples):
+        return parse_categories_response(self.complete(build_refine_prompt(num2name, num2desc, issues, examples)))
+
+class RemoteChatBackend(ChatBackend):
+    name = "remote"
+
+    def __init__(self, pool, session=None, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        # 不指定时使用全局session（首次请求时才创建）
+        self.session = session
+
+    def post_chat(self, data):
+        # 由后端池选择后端并控制请求频率，失败的后端会被暂时跳过
+        session = self.session or get_session()
+        return self.pool.post(session, data, timeout=self.timeout).json()
+
+    def post_chat_stream(self, data):
+        session = self.session or get_session()
+        return self.pool.post(session, data, timeout=self.timeout, stream=True)
+
+class LocalOpenAIBackend(RemoteChatBackend):
+    """
+    本地CPU推理服务：无需Key、不限速，单次推理较慢，因此超时更长、并限制分类输出长度
+    """
+    name = "local"
+
+    def __init__(self, session=None, url=DEFAULT_LOCAL_URL, model="local", timeout=120, classify_max_tokens=8):
+        pool = BackendPool([Backend(url, "", model, min_interval=0.0, name="local")])
+        super().__init__(pool, session, model=model, timeout=timeout, classify_max_tokens=classify_max_tokens)
+
+class OfflineBackend(ClassifierBackend):
+    """
+    纯Python离线分类：先匹配后缀规则，否则选择与名称共有字符二元组最多的类别（名称+描述），
+    多数类别共有的二元组（如"机构"）不参与匹配；没有任何重合或最高分并列时归为"其他"。生成分类时直接返回默认分类。
+    """
+    name = "offline"
+
+    def __init__(self):
+        super().__init__()
+        self.profiles = {}
+
+    @staticmethod
+    def bigrams(text):
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+
+    def _profile(self, num2name, num2desc):
+        key = tuple(num2name.items()) + tuple(num2desc.items())
+        profile = self.profiles.get(key)
+        if profile is None:
+            label2num = {label: num for num, label in num2name.items()}
+            other_num = label2num.get("其他")
+            category_grams = {
+                num: self.bigrams(num2name[num] + num2desc.get(num, ""))
+                for num in num2name if num != other_num
+            }
+            # 出现在超过三分之一类别中的二元组区分不了类别，只会让任何带"机构"的名称都匹配到第一个类别
+            frequency = Counter(gram for grams in category_grams.values() for gram in grams)
+            common = {gram for gram, count in frequency.items() if count > max(1, len(category_grams) / 3)}
+            category_grams = {num: grams - common for num, grams in category_grams.items()}
+            profile = (build_rule_table(num2name), label2num, other_num, category_grams)
+            self.profiles[key] = profile
+        return profile
+
+    def classify_name(self, name, num2name, num2desc):
+        rule_table, label2num, other_num, category_grams = self._profile(num2name, num2desc)
+        label = apply_rules(name, rule_table)
+        if label is not None:
+            return label2num[label]
+        return self._closest_category(name, other_num, category_grams)
+
+    def classify_name_scored(self, name, num2name, num2desc):
+        """
+        命中后缀规则时置信度为1，字符二元组匹配的结果不给出置信度
+        """
+        rule_table, label2num, other_num, category_grams = self._profile(num2name, num2desc)
+        label = apply_rules(name, rule_table)
+        if label is not None:
+            return label2num[label], 1.0
+        return self._closest_category(name, other_num, category_grams), None
+
+    def _closest_category(self, name, other_num, category_grams):
+        name_grams = self.bigrams(name)
+        scores = sorted(((len(name_grams & grams), num) for num, grams in category_grams.items()),
+                        key=lambda item: item[0], reverse=True)
+        if not scores or scores[0][0] == 0:
+            return other_num
+        # 最高分并列时无法判断，归为"其他"
+        if len(scores) > 1 and scores[1][0] == scores[0][0]:
+            return other_num
+        return scores[0][1]
+
+    def generate_categories(self, purchaser_names):
+        return dict(DEFAULT_NUM2NAME), dict(DEFAULT_NUM2DESC)
+
+    def refine_categories(self, num2name, num2desc, issues, examples):
+        # 离线后端无法修订分类，原样返回
+        return dict(num2name), dict(num2desc)
+
+BACKEND_KINDS = ("remote", "local", "offline")
+
+def enable_streaming(backend):
+    """
+    为聊天后端开启流式分类；离线后端不发请求，返回 False
+    """
+    if not isinstance(backend, ChatBackend):
+        return False
+    backend.stream = True
+    return True
+
+def print_label_latency(backend):
+    """
+    打印逐条分类从发起到得到类别编号的耗时分位数（没有记录时不打印）
+    """
+    recorder = getattr(backend, "label_latency", None)
+    summary = recorder.summary() if recorder is not None else {}
+    if not summary:
+        return
+    print(f"\n⏱️ 逐条分类出类别耗时:")
+    for mode, stats in summary.items():
+        details = ", ".join(f"{k}: {v}" for k, v in stats.items())
+        print(f"   {mode} - {details}")
+    if getattr(backend, "stream_stats", {}).get("流式请求数"):
+        details = ", ".join(f"{k}: {v}" for k, v in backend.stream_stats.items())
+        print(f"   {details}")
+
+def create_backend(kind, pool=None, session=None, local_url=DEFAULT_LOCAL_URL, local_model="local"):
+    """
+    按名称创建后端：remote / local / offline
+    """
+    if kind == "remote":
+        return RemoteChatBackend(pool, session)
+    if kind == "local":
+        return LocalOpenAIBackend(session, local_url, local_model)
+    if kind == "offline":
+        return OfflineBackend()
+    raise ValueError(f"未知的后端类型: {kind}（可选 {', '.join(BACKEND_KINDS)}）")
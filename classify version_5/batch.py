@@ -0,0 +1,318 @@
+"""
+批量无交互分类模式
+一个进程内依次处理多个输入文件，复用HTTP会话、请求频率控制和分类结果缓存，
+结束时输出一份汇总报告
+"""
+
+import glob
+import json
+import os
+import time
+
+from data_io import load_input_table
+import core
+import rate_limiter
+from core import (
+    load_categories_from_json, classify_to_file, choose_max_workers,
+    load_result_cache, save_result_cache, run_stats, result_cache, cache_lock, get_taxonomy_key,
+)
+from classify import evaluate_final_classification, print_final_report, plan_from_args, read_priorities
+from planner import print_plan_report
+from rules import build_rule_table
+from budget import BudgetExceeded
+from tracing import span
+from labels import LabelCodes
+from deadline import start_deadline
+from cascade import CascadeBackend
+from multi_taxonomy import load_taxonomies, classify_multi_to_file, evaluate_taxonomies, print_taxonomy_reports
+
+# 只适用于单个文件交互运行的选项，批量模式下拒绝运行而不是悄悄忽略
+UNSUPPORTED_OPTIONS = ("reclassify", "previous_categories")
+
+DEFAULT_BATCH_CONFIG = {
+    "inputs": [],
+    "categories": "categories.json",
+    "taxonomies": None,
+    "output_dir": None,
+    "column": "Purchaser_Name",
+    "id_column": None,
+    "cache_file": None,
+    "report": None,
+    "output_format": None,
+    "excel_split": "sheets",
+    "rules": False,
+    "schedule": "frequency",
+    "priority_column": None,
+    "checkpoint_every": 0,
+    "deadline": None,
+    "deadline_reserve": None,
+}
+
+def load_batch_config(filename):
+    """
+    读取批量任务配置文件（JSON），未填写的字段使用默认值
+    """
+    config = dict(DEFAULT_BATCH_CONFIG)
+    if filename:
+        with open(filename, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    if isinstance(config["inputs"], str):
+        config["inputs"] = [config["inputs"]]
+    if isinstance(config["taxonomies"], str):
+        config["taxonomies"] = [config["taxonomies"]]
+    return config
+
+def merge_args_into_config(args):
+    """
+    命令行参数优先于配置文件
+    """
+    config = load_batch_config(args.config)
+    if args.inputs:
+        config["inputs"] = list(args.inputs)
+    for key in ("categories", "taxonomies", "output_dir", "column", "id_column", "cache_file", "report", "output_format", "excel_split",
+                "priority_column", "checkpoint_every", "deadline", "deadline_reserve"):
+        value = getattr(args, key)
+        if value:
+            config[key] = value
+    config["rules"] = config["rules"] or args.rules
+    if args.schedule != "frequency":
+        config["schedule"] = args.schedule
+    return config
+
+def expand_input_patterns(patterns):
+    """
+    展开通配符，去重并保持给定顺序
+    """
+    input_files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in input_files:
+                input_files.append(path)
+    return input_files
+
+def get_output_path(input_file, output_dir=None, output_format=None):
+    base, ext = os.path.splitext(os.path.basename(input_file))
+    if output_format:
+        ext = f".{output_format}"
+    directory = output_dir or os.path.dirname(input_file)
+    return os.path.join(directory, f"{base}_classified{ext or '.xlsx'}")
+
+def classify_file(input_file, num2name, num2desc, output_dir=None, column="Purchaser_Name",
+                  output_format=None, excel_split="sheets", id_column=None, rule_table=None,
+                  schedule="frequency", priority_column=None, checkpoint_every=0, checkpoint_callback=None,
+                  deadline=None, taxonomies=None):
+    """
+    对单个文件进行分类并保存，返回该文件的处理记录和分类结果
+    传入 taxonomies 时按多套分类体系一次分类，分类结果为 {列名: LabelCodes}
+    """
+    start_time = time.time()
+    requests_before, calls_before = run_stats["api_requests"], run_stats["api_calls"]
+    
+    with span("load_input", file=input_file):
+        df = load_input_table(input_file, column, id_column, [priority_column] if priority_column else [])
+    purchaser_names = df[column].tolist()
+    print(f"\n📁 {input_file}: {len(purchaser_names)} 条数据")
+    
+    output_file = get_output_path(input_file, output_dir, output_format)
+    if taxonomies:
+        with span("classify", file=input_file, rows=len(purchaser_names), taxonomies=len(taxonomies)):
+            all_classifications = classify_multi_to_file(df, purchaser_names, taxonomies, output_file,
+                                                         max_workers=choose_max_workers(len(purchaser_names)),
+                                                         excel_split=excel_split, schedule=schedule,
+                                                         priorities=read_priorities(df, priority_column))
+    else:
+        # 分类前已有结果的名称（来自之前的文件或缓存文件），用于统计本文件复用和新分类的行数
+        taxonomy_key = get_taxonomy_key(num2name, num2desc)
+        with cache_lock:
+            cached_before = set(result_cache.get(taxonomy_key, {}))
+        with span("classify", file=input_file, rows=len(purchaser_names)):
+            all_classifications = classify_to_file(df, purchaser_names, num2name, num2desc, output_file,
+                                                   max_workers=choose_max_workers(len(purchaser_names)),
+                                                   excel_split=excel_split, rule_table=rule_table,
+                                                   schedule=schedule, priorities=read_priorities(df, priority_column),
+                                                   checkpoint_every=checkpoint_every,
+                                                   checkpoint_callback=checkpoint_callback, deadline=deadline)
+    print(f"✅ 分类结果已保存到 {output_file}")
+    
+    entry = {
+        "输入文件": input_file,
+        "输出文件": output_file,
+        "数据量": len(purchaser_names),
+        "API请求数": run_stats["api_requests"] - requests_before,
+        "API请求次数(含重试)": run_stats["api_calls"] - calls_before,
+        "耗时(秒)": round(time.time() - start_time, 2),
+        "状态": "成功",
+    }
+    if not taxonomies:
+        # 新分类行：名称分类前没有结果、分类后写入了缓存（规则命中和兜底结果不写入缓存）
+        with cache_lock:
+            cached_after = result_cache.get(taxonomy_key, {})
+            entry["新增分类行数"] = sum(1 for name in purchaser_names
+                                  if name not in cached_before and name in cached_after)
+        entry["复用结果行数"] = sum(1 for name in purchaser_names if name in cached_before)
+    return entry, all_classifications
+
+def run_batch(input_files, num2name, num2desc, output_dir=None, column="Purchaser_Name",
+              output_format=None, excel_split="sheets", id_column=None, rule_table=None,
+              schedule="frequency", priority_column=None, checkpoint_every=0, checkpoint_callback=None,
+              deadline=None, taxonomies=None):
+    """
+    依次处理全部输入文件，单个文件失败不影响其余文件
+    传入 deadline 时所有文件共用同一个截止时间，到点后的文件全部使用本地兜底
+    传入 taxonomies 时按多套分类体系一次分类，质量评估按体系分别汇总
+    返回：汇总报告
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    start_time = time.time()
+    file_entries = []
+    combined_classifications = LabelCodes()
+    combined_by_taxonomy = {taxonomy.column: LabelCodes() for taxonomy in taxonomies or []}
+    for input_file in input_files:
+        try:
+            entry, classifications = classify_file(input_file, num2name, num2desc, output_dir, column,
+                                                   output_format, excel_split, id_column, rule_table,
+                                                   schedule, priority_column, checkpoint_every,
+                                                   checkpoint_callback, deadline, taxonomies)
+            if taxonomies:
+                for column, codes in classifications.items():
+                    combined_by_taxonomy[column].extend(codes)
+            else:
+                combined_classifications.extend(classifications)
+        except BudgetExceeded as e:
+            print(f"⛔ {e}，跳过剩余文件")
+            file_entries.append({"输入文件": input_file, "状态": f"预算耗尽: {e}"})
+            break
+        except Exception as e:
+            print(f"❌ 处理文件 {input_file} 失败: {e}")
+            entry = {"输入文件": input_file, "状态": f"失败: {e}"}
+        file_entries.append(entry)
+    
+    report = {
+        "文件数量": len(input_files),
+        "成功文件数": sum(1 for entry in file_entries if entry["状态"] == "成功"),
+        "总数据量": sum(entry.get("数据量", 0) for entry in file_entries),
+        "API请求数": run_stats["api_requests"],
+        "API请求次数(含重试)": run_stats["api_calls"],
+        "缓存命中数": run_stats["cache_hits"],
+        "规则命中数": run_stats["rule_hits"],
+        "请求失败数": run_stats["failed_calls"],
+        "预算兜底数": run_stats["budget_fallbacks"],
+        "截止时间兜底数": run_stats["deadline_fallbacks"],
+        "总耗时(秒)": round(time.time() - start_time, 2),
+        "文件明细": file_entries,
+    }
+    if deadline is not None:
+        report["截止时间"] = deadline.summary()
+    if combined_classifications:
+        report["整体分类评估"] = evaluate_final_classification(combined_classifications)
+    if taxonomies:
+        report["各分类体系评估"] = evaluate_taxonomies(combined_by_taxonomy)
+    return report
+
+def print_batch_report(report):
+    """
+    打印批量运行汇总报告
+    """
+    print("\n" + "="*60)
+    print("批量分类运行报告")
+    print("="*60)
+    for item, value in report.items():
+        if item not in ("文件明细", "整体分类评估", "各分类体系评估", "截止时间"):
+            print(f"   {item}: {value}")
+    
+    print(f"\n📁 文件明细:")
+    for entry in report["文件明细"]:
+        details = ", ".join(f"{k}: {v}" for k, v in entry.items() if k != "输入文件")
+        print(f"   {entry['输入文件']} - {details}")
+    
+    if "截止时间" in report:
+        print(f"\n⏰ 截止时间模式:")
+        for item, value in report["截止时间"].items():
+            print(f"   {item}: {value}")
+    print("="*60)
+    
+    if "整体分类评估" in report:
+        print_final_report(report["整体分类评估"])
+    if "各分类体系评估" in report:
+        print_taxonomy_reports(report["各分类体系评估"])
+
+def run_batch_from_args(args):
+    """
+    批量模式入口：合并配置、加载分类与缓存、处理全部文件并输出报告
+    """
+    unsupported = [option for option in UNSUPPORTED_OPTIONS if getattr(args, option, None)]
+    if unsupported:
+        options = ", ".join(f"--{option.replace('_', '-')}" for option in unsupported)
+        print(f"❌ 批量模式不支持 {options}，请对单个文件交互运行")
+        return None
+    
+    config = merge_args_into_config(args)
+    input_files = expand_input_patterns(config["inputs"])
+    if not input_files:
+        print("❌ 没有匹配到任何输入文件")
+        return None
+    
+    taxonomies = None
+    if config["taxonomies"]:
+        if args.dry_run:
+            print("❌ 多分类体系模式暂不支持试运行规划")
+            return None
+        if config["rules"] or config["deadline"] or config["checkpoint_every"]:
+            print("⚠️ 多分类体系模式不支持 rules / deadline / checkpoint_every，已忽略")
+        taxonomies = load_taxonomies(config["taxonomies"])
+        if taxonomies is None:
+            return None
+        num2name, num2desc = None, None
+    else:
+        num2name, num2desc = load_categories_from_json(config["categories"])
+        if num2name is None or num2desc is None:
+            return None
+    
+    if config["cache_file"]:
+        loaded = load_result_cache(config["cache_file"])
+        print(f"💾 已加载 {loaded} 条历史分类缓存")
+    
+    rule_table = build_rule_table(num2name) if config["rules"] and not taxonomies else None
+    
+    if args.dry_run:
+        purchaser_names = []
+        for input_file in input_files:
+            purchaser_names.extend(load_input_table(input_file, config["column"])[config["column"]].tolist())
+        plan = plan_from_args(purchaser_names, num2name, num2desc, args, args.probe_size)
+        plan["文件数量"] = len(input_files)
+        print_plan_report(plan)
+        return plan
+    
+    print(f"🚀 批量模式：共 {len(input_files)} 个文件")
+    checkpoint_callback = (lambda: save_result_cache(config["cache_file"])) if config["cache_file"] else None
+    report = run_batch(input_files, num2name, num2desc, config["output_dir"], config["column"],
+                       config["output_format"], config["excel_split"], config["id_column"], rule_table,
+                       config["schedule"], config["priority_column"], config["checkpoint_every"],
+                       checkpoint_callback,
+                       None if taxonomies else start_deadline(config["deadline"], config["deadline_reserve"]),
+                       taxonomies)
+    
+    if config["cache_file"]:
+        save_result_cache(config["cache_file"])
+        print(f"💾 分类缓存已保存到 {config['cache_file']}")
+    
+    report["各后端统计"] = core.api_pool.summary()
+    if rate_limiter.limiter is not None and rate_limiter.limiter.summary():
+        report["跨进程共享限速"] = rate_limiter.limiter.summary()
+    label_latency = getattr(core.backend, "label_latency", None)
+    if label_latency is not None and label_latency.summary():
+        report["逐条分类出类别耗时"] = label_latency.summary()
+    if isinstance(core.backend, CascadeBackend) and core.backend.summary():
+        report["模型级联"] = core.backend.summary()
+    if core.token_budget is not None:
+        core.token_budget.save()
+        report["Token用量"] = core.token_budget.summary()
+    print_batch_report(report)
+    if config["report"]:
+        with open(config["report"], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 汇总报告已保存到 {config['report']}")
+    return report
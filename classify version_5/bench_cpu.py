@@ -0,0 +1,240 @@
+"""
+CPU热路径微基准测试
+不访问网络，只测量随数据量增长的本地开销：
+- prompt_build：构造单条分类提示词
+- classify_single_item：单条分类完整路径（缓存查找、提示词、解析、写缓存），后端直接返回固定响应
+- parse_single / parse_batch：解析单条与批量分类响应
+- evaluate_quality / gini：质量评估（基于 LabelCodes 编码统计）与基尼系数
+- remaining_names：从全量名称中排除第一次抽样
+- stratified_sample：分层抽样（整列计算后缀/地区/长度特征并按层分配）
+- excel_write / excel_read：结果写出与名称列读取
+
+用法：
+  python bench_cpu.py --scale 10k --save bench_baseline.json         记录基线
+  python bench_cpu.py --scale 10k --compare bench_baseline.json      与基线对比，超出容差时退出码为1
+  python bench_cpu.py --scale 1m --only prompt_build parse_batch     只跑部分项目
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import core
+from backends import ChatBackend
+from prompts import (
+    DEFAULT_NUM2NAME, DEFAULT_NUM2DESC, build_classify_prompt, parse_category_code, parse_batch_response,
+)
+
+SCALES = {"10k": 10_000, "1m": 1_000_000}
+
+PREFIXES = ["北京市", "上海市", "广东省", "浙江省", "四川省", "湖北省", "江苏省", "山东省", "河南省", "福建省"]
+MIDDLES = ["第一", "第二", "人民", "中心", "城市", "高新", "经济", "交通", "教育", "卫生"]
+SUFFIXES = ["人民医院", "大学", "公安局", "有限公司", "研究院", "图书馆", "人民政府", "自来水公司", "中学", "服务中心"]
+
+def make_names(count, seed=0):
+    """
+    生成确定性的模拟采购方名称，约一半重复，接近真实导出数据
+    """
+    rng = random.Random(seed)
+    unique = max(1, count // 2)
+    pool = [f"{rng.choice(PREFIXES)}{rng.choice(MIDDLES)}{i}{rng.choice(SUFFIXES)}" for i in range(unique)]
+    return [pool[rng.randrange(unique)] for _ in range(count)]
+
+def make_labels(count, seed=0):
+    rng = random.Random(seed)
+    labels = list(DEFAULT_NUM2NAME.values())
+    weights = [len(labels) - i for i in range(len(labels))]
+    return rng.choices(labels, weights=weights, k=count)
+
+class FixedResponseBackend(ChatBackend):
+    """
+    不发请求，直接返回固定响应，只保留本地的提示词构造与解析开销
+    """
+    name = "bench"
+
+    def post_chat(self, data):
+        return {"choices": [{"message": {"content": "类别3"}}], "usage": None}
+
+def bench_prompt_build(names):
+    for name in names:
+        build_classify_prompt(name, DEFAULT_NUM2NAME, DEFAULT_NUM2DESC)
+
+def bench_classify_single_item(names):
+    previous_backend = core.backend
+    core.set_backend(FixedResponseBackend())
+    core.result_cache.clear()
+    try:
+        for index, name in enumerate(names):
+            core.classify_single_item((name, DEFAULT_NUM2NAME, DEFAULT_NUM2DESC, index))
+    finally:
+        core.result_cache.clear()
+        core.set_backend(previous_backend)
+
+def bench_parse_single(names):
+    for _ in names:
+        parse_category_code("类别3：医疗机构")
+
+def bench_parse_batch(names, batch_size=20):
+    content = "\n".join(f"{i + 1}:类别{i % 10 + 1}" for i in range(batch_size))
+    for _ in range(0, len(names), batch_size):
+        parse_batch_response(content, batch_size)
+
+def bench_evaluate_quality(names):
+    from get_class import evaluate_classification_quality
+    from labels import LabelCodes
+    labels = LabelCodes.from_taxonomy(DEFAULT_NUM2NAME)
+    labels.extend(make_labels(len(names)))
+    start_time = time.perf_counter()
+    evaluate_classification_quality(labels)
+    return time.perf_counter() - start_time
+
+def bench_gini(names):
+    core.calculate_gini_coefficient([len(name) for name in names])
+
+def bench_remaining_names(names):
+    from get_class import exclude_sampled
+    exclude_sampled(names, random.Random(1).sample(names, min(500, len(names))))
+
+def bench_stratified_sample(names):
+    from sampling import NameSampler
+    NameSampler(names).sample(300, min_per_stratum=1, rng=random.Random(1))
+
+def bench_excel_write(names):
+    from data_io import open_result_sink
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sink = open_result_sink(os.path.join(tmp_dir, "bench.xlsx"), ["Purchaser_Name", "Classification"])
+        sink.write_rows([(name, "医疗机构") for name in names])
+        sink.close()
+
+def bench_excel_read(names):
+    import input_cache
+    from data_io import open_result_sink, load_input_table
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.xlsx")
+        sink = open_result_sink(path, ["Purchaser_Name", "Classification"])
+        sink.write_rows([(name, "医疗机构") for name in names])
+        sink.close()
+        # 只测解析耗时：不写入输入缓存（也不会在 ./.input_cache 中留下临时文件的缓存）
+        previous = input_cache.cache_dir
+        input_cache.set_cache_dir(None)
+        try:
+            start_time = time.perf_counter()
+            load_input_table(path, "Purchaser_Name")
+            return time.perf_counter() - start_time
+        finally:
+            input_cache.set_cache_dir(previous)
+
+BENCHMARKS = {
+    "prompt_build": bench_prompt_build,
+    "classify_single_item": bench_classify_single_item,
+    "parse_single": bench_parse_single,
+    "parse_batch": bench_parse_batch,
+    "evaluate_quality": bench_evaluate_quality,
+    "gini": bench_gini,
+    "remaining_names": bench_remaining_names,
+    "stratified_sample": bench_stratified_sample,
+    "excel_write": bench_excel_write,
+    "excel_read": bench_excel_read,
+}
+
+def run_benchmarks(scale, only=None, repeat=3):
+    """
+    每个项目运行 repeat 次取最短耗时；缺少依赖（如 numpy/pandas/openpyxl）的项目记为跳过
+    基准函数返回数值时以该数值为耗时（只计读取，不计准备数据）
+    """
+    names = make_names(SCALES[scale])
+    results = {}
+    for bench_name, bench in BENCHMARKS.items():
+        if only and bench_name not in only:
+            continue
+        timings = []
+        try:
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                measured = bench(names)
+                timings.append(measured if measured is not None else time.perf_counter() - start_time)
+        except ImportError as e:
+            print(f"   {bench_name:<22} 跳过（缺少依赖: {e.name or e}）")
+            continue
+        seconds = min(timings)
+        results[bench_name] = {"seconds": round(seconds, 6), "per_item_us": round(seconds / len(names) * 1e6, 4)}
+        print(f"   {bench_name:<22} {seconds:10.4f} 秒  {results[bench_name]['per_item_us']:10.4f} 微秒/条")
+    return results
+
+def compare_results(current, baseline, tolerance):
+    """
+    返回变慢超过容差的项目：[(项目, 基线秒数, 当前秒数, 变化比例)]
+    """
+    regressions = []
+    print(f"\n📊 与基线对比（容差 {tolerance:.0%}）:")
+    for bench_name, result in current.items():
+        if bench_name not in baseline:
+            print(f"   {bench_name:<22} 基线中没有该项目")
+            continue
+        before, after = baseline[bench_name]["seconds"], result["seconds"]
+        change = (after - before) / before if before else 0.0
+        flag = "❌ 变慢" if change > tolerance else ("✅ 变快" if change < -tolerance else "  持平")
+        print(f"   {bench_name:<22} {before:10.4f} → {after:10.4f} 秒  {change:+7.1%}  {flag}")
+        if change > tolerance:
+            regressions.append((bench_name, before, after, change))
+    return regressions
+
+def load_baseline(filename):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_baseline(filename, scale, results):
+    """
+    基线文件按规模分别保存，同一文件可以同时保存 10k 和 1m 的结果
+    """
+    data = load_baseline(filename)
+    data[scale] = {
+        "results": results,
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 基线已保存到 {filename}（{scale}）")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="招投标机构分类系统 - CPU热路径微基准测试")
+    parser.add_argument("--scale", choices=list(SCALES), default="10k", help="名称数量规模")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="只运行指定项目")
+    parser.add_argument("--repeat", type=int, default=3, help="每个项目重复次数（取最短耗时）")
+    parser.add_argument("--save", metavar="BASELINE", help="把结果保存为基线")
+    parser.add_argument("--compare", metavar="BASELINE", help="与基线对比，变慢超过容差时退出码为1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的变慢比例（默认0.2即20%%）")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"⏱️ CPU微基准测试：{args.scale}（{SCALES[args.scale]} 条名称），每项重复 {args.repeat} 次")
+    results = run_benchmarks(args.scale, args.only, args.repeat)
+
+    if args.save:
+        save_baseline(args.save, args.scale, results)
+
+    if args.compare:
+        baseline = load_baseline(args.compare).get(args.scale)
+        if baseline is None:
+            print(f"❌ {args.compare} 中没有 {args.scale} 规模的基线")
+            return 1
+        regressions = compare_results(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 个项目变慢超过 {args.tolerance:.0%}: "
+                  f"{', '.join(name for name, *_ in regressions)}")
+            return 1
+        print("\n✅ 没有超出容差的性能退化")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Token预算统计与控制
+根据API响应中的 usage 实时累计消耗，支持单次运行预算和每日预算，每日用量持久化到JSON文件。
+多个进程（如 watcher 和 classify.py）共用同一个文件：保存时在文件锁内读出最新内容，只加上本进程尚未写入的增量，
+不会覆盖其他进程的用量；设置了每日预算时每隔 SYNC_INTERVAL 秒同步一次，及时看到其他进程的消耗。
+- 用量达到 throttle_ratio：每个请求前额外等待，放慢消耗速度
+- 用量达到 fallback_ratio：按 on_exhausted 处理
+  - "fallback"：不再请求API，改用本地规则，未命中规则的归为"其他"
+  - "stop"：抛出 BudgetExceeded，已写出的结果和缓存可作为断点，下次运行继续
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# 设置每日预算时与预算文件同步的间隔（秒）
+SYNC_INTERVAL = 2.0
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """
+    跨进程互斥：锁定 <path>.lock
+    """
+    with open(path + ".lock", 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class BudgetExceeded(Exception):
+    """
+    Token预算耗尽且配置为停止运行
+    """
+
+class TokenBudget:
+    def __init__(self, state_file="token_budget.json", run_limit=None, daily_limit=None,
+                 throttle_ratio=0.8, fallback_ratio=0.95, on_exhausted="fallback", throttle_delay=1.0):
+        self.state_file = state_file
+        self.run_limit = run_limit
+        self.daily_limit = daily_limit
+        self.throttle_ratio = throttle_ratio
+        self.fallback_ratio = fallback_ratio
+        self.on_exhausted = on_exhausted
+        self.throttle_delay = throttle_delay
+        self.lock = threading.Lock()
+        # 同一进程内同时只有一个线程与文件同步
+        self.save_lock = threading.Lock()
+        self.run_used = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.state = self._load_state()
+        # 本进程记录但还没有写入文件的每日用量增量
+        self.unsaved = {}
+        self.unsaved_records = 0
+        self.last_sync = time.monotonic()
+        self.warned = set()
+
+    def _load_state(self):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"daily": {}}
+
+    def save(self):
+        """
+        在文件锁内读出其他进程写入的最新用量，加上本进程的增量后写回，并以合并后的用量作为当前状态
+        """
+        if not self.state_file:
+            return
+        with self.save_lock:
+            with self.lock:
+                unsaved, self.unsaved = self.unsaved, {}
+                self.unsaved_records = 0
+            try:
+                with _file_lock(self.state_file):
+                    state = self._load_state()
+                    for day, tokens in unsaved.items():
+                        state["daily"][day] = state["daily"].get(day, 0) + tokens
+                    tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+                    with open(tmp_file, 'w', encoding='utf-8') as f:
+                        json.dump(state, f, ensure_ascii=False, indent=2)
+                    os.replace(tmp_file, self.state_file)
+            except BaseException:
+                # 写入失败时增量留到下次保存
+                with self.lock:
+                    for day, tokens in unsaved.items():
+                        self.unsaved[day] = self.unsaved.get(day, 0) + tokens
+                raise
+            with self.lock:
+                # 同步期间本进程新记录的用量仍在 self.unsaved 中
+                for day, tokens in self.unsaved.items():
+                    state["daily"][day] = state["daily"].get(day, 0) + tokens
+                self.state = state
+                self.last_sync = time.monotonic()
+
+    @staticmethod
+    def today():
+        return time.strftime("%Y-%m-%d")
+
+    def daily_used(self):
+        with self.lock:
+            return self.state["daily"].get(self.today(), 0)
+
+    def record(self, usage):
+        """
+        累计一次响应的 usage（DeepSeek/OpenAI 格式），缺失时忽略
+        """
+        if not usage:
+            return
+        with self.lock:
+            for key in self.run_used:
+                self.run_used[key] += usage.get(key, 0)
+            today = self.today()
+            tokens = usage.get("total_tokens", 0)
+            self.state["daily"][today] = self.state["daily"].get(today, 0) + tokens
+            self.unsaved[today] = self.unsaved.get(today, 0) + tokens
+            self.unsaved_records += 1
+            should_save = self.unsaved_records >= 20
+        if should_save:
+            self.save()
+
+    def usage_ratio(self):
+        """
+        返回运行预算和每日预算中占用比例较高的一个
+        """
+        ratios = [0.0]
+        if self.run_limit:
+            ratios.append(self.run_used["total_tokens"] / self.run_limit)
+        if self.daily_limit:
+            if self.state_file and time.monotonic() - self.last_sync >= SYNC_INTERVAL:
+                self.save()
+            ratios.append(self.daily_used() / self.daily_limit)
+        return max(ratios)
+
+    def before_request(self):
+        """
+        请求API前调用：接近预算时限速；预算耗尽时返回 False（改用本地兜底）或抛出 BudgetExceeded
+        """
+        ratio = self.usage_ratio()
+        if ratio >= self.fallback_ratio:
+            if self.on_exhausted == "stop":
+                self.save()
+                raise BudgetExceeded(f"Token预算已使用 {ratio:.0%}，停止运行")
+            self._warn_once("fallback", f"\n⚠️ Token预算已使用 {ratio:.0%}，后续名称改用本地规则分类")
+            return False
+        if ratio >= self.throttle_ratio:
+            self._warn_once("throttle", f"\n⚠️ Token预算已使用 {ratio:.0%}，开始限速")
+            time.sleep(self.throttle_delay)
+        return True
+
+    def _warn_once(self, key, message):
+        with self.lock:
+            if key in self.warned:
+                return
+            self.warned.add(key)
+        print(message)
+
+    def summary(self):
+        report = {
+            "本次运行tokens": self.run_used["total_tokens"],
+            "本次输入tokens": self.run_used["prompt_tokens"],
+            "本次输出tokens": self.run_used["completion_tokens"],
+            "今日累计tokens": self.daily_used(),
+        }
+        if self.run_limit:
+            report["单次运行预算"] = self.run_limit
+        if self.daily_limit:
+            report["每日预算"] = self.daily_limit
+        return report
@@ -0,0 +1,239 @@
+"""
+模型级联（--cascade）
+大部分名称（"清华大学"、"XX市人民医院"）用便宜、快速的方式就能分对，只有少数含糊的名称需要强模型：
+- 快速层先分类并给出置信度：远程/本地模型只输出类别编号（温度0、限制输出长度），按 logprobs 计算编号的概率；
+  离线层只对命中后缀规则的名称有把握
+- 置信度低于阈值（--confidence-threshold）、没有置信度或编号无法识别时，升级到强模型（当前分类后端）；
+  升级请求失败时只重试升级这一步，不重新请求快速层（截止时间模式下到点后不再重试），
+  重试仍失败时抛出 RetriesExhausted 由调用方兜底
+- 快速层必须比强模型便宜：两层解析到同一个模型时拒绝启用（见 check_tiers），否则节省统计没有意义
+- 快速层有把握的名称中按 --audit-rate 随机抽检，同时请求强模型并以强模型结果为准，统计两层的一致率
+
+summary() 给出各层解决的占比、抽检一致率，以及与"全部名称都请求强模型"相比节省的耗时和tokens
+（按本次运行中强模型每次请求的平均耗时和tokens估算）
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+
+from backends import (
+    ClassifierBackend, RemoteChatBackend, LocalOpenAIBackend, OfflineBackend, RetriesExhausted, DEFAULT_LOCAL_URL,
+    current_give_up_at,
+)
+from cassette import CassetteMiss
+from tracing import LatencyRecorder
+
+CASCADE_TIERS = ("remote", "local", "offline")
+
+# 快速层只需输出类别编号
+FAST_MAX_TOKENS = 8
+
+# 升级到强模型的请求最多尝试的次数（失败后按 1、2 秒退避）
+ESCALATION_RETRIES = 3
+
+class CascadeBackend(ClassifierBackend):
+    name = "cascade"
+
+    def __init__(self, fast, strong, threshold=0.9, audit_rate=0.05, rng=None):
+        super().__init__()
+        self.fast = fast
+        self.strong = strong
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.rng = rng or random.Random()
+        # 截止时间模式等按当前后端的后端池规划并发
+        if hasattr(strong, "pool"):
+            self.pool = strong.pool
+        fast.usage_callback = lambda usage: self._record_usage("fast", usage)
+        strong.usage_callback = lambda usage: self._record_usage("strong", usage)
+        # 每个名称从发起到得到最终类别的耗时，按解决路径分开统计
+        self.label_latency = LatencyRecorder()
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.tokens = Counter()
+        self.seconds = Counter()
+
+    def _record_usage(self, tier, usage):
+        if usage:
+            with self.lock:
+                self.tokens[tier] += usage.get("total_tokens", 0)
+        if self.usage_callback is not None:
+            self.usage_callback(usage)
+
+    def _count(self, **increments):
+        with self.lock:
+            self.counts.update(increments)
+
+    def _timed(self, tier, func, *args):
+        start_time = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            with self.lock:
+                self.counts[f"{tier}_calls"] += 1
+                self.seconds[tier] += elapsed
+
+    def _escalate(self, name, num2name, num2desc):
+        """
+        请求强模型，失败时只重试这一步（快速层结果已经得到，不再重新请求）；
+        截止时间模式下等待重试会超过放弃时间时不再重试
+        """
+        give_up_at = current_give_up_at()
+        for attempt in range(ESCALATION_RETRIES):
+            try:
+                return self._timed("strong", self.strong.classify_name, name, num2name, num2desc)
+            except CassetteMiss:
+                raise
+            except Exception as e:
+                out_of_time = give_up_at is not None and time.monotonic() + 2 ** attempt >= give_up_at
+                if attempt < ESCALATION_RETRIES - 1 and not out_of_time:
+                    time.sleep(2 ** attempt)
+                    continue
+                self._count(escalation_failed=1)
+                raise RetriesExhausted(f"升级到强模型失败（已尝试 {attempt + 1} 次）: {e}") from e
+
+    def classify_name(self, name, num2name, num2desc):
+        start_time = time.perf_counter()
+        try:
+            code, confidence = self._timed("fast", self.fast.classify_name_scored, name, num2name, num2desc)
+        except CassetteMiss:
+            raise
+        except Exception:
+            code, confidence = None, None
+
+        if code not in num2name or confidence is None or confidence < self.threshold:
+            # 强模型重试仍失败时抛出 RetriesExhausted，由调用方兜底，不计入解决路径统计
+            reason = "unparsed" if code not in num2name else "low_confidence"
+            code = self._escalate(name, num2name, num2desc)
+            path = "升级（快速层无法识别）" if reason == "unparsed" else "升级（置信度低）"
+            self._count(names=1, escalated=1, **{reason: 1})
+        elif self.rng.random() < self.audit_rate:
+            path = "抽检"
+            try:
+                strong_code = self._timed("strong", self.strong.classify_name, name, num2name, num2desc)
+            except CassetteMiss:
+                raise
+            except Exception:
+                # 抽检请求失败时直接采用快速层结果，不计入抽检
+                strong_code = None
+            if strong_code in num2name:
+                self._count(names=1, fast=1, audited=1, agreed=int(strong_code == code))
+                code = strong_code
+            else:
+                self._count(names=1, fast=1)
+        else:
+            path = "快速层"
+            self._count(names=1, fast=1)
+        self.label_latency.record(path, time.perf_counter() - start_time)
+        return code
+
+    def classify_batch(self, names, num2name, num2desc):
+        """
+        逐条走级联；升级重试仍失败的名称位置为该 RetriesExhausted（调用方直接兜底，不再重新走级联）
+        """
+        codes = []
+        for name in names:
+            try:
+                codes.append(self.classify_name(name, num2name, num2desc))
+            except RetriesExhausted as e:
+                codes.append(e)
+        return codes
+
+    def classify_multi(self, name, taxonomies):
+        return self.strong.classify_multi(name, taxonomies)
+
+    def generate_categories(self, purchaser_names):
+        return self.strong.generate_categories(purchaser_names)
+
+    def refine_categories(self, num2name, num2desc, issues, examples):
+        return self.strong.refine_categories(num2name, num2desc, issues, examples)
+
+    def summary(self):
+        with self.lock:
+            counts, tokens, seconds = Counter(self.counts), Counter(self.tokens), Counter(self.seconds)
+        names = counts["names"]
+        if not names:
+            return {}
+
+        def share(count):
+            return f"{count} ({count / names:.1%})"
+
+        report = {
+            "分类名称数": names,
+            "快速层解决": share(counts["fast"]),
+            "升级到强模型": share(counts["escalated"]),
+            "其中置信度低": counts["low_confidence"],
+            "其中快速层无法识别": counts["unparsed"],
+            "升级失败": counts["escalation_failed"],
+            "抽检数": counts["audited"],
+            "抽检一致率": f"{counts['agreed'] / counts['audited']:.1%}" if counts["audited"] else None,
+            "快速层tokens": tokens["fast"],
+            "强模型tokens": tokens["strong"],
+        }
+        if counts["fast_calls"]:
+            report["快速层平均耗时(秒)"] = round(seconds["fast"] / counts["fast_calls"], 3)
+        if counts["strong_calls"]:
+            strong_latency = seconds["strong"] / counts["strong_calls"]
+            report["强模型平均耗时(秒)"] = round(strong_latency, 3)
+            # 与全部名称只请求强模型相比（按本次强模型请求的平均值估算）
+            baseline_seconds = strong_latency * names
+            actual_seconds = seconds["fast"] + seconds["strong"]
+            report["耗时节省"] = f"{1 - actual_seconds / baseline_seconds:.1%}"
+            if tokens["strong"]:
+                baseline_tokens = tokens["strong"] / counts["strong_calls"] * names
+                saved = baseline_tokens - tokens["fast"] - tokens["strong"]
+                report["Token节省"] = f"{saved:.0f} ({saved / baseline_tokens:.1%})"
+        return report
+
+def _tier_models(backend):
+    """
+    后端实际请求的模型（后端池按所选后端覆盖请求中的 model）；离线后端返回 None
+    """
+    pool = getattr(backend, "pool", None)
+    if pool is None:
+        return None
+    return {(member.url, member.model) for member in pool.backends}
+
+def check_tiers(fast, strong):
+    """
+    检查快速层是否真的是另一个（更便宜的）模型
+    返回：错误信息，可以启用级联时返回 None
+    """
+    fast_models, strong_models = _tier_models(fast), _tier_models(strong)
+    if fast_models and strong_models and fast_models <= strong_models:
+        models = ", ".join(sorted(model for _, model in fast_models))
+        return (f"快速层与分类后端使用同一个模型（{models}），级联不会更便宜；"
+                f"远程快速层请用 --cascade-backends 指定小模型")
+    return None
+
+def create_fast_tier(kind, pool=None, local_url=DEFAULT_LOCAL_URL, local_model="local"):
+    """
+    创建快速层：远程/本地模型使用温度0并限制输出长度，只输出类别编号
+    远程快速层默认与强模型共用后端池（同一个Key的请求频率一起控制），也可传入单独的小模型后端池
+    """
+    if kind == "remote":
+        return RemoteChatBackend(pool, temperature=0.0, classify_max_tokens=FAST_MAX_TOKENS)
+    if kind == "local":
+        backend = LocalOpenAIBackend(url=local_url, model=local_model, classify_max_tokens=FAST_MAX_TOKENS)
+        backend.temperature = 0.0
+        return backend
+    if kind == "offline":
+        return OfflineBackend()
+    raise ValueError(f"未知的快速层类型: {kind}（可选 {', '.join(CASCADE_TIERS)}）")
+
+def print_cascade_summary(backend):
+    """
+    打印模型级联统计（当前后端不是级联或没有分类记录时不打印）
+    """
+    if not isinstance(backend, CascadeBackend):
+        return
+    report = backend.summary()
+    if not report:
+        return
+    print(f"\n🪜 模型级联:")
+    for item, value in report.items():
+        if value is not None:
+            print(f"   {item}: {value}")
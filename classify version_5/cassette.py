@@ -0,0 +1,180 @@
+"""
+API请求录制与回放
+把聊天补全请求和响应按"规范化请求体指纹"保存到JSON文件（cassette），之后可以完全离线地回放：
+- record：照常请求API，并把成功的响应连同耗时一起录下
+- replay：只从文件中返回响应，未录制的请求抛出 CassetteMiss，不会访问网络
+- auto：已录制的请求回放，未录制的请求访问API并补录
+
+回放时可以按录制时的真实耗时等待（latency="recorded"），也可以使用固定的模拟耗时（秒），
+这样并发与性能测试可以离线、可重复地运行，真实流量样本也可以作为基准测试的固定数据。
+
+指纹不包含 model 字段（由后端池按所选后端填写），同一份录制可以在不同后端配置下回放。
+流式请求（stream=True）与普通请求共用同一条录制：录制时读完整个流并保存拼接后的完整响应，
+回放时再把内容切成 SSE 数据块逐行返回。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+CASSETTE_MODES = ("record", "replay", "auto")
+
+# 不参与指纹的请求字段
+IGNORED_FIELDS = ("model", "stream", "stream_options")
+
+class CassetteMiss(Exception):
+    """
+    回放模式下请求没有对应的录制
+    """
+
+class CassetteResponse:
+    """
+    模拟 requests.Response 中本项目用到的部分
+    """
+    def __init__(self, body, status_code=200):
+        self._body = body
+        self.status_code = status_code
+        self.headers = {}
+
+    def iter_lines(self, chunk_chars=2):
+        """
+        把完整响应切成 SSE 数据块（每块 chunk_chars 个字符），最后一块带 usage
+        """
+        content = self._body["choices"][0]["message"]["content"]
+        for start in range(0, len(content), chunk_chars):
+            chunk = {"choices": [{"index": 0, "delta": {"content": content[start:start + chunk_chars]}}]}
+            yield b"data: " + json.dumps(chunk, ensure_ascii=False).encode('utf-8')
+        final = {"choices": [], "usage": self._body.get("usage")}
+        yield b"data: " + json.dumps(final, ensure_ascii=False).encode('utf-8')
+        yield b"data: [DONE]"
+
+    def close(self):
+        pass
+
+    def json(self):
+        return self._body
+
+    @property
+    def content(self):
+        return json.dumps(self._body, ensure_ascii=False).encode('utf-8')
+
+    def raise_for_status(self):
+        pass
+
+def payload_key(payload):
+    """
+    规范化请求体指纹：忽略 model 和流式相关字段，键排序后取 md5
+    """
+    canonical = {key: value for key, value in payload.items() if key not in IGNORED_FIELDS}
+    text = json.dumps(canonical, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+class Cassette:
+    """
+    可以替代 requests.Session 使用（只实现 post），通过 http_client.set_session 安装
+    """
+    def __init__(self, path, mode="auto", latency="recorded", session=None):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"未知的录制模式: {mode}（可选 {', '.join(CASSETTE_MODES)}）")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.session = session
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.stats = {"replayed": 0, "recorded": 0, "missed": 0}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get("entries", {})
+
+    def _real_session(self):
+        if self.session is None:
+            from http_client import create_session
+            self.session = create_session()
+        return self.session
+
+    def _replay_delay(self, entry):
+        if self.latency == "recorded":
+            return entry.get("latency", 0.0)
+        return float(self.latency or 0.0)
+
+    def post(self, url, headers=None, json=None, timeout=None, **kwargs):
+        key = payload_key(json)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and self.mode != "record":
+            delay = self._replay_delay(entry)
+            if delay > 0:
+                time.sleep(delay)
+            with self.lock:
+                self.stats["replayed"] += 1
+            return CassetteResponse(entry["response"])
+        if self.mode == "replay":
+            with self.lock:
+                self.stats["missed"] += 1
+            raise CassetteMiss(f"请求 {key[:8]} 没有录制，请先用 record 或 auto 模式运行")
+
+        start_time = time.perf_counter()
+        response = self._real_session().post(url, headers=headers, json=json, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        if kwargs.get("stream"):
+            body = collect_stream(response)
+            response = CassetteResponse(body)
+        else:
+            body = response.json()
+        latency = time.perf_counter() - start_time
+        with self.lock:
+            self.entries[key] = {
+                "request": {k: v for k, v in json.items() if k not in ("stream", "stream_options")},
+                "response": body,
+                "latency": round(latency, 4),
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self.stats["recorded"] += 1
+        return response
+
+    def save(self):
+        if self.mode == "replay" or not self.stats["recorded"]:
+            return
+        with self.lock:
+            data = json.dumps({"entries": self.entries}, ensure_ascii=False, indent=1)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_file, self.path)
+
+def collect_stream(response):
+    """
+    读完整个 SSE 流，拼接为普通（非流式）响应的格式
+    """
+    from http_client import iter_sse_chunks
+    content = ""
+    usage = None
+    try:
+        for delta, chunk_usage in iter_sse_chunks(response):
+            content += delta
+            usage = chunk_usage or usage
+    finally:
+        response.close()
+    return {"choices": [{"message": {"role": "assistant", "content": content}}], "usage": usage}
+
+def use_cassette(path, mode="auto", latency="recorded"):
+    """
+    把全局HTTP session换成 cassette，返回 Cassette（运行结束后调用 save() 保存录制）
+    """
+    from http_client import set_session
+    cassette = Cassette(path, mode, latency)
+    set_session(cassette)
+    print(f"📼 使用请求录制文件 {path}（模式: {mode}，已有 {len(cassette.entries)} 条录制）")
+    return cassette
+
+def parse_latency(value):
+    """
+    命令行中的回放耗时："recorded" 或秒数
+    """
+    return value if value == "recorded" else float(value)
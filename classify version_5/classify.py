@@ -1,229 +1,42 @@
-import pandas as pd
-import requests
-from tqdm import tqdm
 import time
-import json
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
-
-API_KEY = "your deepseek api key"
-API_URL = "https://api.deepseek.com/v1/chat/completions"
-
-# 线程锁，用于控制API请求频率
-request_lock = threading.Lock()
-
-# 创建带有重试机制的session
-def create_session():
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=3,  # 总重试次数
-        backoff_factor=1,  # 重试间隔
-        status_forcelist=[429, 500, 502, 503, 504],  # 需要重试的HTTP状态码
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
-
-# 全局session
-session = create_session()
-
-def load_categories_from_json(filename="categories.json"):
-    """
-    从JSON文件加载分类结果
-    """
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            categories_data = json.load(f)
-        
-        num2name = categories_data["num2name"]
-        num2desc = categories_data["num2desc"]
-        timestamp = categories_data.get("timestamp", "未知")
-        total_categories = categories_data.get("total_categories", len(num2name))
-        
-        print(f"✅ 成功加载分类结果")
-        print(f"📅 生成时间: {timestamp}")
-        print(f"📊 分类数量: {total_categories}")
-        
-        return num2name, num2desc
-    except FileNotFoundError:
-        print(f"❌ 找不到分类文件 {filename}")
-        print("💡 请先运行 get_class.py 生成分类结果")
-        return None, None
-    except Exception as e:
-        print(f"❌ 加载分类文件失败: {e}")
-        return None, None
-
-def classify_single_item(args):
-    """
-    对单个项目进行分类（用于并发处理）
-    """
-    name, num2name, num2desc, index = args
-    
-    # 使用线程锁控制API请求频率
-    with request_lock:
-        time.sleep(0.1)  # 控制请求频率，避免API限制
-    
-    # 将所有类别编号、类别名称和类别描述组成一个字符串（每个类别的描述一行）
-    cat_desc_str = "\n".join([f"{num}:{num2name[num]}：{num2desc[num]}" for num in num2name])
-    prompt = (
-        f"""已知有如下类别及解释：\n{cat_desc_str}\n请判断\"{name}\"最适合归入哪个类别，只返回类别编号，如'类别10'、'类别5'，不要其他解释。"""
-    )
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": "deepseek-chat",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
-    }
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            # 发送 POST 请求到 API URL，获取 API 的响应
-            response = session.post(API_URL, headers=headers, json=data, timeout=30)
-            # 如果请求失败，抛出异常
-            response.raise_for_status()
-            # 从返回的 JSON 中提取类别编号并去除多余的空白字符
-            result = response.json()['choices'][0]['message']['content'].strip()
-            result_clean = result.replace('：', ':').split(':')[0].strip()  # 只保留编号
-            final_label = num2name.get(result_clean, "其他")
-            return index, final_label
-        except requests.exceptions.SSLError as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-    
-    # 如果所有重试都失败了，返回默认类别
-    return index, "其他"
-
-def classify_with_desc(name, num2name, num2desc):
-    """
-    对单个名称进行分类（兼容单线程版本）
-    """
-    result = classify_single_item((name, num2name, num2desc, 0))
-    return result[1]
-
-def classify_all_data_concurrent(purchaser_names, num2name, num2desc, max_workers=10):
-    """
-    使用并发对全量数据进行分类
-    """
-    print(f"\n🚀 开始对全量数据进行并发分类...")
-    print(f"📊 总数据量: {len(purchaser_names)}")
-    print(f"🔧 使用 {max_workers} 个线程进行并发处理")
-    
-    # 准备任务参数
-    tasks = [(name, num2name, num2desc, i) for i, name in enumerate(purchaser_names)]
-    
-    all_classifications = [None] * len(purchaser_names)  # 预分配结果列表
-    
-    # 使用线程池执行并发任务
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有任务
-        future_to_index = {executor.submit(classify_single_item, task): task[3] for task in tasks}
-        
-        # 使用tqdm显示进度
-        with tqdm(total=len(purchaser_names), desc="并发分类进度") as pbar:
-            for future in as_completed(future_to_index):
-                try:
-                    index, result = future.result()
-                    all_classifications[index] = result
-                    pbar.update(1)
-                    
-                    # 每100条数据显示一次进度
-                    if (index + 1) % 100 == 0:
-                        print(f"\n📈 已处理 {index + 1}/{len(purchaser_names)} 条数据")
-                        
-                except Exception as e:
-                    index = future_to_index[future]
-                    print(f"\n❌ 处理第 {index + 1} 条数据时出错: {e}")
-                    all_classifications[index] = "其他"
-                    pbar.update(1)
-    
-    return all_classifications
-
-def classify_all_data(purchaser_names, num2name, num2desc):
-    """
-    对全量数据进行分类（保持向后兼容）
-    """
-    # 根据数据量决定是否使用并发
-    if len(purchaser_names) > 100:
-        # 根据数据量动态调整线程数
-        if len(purchaser_names) > 1000:
-            max_workers = 15
-        elif len(purchaser_names) > 500:
-            max_workers = 10
-        else:
-            max_workers = 5
-        return classify_all_data_concurrent(purchaser_names, num2name, num2desc, max_workers)
-    else:
-        # 小数据量使用单线程
-        print(f"\n🚀 开始对全量数据进行分类...")
-        print(f"📊 总数据量: {len(purchaser_names)}")
-        
-        all_classifications = []
-        pbar = tqdm(total=len(purchaser_names), desc="全量数据分类进度")
-        
-        for i, name in enumerate(purchaser_names):
-            try:
-                result = classify_with_desc(name, num2name, num2desc)
-                result_clean = result.replace('：', ':').split(':')[0].strip()  # 只保留编号
-                final_label = num2name.get(result_clean, "其他")
-                all_classifications.append(final_label)
-                
-                # 更新进度条
-                pbar.update(1)
-                
-                # 控制请求频率
-                time.sleep(0.5)
-                
-                # 每100条数据显示一次进度
-                if (i + 1) % 100 == 0:
-                    print(f"\n📈 已处理 {i + 1}/{len(purchaser_names)} 条数据")
-                    
-            except Exception as e:
-                print(f"\n❌ 处理第 {i + 1} 条数据时出错: {e}")
-                all_classifications.append("其他")  # 出错时归为"其他"
-                pbar.update(1)
-        
-        pbar.close()
-        return all_classifications
+import atexit
+import argparse
+from data_io import load_input_table
+from budget import TokenBudget, BudgetExceeded
+from api_pool import load_backend_pool, print_pool_summary
+from backends import BACKEND_KINDS, DEFAULT_LOCAL_URL, create_backend, enable_streaming, print_label_latency
+from cassette import CASSETTE_MODES, parse_latency, use_cassette
+from deadline import deadline_arg, start_deadline, print_deadline_summary
+from cascade import CASCADE_TIERS, CascadeBackend, check_tiers, create_fast_tier, print_cascade_summary
+import tracing
+import input_cache
+import rate_limiter
+from tracing import span
+import core
+from core import (
+    API_KEY, API_URL, REQUEST_INTERVAL, result_cache, cache_lock, run_stats, record_stat,
+    get_taxonomy_key, lookup_cache, store_cache, load_result_cache, save_result_cache,
+    set_api_pool, set_token_budget, set_backend, load_categories_from_json,
+    classify_single_item, classify_with_desc, classify_batch_items, iter_classify_windowed,
+    classify_all_data_concurrent, choose_max_workers, classify_unique_names, classify_all_data,
+    classify_to_file, calculate_gini_coefficient, SCHEDULE_MODES,
+)
+from prompts import build_classify_prompt
 
 def evaluate_final_classification(classifications):
     """
     评估最终分类质量
     """
-    from collections import Counter
-    import numpy as np
+    from labels import count_labels
     
-    # 统计各类别数量
-    class_counts = Counter(classifications)
+    # 统计各类别数量（LabelCodes 直接对编码做 bincount）
+    class_counts = count_labels(classifications)
     total_count = len(classifications)
     
     # 计算各类别占比
     class_percentages = {k: v/total_count*100 for k, v in class_counts.items()}
     
     # 计算基尼系数
-    def calculate_gini_coefficient(values):
-        if len(values) == 0:
-            return 0
-        values = sorted(values)
-        n = len(values)
-        cumsum = np.cumsum(values)
-        return (n + 1 - 2 * np.sum(cumsum) / cumsum[-1]) / n
-    
     percentages = list(class_percentages.values())
     gini_coefficient = calculate_gini_coefficient(percentages)
     
@@ -240,12 +53,12 @@ def evaluate_final_classification(classifications):
     
     return evaluation_report
 
-def print_final_report(report):
+def print_final_report(report, title="最终分类质量评估报告"):
     """
     打印最终分类报告
     """
     print("\n" + "="*60)
-    print("最终分类质量评估报告")
+    print(title)
     print("="*60)
     
     print(f"\n📋 统计数据:")
@@ -259,88 +72,307 @@ def print_final_report(report):
     
     print("="*60)
 
-def main():
-    print("🎯 招投标机构分类系统 - 全量数据分类")
-    print("="*60)
-    
-    # 1. 加载分类结果
+def parse_args(argv=None):
+    """
+    解析命令行参数；不传入任何输入文件时进入交互模式
+    """
+    parser = argparse.ArgumentParser(description="招投标机构分类系统 - 全量数据分类")
+    parser.add_argument("inputs", nargs="*", help="输入Excel文件路径，支持通配符，如 'data/*.xlsx'")
+    parser.add_argument("--config", help="批量任务配置文件（JSON），字段与命令行参数同名")
+    parser.add_argument("--categories", help="分类文件路径（默认为'categories.json'）")
+    parser.add_argument("--taxonomies", nargs="+", metavar="TAXONOMY",
+                        help="同时按多套分类体系分类（列名=分类文件 或 分类文件）：每个名称只请求一次，每套体系输出一列")
+    parser.add_argument("--output-dir", help="输出目录（默认与输入文件同目录）")
+    parser.add_argument("--column", help="采购方名称所在列（默认为'Purchaser_Name'）")
+    parser.add_argument("--id-column", help="可选的ID列，与名称列一起读取并写入输出")
+    parser.add_argument("--output-format", choices=["xlsx", "csv", "jsonl", "parquet"],
+                        help="批量模式输出格式（默认与输入文件相同）")
+    parser.add_argument("--excel-split", choices=["sheets", "files"],
+                        help="Excel输出超过行数上限时拆分为多个工作表或多个文件（默认sheets）；"
+                             "Excel运行中先写入 <输出文件>.rows.jsonl，结束时才生成xlsx")
+    parser.add_argument("--cache-file", help="分类结果缓存文件（JSON），跨运行复用")
+    parser.add_argument("--report", help="将汇总报告另存为JSON文件")
+    parser.add_argument("--rules", action="store_true", help="命中本地后缀规则的名称不再请求API")
+    parser.add_argument("--schedule", choices=SCHEDULE_MODES, default="frequency",
+                        help="请求顺序：frequency 按名称出现行数从高到低（默认）/ file 按输入顺序")
+    parser.add_argument("--priority-column", help="按该列（如合同金额）各名称的合计值从高到低请求")
+    parser.add_argument("--checkpoint-every", type=int, default=0,
+                        help="每完成多少个名称写一次部分结果（<输出文件>_partial）并保存缓存，0为不写")
+    parser.add_argument("--deadline", type=deadline_arg,
+                        help="截止时间（如 18:30、45m、1h30m）：到点前尽量多请求大模型，剩余名称用本地兜底，"
+                             "输出增加 Label_Source 列记录类别来源")
+    parser.add_argument("--deadline-reserve", type=float,
+                        help="截止时间前预留给兜底和写出剩余行的秒数（默认按行数估算）")
+    parser.add_argument("--reclassify", metavar="PREVIOUS_OUTPUT",
+                        help="分类体系修改后增量重分类：沿用该历史输出中未受影响的结果，只重新请求受影响的名称")
+    parser.add_argument("--previous-categories",
+                        help="历史输出所用的分类文件或版本指纹（默认取分类文件中记录的上一版本）")
+    parser.add_argument("--dry-run", action="store_true", help="只输出运行规划（耗时、tokens、费用），不执行分类")
+    parser.add_argument("--probe-size", type=int, default=3, help="试运行时用于测量延迟的真实请求数（0为不探测）")
+    parser.add_argument("--price-input", type=float, help="输入价格（元/百万tokens）")
+    parser.add_argument("--price-output", type=float, help="输出价格（元/百万tokens）")
+    parser.add_argument("--backend", choices=BACKEND_KINDS, default="remote",
+                        help="分类后端：remote 远程API / local 本地OpenAI兼容推理服务 / offline 纯Python离线分类")
+    parser.add_argument("--local-url", default=DEFAULT_LOCAL_URL, help="本地推理服务地址")
+    parser.add_argument("--local-model", default="local", help="本地推理服务的模型名")
+    parser.add_argument("--stream", action="store_true",
+                        help="逐条分类使用流式响应，识别出类别编号后立即关闭连接，并统计出类别耗时")
+    parser.add_argument("--cascade", choices=CASCADE_TIERS,
+                        help="模型级联：先用快速层（只输出编号并按logprobs评估置信度）分类，置信度低的名称再请求当前分类后端")
+    parser.add_argument("--cascade-backends",
+                        help="远程快速层使用的后端池配置（如小模型）；不指定时与分类后端共用，两层为同一模型时拒绝启用")
+    parser.add_argument("--confidence-threshold", type=float, default=0.9, help="快速层结果的最低置信度（默认0.9）")
+    parser.add_argument("--audit-rate", type=float, default=0.05,
+                        help="快速层有把握的名称中同时请求强模型抽检的比例（默认0.05）")
+    parser.add_argument("--backends", help="多后端配置文件（JSON），多个Key/接口共同分担请求")
+    parser.add_argument("--cassette", help="请求录制文件（JSON）：录制真实请求或离线回放")
+    parser.add_argument("--cassette-mode", choices=CASSETTE_MODES, default="auto",
+                        help="record 录制 / replay 只回放（不访问网络）/ auto 已录制的回放、其余录制")
+    parser.add_argument("--replay-latency", type=parse_latency, default="recorded",
+                        help="回放耗时：recorded 按录制时的真实耗时，或固定秒数")
+    parser.add_argument("--run-token-budget", type=int, help="单次运行的Token预算")
+    parser.add_argument("--daily-token-budget", type=int, help="每日Token预算（跨运行累计）")
+    parser.add_argument("--budget-file", default="token_budget.json", help="每日Token用量的保存文件")
+    parser.add_argument("--on-budget-exhausted", choices=["fallback", "stop"], default="fallback",
+                        help="预算耗尽时改用本地规则兜底（fallback）或保存进度后停止（stop）")
+    parser.add_argument("--input-cache-dir", default=input_cache.DEFAULT_CACHE_DIR,
+                        help="输入文件列式缓存目录，重复读取同一个Excel时跳过解析")
+    parser.add_argument("--no-input-cache", action="store_true", help="不使用输入文件列式缓存")
+    rate_limiter.add_arguments(parser)
+    tracing.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def read_priorities(df, priority_column):
+    """
+    把优先级列转为数值（无法解析的记为0），未指定时返回 None（按出现行数排序）
+    """
+    if not priority_column:
+        return None
+    import pandas as pd
+    return pd.to_numeric(df[priority_column], errors="coerce").fillna(0).tolist()
+
+def setup_token_budget(args):
+    """
+    按命令行参数启用Token预算；始终统计用量，只有设置了预算才会限速或兜底
+    """
+    budget = TokenBudget(args.budget_file, args.run_token_budget, args.daily_token_budget,
+                         on_exhausted=args.on_budget_exhausted)
+    set_token_budget(budget)
+    return budget
+
+def print_budget_summary(budget):
+    budget.save()
+    print(f"\n💰 Token用量:")
+    for item, value in budget.summary().items():
+        print(f"   {item}: {value}")
+
+def plan_from_args(purchaser_names, num2name, num2desc, args, probe_size):
+    """
+    按命令行参数生成运行规划
+    """
+    from planner import plan_run, DEFAULT_PRICE_INPUT, DEFAULT_PRICE_OUTPUT
+    from rules import build_rule_table
+    rule_table = build_rule_table(num2name) if args.rules else None
+    return plan_run(purchaser_names, num2name, num2desc, rule_table, probe_size,
+                    args.price_input or DEFAULT_PRICE_INPUT, args.price_output or DEFAULT_PRICE_OUTPUT)
+
+def main(argv=None):
+    args = parse_args(argv)
+    return tracing.run_instrumented(run, args)
+
+def prompt_categories():
+    """
+    交互输入分类文件路径并加载，打印加载的分类
+    返回：(分类文件路径, num2name, num2desc)，加载失败时 num2name 为 None
+    """
     categories_file = input("请输入分类文件路径（默认为'categories.json'）: ").strip()
     if not categories_file:
         categories_file = "categories.json"
     
     num2name, num2desc = load_categories_from_json(categories_file)
     if num2name is None or num2desc is None:
-        return
+        return categories_file, None, None
     
     # 显示加载的分类
     print(f"\n📋 加载的分类:")
     for num in sorted(num2name.keys()):
         print(f"   {num}: {num2name[num]} - {num2desc[num]}")
+    return categories_file, num2name, num2desc
+
+def run(args):
+    input_cache.set_cache_dir(None if args.no_input_cache else args.input_cache_dir)
+    rate_limiter.configure(args)
+    if args.cassette:
+        cassette = use_cassette(args.cassette, args.cassette_mode, args.replay_latency)
+        atexit.register(cassette.save)
+    budget = setup_token_budget(args)
+    if args.backends:
+        set_api_pool(load_backend_pool(args.backends, REQUEST_INTERVAL))
+        print(f"🔀 已加载 {len(core.api_pool.backends)} 个后端")
+    if args.backend != "remote":
+        set_backend(create_backend(args.backend, core.api_pool, local_url=args.local_url, local_model=args.local_model))
+        print(f"🧠 使用 {args.backend} 分类后端")
+    if args.stream and enable_streaming(core.backend):
+        print("📡 逐条分类使用流式响应")
+    if args.cascade:
+        fast_pool = load_backend_pool(args.cascade_backends, REQUEST_INTERVAL) if args.cascade_backends else core.api_pool
+        fast = create_fast_tier(args.cascade, fast_pool, local_url=args.local_url, local_model=args.local_model)
+        error = check_tiers(fast, core.backend)
+        if error:
+            print(f"❌ {error}")
+            return
+        set_backend(CascadeBackend(fast, core.backend, args.confidence_threshold, args.audit_rate))
+        print(f"🪜 模型级联：{args.cascade} 快速层 → {args.backend} 分类后端（置信度阈值 {args.confidence_threshold}，"
+              f"抽检 {args.audit_rate:.0%}）")
+    if args.inputs or args.config:
+        from batch import run_batch_from_args
+        run_batch_from_args(args)
+        return
     
-    # 2. 读取Excel数据
-    input_file = input("\n请输入Excel文件路径（默认为'合并后的表格.xlsx'）: ").strip()
+    # 1. 加载分类结果（--taxonomies 时加载多套分类体系，每个名称一次请求覆盖全部体系）
+    taxonomies = None
+    if args.taxonomies:
+        from multi_taxonomy import load_taxonomies, check_unsupported_options
+        print("🎯 招投标机构分类系统 - 多分类体系分类")
+        print("="*60)
+        if not check_unsupported_options(args):
+            return
+        taxonomies = load_taxonomies(args.taxonomies)
+        if taxonomies is None:
+            return
+    else:
+        print("🎯 招投标机构分类系统 - 全量数据分类")
+        print("="*60)
+        categories_file, num2name, num2desc = prompt_categories()
+        if num2name is None:
+            return
+    
+    if args.cache_file:
+        loaded = load_result_cache(args.cache_file)
+        print(f"💾 已加载 {loaded} 条历史分类缓存")
+    
+    # 2. 读取数据（支持 Excel/CSV/Parquet/JSONL，只读取名称列）
+    input_file = input("\n请输入数据文件路径（默认为'合并后的表格.xlsx'）: ").strip()
     if not input_file:
         input_file = "合并后的表格.xlsx"
     
     try:
-        df = pd.read_excel(input_file)
-        purchaser_names = df['Purchaser_Name'].astype(str).tolist()
+        name_column = args.column or "Purchaser_Name"
+        with span("load_input"):
+            extra_columns = [args.priority_column] if args.priority_column else []
+            df = load_input_table(input_file, name_column, args.id_column, extra_columns)
+        purchaser_names = df[name_column].tolist()
         print(f"✅ 成功读取数据，总数据量: {len(purchaser_names)}")
     except Exception as e:
         print(f"❌ 读取文件失败: {e}")
         return
     
-    # 3. 确认开始分类
-    print(f"\n⚠️ 即将开始对 {len(purchaser_names)} 条数据进行分类")
+    if args.reclassify:
+        from taxonomy import prepare_reclassification
+        try:
+            reclassify_summary = prepare_reclassification(num2name, num2desc, args.reclassify, categories_file,
+                                                          args.previous_categories, name_column)
+        except Exception as e:
+            print(f"❌ 读取历史分类结果失败: {e}")
+            return
+        if reclassify_summary is None:
+            return
     
-    # 根据数据量估算处理时间
-    if len(purchaser_names) > 100:
-        # 并发处理，速度更快
-        estimated_time = len(purchaser_names) * 0.1 / 60  # 0.1秒/条，考虑并发
-        print(f"💡 预计耗时: {estimated_time:.1f} 分钟 (并发处理)")
+    # 3. 确认开始分类
+    if taxonomies:
+        print(f"\n⚠️ 即将按 {len(taxonomies)} 套分类体系对 {len(purchaser_names)} 条数据进行分类")
     else:
-        # 单线程处理
-        estimated_time = len(purchaser_names) * 0.5 / 60
-        print(f"💡 预计耗时: {estimated_time:.1f} 分钟 (单线程处理)")
+        print(f"\n⚠️ 即将开始对 {len(purchaser_names)} 条数据进行分类")
+        
+        # 根据缓存、规则、并发数和请求频率估算处理时间（试运行时额外探测真实延迟）
+        plan = plan_from_args(purchaser_names, num2name, num2desc, args, args.probe_size if args.dry_run else 0)
+        if args.dry_run:
+            from planner import print_plan_report
+            print_plan_report(plan)
+            return
+        print(f"💡 需请求API {plan['需请求API名称数']} 条，预计耗时: {plan['预计耗时(分钟)']} 分钟，"
+              f"预计费用: {plan['预计费用(元)']} 元")
     
     confirm = input("是否继续？(y/n): ").strip().lower()
     if confirm not in ['y', 'yes', '是']:
         print("❌ 用户取消操作")
         return
     
-    # 4. 执行分类
-    all_classifications = classify_all_data(purchaser_names, num2name, num2desc)
-    
-    # 5. 保存结果
-    df['Classification'] = all_classifications
-    
-    output_file = input("\n请输入输出文件路径（默认为'classified_result.xlsx'）: ").strip()
+    # 4. 选择输出文件（分类过程中持续写入）
+    output_file = input("\n请输入输出文件路径（默认为'classified_result.xlsx'，支持 .csv/.jsonl/.parquet）: ").strip()
     if not output_file:
         output_file = "classified_result.xlsx"
     
+    # 5. 执行分类并保存结果
+    start_time = time.time()
     try:
-        df.to_excel(output_file, index=False)
+        rule_table = None
+        if args.rules:
+            from rules import build_rule_table
+            rule_table = build_rule_table(num2name)
+        checkpoint_callback = (lambda: save_result_cache(args.cache_file)) if args.cache_file else None
+        # 时长形式的截止时间从此刻（确认并选好输出文件之后）起算
+        deadline = start_deadline(args.deadline, args.deadline_reserve)
+        with span("classify", rows=len(purchaser_names)):
+            if taxonomies:
+                from multi_taxonomy import classify_multi_to_file
+                all_classifications = classify_multi_to_file(df, purchaser_names, taxonomies, output_file,
+                                                             max_workers=choose_max_workers(len(purchaser_names)),
+                                                             excel_split=args.excel_split or "sheets",
+                                                             schedule=args.schedule,
+                                                             priorities=read_priorities(df, args.priority_column))
+            else:
+                all_classifications = classify_to_file(df, purchaser_names, num2name, num2desc, output_file,
+                                                       max_workers=choose_max_workers(len(purchaser_names)),
+                                                       rule_table=rule_table, schedule=args.schedule,
+                                                       priorities=read_priorities(df, args.priority_column),
+                                                       checkpoint_every=args.checkpoint_every,
+                                                       checkpoint_callback=checkpoint_callback, deadline=deadline)
         print(f"✅ 分类结果已保存到 {output_file}")
+    except BudgetExceeded as e:
+        print(f"\n⛔ {e}")
+        print(f"💾 已按输入顺序写出的结果保存在 {output_file}")
+        if args.cache_file:
+            save_result_cache(args.cache_file)
+            print(f"💡 分类缓存已保存到 {args.cache_file}，下次运行将跳过已分类的名称")
+        print_budget_summary(budget)
+        return
     except Exception as e:
-        print(f"❌ 保存文件失败: {e}")
+        print(f"❌ 分类或保存文件失败: {e}")
         return
     
+    if args.cache_file:
+        save_result_cache(args.cache_file)
+        print(f"💾 分类缓存已保存到 {args.cache_file}")
+    
     # 6. 评估最终质量
-    print("\n📊 正在评估最终分类质量...")
-    final_report = evaluate_final_classification(all_classifications)
-    print_final_report(final_report)
+    if taxonomies:
+        from multi_taxonomy import evaluate_taxonomies, print_taxonomy_reports
+        print("\n📊 正在按分类体系分别评估分类质量...")
+        with span("evaluate"):
+            print_taxonomy_reports(evaluate_taxonomies(all_classifications))
+    else:
+        print("\n📊 正在评估最终分类质量...")
+        with span("evaluate"):
+            final_report = evaluate_final_classification(all_classifications)
+        print_final_report(final_report)
     
     # 7. 统计信息
     print(f"\n🎉 分类完成！")
     print(f"📁 输入文件: {input_file}")
-    print(f"📁 输出文件: {output_file}")
+    if taxonomies:
+        print(f"📁 输出文件: {output_file}（{', '.join(taxonomy.column for taxonomy in taxonomies)}）")
+    else:
+        print(f"📁 输出文件: {output_file}")
     print(f"📊 总处理数据: {len(purchaser_names)} 条")
     
-    # 根据处理方式显示时间
-    if len(purchaser_names) > 100:
-        print(f"⏱️ 处理时间: 约 {len(purchaser_names) * 0.1 / 60:.1f} 分钟 (并发处理)")
-    else:
-        print(f"⏱️ 处理时间: 约 {len(purchaser_names) * 0.5 / 60:.1f} 分钟 (单线程处理)")
+    print(f"⏱️ 处理时间: {(time.time() - start_time) / 60:.1f} 分钟")
+    if deadline is not None:
+        print_deadline_summary(deadline)
+    print_pool_summary(core.api_pool)
+    print_label_latency(core.backend)
+    print_cascade_summary(core.backend)
+    print_budget_summary(budget)
 
 if __name__ == "__main__":
     main() 
@@ -0,0 +1,678 @@
+"""
+分类核心库
+classify.py、get_class.py 以及批量、服务等模块共用的热路径代码：
+后端池与分类后端、结果缓存、运行统计、Token预算、单条/批量分类和有界并发调度。
+
+导入本模块不会加载 pandas / numpy / tqdm / requests，这些依赖在第一次真正用到时才导入，
+HTTP session 也在第一次请求时才创建。
+"""
+
+import time
+import json
+import threading
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from budget import BudgetExceeded
+from cassette import CassetteMiss
+from api_pool import Backend, BackendPool
+from backends import RemoteChatBackend, RetriesExhausted, request_limits
+from tracing import span, add_span, enabled as tracing_enabled
+
+# 也可以通过环境变量 DEEPSEEK_API_KEY 设置
+API_KEY = os.environ.get("DEEPSEEK_API_KEY", "your deepseek api key")
+API_URL = "https://api.deepseek.com/v1/chat/completions"
+
+# 同一后端相邻两次请求的最小间隔（秒），用于控制API请求频率
+REQUEST_INTERVAL = 0.1
+
+# 后端池：默认只有 API_URL/API_KEY 一个后端，可通过 --backends 加载多个Key/接口
+api_pool = BackendPool([Backend(API_URL, API_KEY, "deepseek-chat", REQUEST_INTERVAL, name="default")])
+
+def set_api_pool(pool):
+    global api_pool
+    api_pool = pool
+    # 默认远程后端随后端池一起更新
+    if backend.name == "remote":
+        set_backend(RemoteChatBackend(api_pool, stream=backend.stream))
+
+# 分类结果缓存：{分类体系指纹: {采购方名称: 类别名称}}，同一进程内跨文件复用
+result_cache = {}
+cache_lock = threading.Lock()
+
+# 运行统计，用于批量模式的汇总报告
+# api_requests 为发起的请求数（单条、批量或多体系请求各计一次），api_calls 为实际尝试次数（含重试）
+run_stats = {"api_requests": 0, "api_calls": 0, "cache_hits": 0, "rule_hits": 0, "failed_calls": 0,
+             "budget_fallbacks": 0, "deadline_fallbacks": 0}
+stats_lock = threading.Lock()
+
+# Token预算（budget.TokenBudget），为 None 时不做限制
+token_budget = None
+
+def set_token_budget(budget):
+    global token_budget
+    token_budget = budget
+
+def record_usage(usage):
+    """
+    把API响应中的 usage 计入Token预算
+    """
+    if token_budget is not None:
+        token_budget.record(usage)
+
+# 分类后端：默认为远程API，可通过 --backend 切换为本地推理服务或离线分类
+backend = None
+
+def set_backend(new_backend):
+    global backend
+    new_backend.usage_callback = record_usage
+    backend = new_backend
+
+set_backend(RemoteChatBackend(api_pool))
+
+def active_pool():
+    """
+    当前分类后端实际使用的后端池（本地推理服务有自己的不限速后端池）
+    """
+    return getattr(backend, "pool", api_pool)
+
+def budget_fallback_label(name, num2name):
+    """
+    预算耗尽时的本地兜底：先尝试后缀规则，未命中时归为"其他"
+    """
+    from rules import build_rule_table, apply_rules
+    record_stat("budget_fallbacks")
+    return apply_rules(name, build_rule_table(num2name)) or "其他"
+
+def record_stat(key, amount=1):
+    """
+    线程安全地累加运行统计
+    """
+    with stats_lock:
+        run_stats[key] = run_stats.get(key, 0) + amount
+
+def get_taxonomy_key(num2name, num2desc):
+    """
+    计算分类体系指纹，分类名称或描述变化后缓存自动失效
+    """
+    payload = json.dumps([num2name, num2desc], ensure_ascii=False, sort_keys=True)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+def lookup_cache(taxonomy_key, name):
+    with cache_lock:
+        return result_cache.get(taxonomy_key, {}).get(name)
+
+def store_cache(taxonomy_key, name, label):
+    with cache_lock:
+        result_cache.setdefault(taxonomy_key, {})[name] = label
+
+def load_result_cache(filename):
+    """
+    从JSON文件加载历史分类结果缓存（文件不存在时忽略）
+    """
+    if not filename or not os.path.exists(filename):
+        return 0
+    with open(filename, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    with cache_lock:
+        for taxonomy_key, labels in data.items():
+            result_cache.setdefault(taxonomy_key, {}).update(labels)
+    return sum(len(labels) for labels in data.values())
+
+def save_result_cache(filename):
+    """
+    将分类结果缓存保存为JSON文件
+    """
+    with cache_lock:
+        data = {key: dict(labels) for key, labels in result_cache.items()}
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def load_categories_from_json(filename="categories.json"):
+    """
+    从JSON文件加载分类结果
+    """
+    try:
+        with span("load_taxonomy"), open(filename, 'r', encoding='utf-8') as f:
+            categories_data = json.load(f)
+        
+        num2name = categories_data["num2name"]
+        num2desc = categories_data["num2desc"]
+        timestamp = categories_data.get("timestamp", "未知")
+        total_categories = categories_data.get("total_categories", len(num2name))
+        
+        print(f"✅ 成功加载分类结果")
+        print(f"📅 生成时间: {timestamp}")
+        print(f"📊 分类数量: {total_categories}")
+        if categories_data.get("taxonomy_hash"):
+            print(f"🔑 分类版本: {categories_data['taxonomy_hash'][:8]}")
+        
+        return num2name, num2desc
+    except FileNotFoundError:
+        print(f"❌ 找不到分类文件 {filename}")
+        print("💡 请先运行 get_class.py 生成分类结果")
+        return None, None
+    except Exception as e:
+        print(f"❌ 加载分类文件失败: {e}")
+        return None, None
+
+def classify_single_item(args, give_up_at=None):
+    """
+    对单个项目进行分类（用于并发处理）
+    give_up_at（time.monotonic）之后不再重试，截止时间模式下避免请求拖过截止时间
+    """
+    name, num2name, num2desc, index = args
+    
+    # 空名称（输入中的空单元格）直接归为"其他"，不请求API
+    if not name.strip():
+        return index, "其他"
+    
+    # 命中缓存时直接返回，不再请求API
+    taxonomy_key = get_taxonomy_key(num2name, num2desc)
+    cached_label = lookup_cache(taxonomy_key, name)
+    if cached_label is not None:
+        return index, cached_label
+    
+    # 接近Token预算时限速，耗尽时改用本地兜底（兜底结果不写入缓存）
+    if token_budget is not None and not token_budget.before_request():
+        return index, budget_fallback_label(name, num2name)
+    
+    # 后端内部的重试（如模型级联）同样在 give_up_at 之后停止
+    request_limits.give_up_at = give_up_at
+    record_stat("api_requests")
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            record_stat("api_calls")
+            # 由当前后端给出类别编号
+            result_clean = backend.classify_name(name, num2name, num2desc)
+            final_label = num2name.get(result_clean, "其他")
+            store_cache(taxonomy_key, name, final_label)
+            return index, final_label
+        except CassetteMiss:
+            # 回放录制缺少该请求时重试也不会命中，直接失败
+            raise
+        except RetriesExhausted:
+            # 后端内部已经重试过（如模型级联只重试升级请求），不再从头重试
+            break
+        except Exception as e:
+            if give_up_at is not None and time.monotonic() + 2 ** attempt >= give_up_at:
+                break
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)
+                continue
+    
+    # 如果所有重试都失败了，返回默认类别（不写入缓存，下次重新请求）
+    record_stat("failed_calls")
+    return index, "其他"
+
+def classify_with_desc(name, num2name, num2desc):
+    """
+    对单个名称进行分类（兼容单线程版本）
+    """
+    result = classify_single_item((name, num2name, num2desc, 0))
+    return result[1]
+
+def classify_batch_items(names, num2name, num2desc):
+    """
+    在一次API请求中对多个名称进行分类（用于实时服务的微批处理）
+    批量结果中缺失或无法识别的名称会退回逐条分类
+    """
+    taxonomy_key = get_taxonomy_key(num2name, num2desc)
+    labels = [lookup_cache(taxonomy_key, name) for name in names]
+    pending = [i for i, label in enumerate(labels) if label is None]
+    if not pending:
+        return labels
+    
+    if token_budget is not None and not token_budget.before_request():
+        for i in pending:
+            labels[i] = budget_fallback_label(names[i], num2name)
+        return labels
+    
+    pending_names = [names[i] for i in pending]
+    codes = [None] * len(pending)
+    record_stat("api_requests")
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            record_stat("api_calls")
+            codes = backend.classify_batch(pending_names, num2name, num2desc)
+            break
+        except CassetteMiss:
+            raise
+        except Exception as e:
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)
+                continue
+            record_stat("failed_calls")
+    
+    for position, i in enumerate(pending):
+        num = codes[position]
+        if isinstance(num, RetriesExhausted):
+            # 后端内部已重试仍失败，归为"其他"（不写入缓存），不再逐条重试
+            record_stat("failed_calls")
+            labels[i] = "其他"
+        elif num in num2name:
+            labels[i] = num2name[num]
+            store_cache(taxonomy_key, names[i], labels[i])
+        else:
+            labels[i] = classify_single_item((names[i], num2name, num2desc, i))[1]
+    return labels
+
+def traced_classify_item(func, args, submitted_at=None, give_up_at=None):
+    """
+    追踪时使用：记录任务在线程池中的排队时间和执行时间
+    """
+    started_at = time.perf_counter()
+    if submitted_at is not None:
+        add_span("queue_wait", submitted_at, started_at)
+    with span("classify_item"):
+        return func(args, give_up_at)
+
+def iter_classify_windowed(names, num2name, num2desc, max_workers=10, window=None, deadline=None):
+    """
+    逐条分类的有界并发调度：names 可以是任意可迭代对象（包括生成器），按完成顺序逐条产出 (序号, 类别名称)
+    """
+    items = ((name, num2name, num2desc, index) for index, name in enumerate(names))
+    return iter_windowed(classify_single_item, items, max_workers, window, deadline)
+
+def iter_windowed(func, items, max_workers=10, window=None, deadline=None, error_result="其他"):
+    """
+    有界并发窗口：同时在途的任务不超过 window 个，任务完成一个再从输入迭代器补充一个
+    items 中每项是以序号结尾的元组，由 func(item, give_up_at) 处理并返回 (序号, 结果)；按完成顺序逐条产出 (序号, 结果)，
+    任务出错时结果为 error_result。内存占用只与窗口大小有关，与输入总量无关
+    传入 deadline（deadline.Deadline）时在途任务数按观测吞吐规划（不在线程池中排队），
+    剩余时间不足以完成一次请求时停止提交；到点后立即返回，不等待在途请求，未产出的名称由调用方兜底
+    """
+    if window is None:
+        window = max_workers * 4
+    window = max(window, max_workers)
+    
+    item_iter = iter(items)
+    traced = tracing_enabled()
+    give_up_at = None
+    if deadline is not None:
+        give_up_at = deadline.stop_at
+        rate = active_pool().total_rate()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    in_flight = {}
+    
+    def submit_next():
+        for item in item_iter:
+            if traced:
+                future = executor.submit(traced_classify_item, func, item, time.perf_counter(), give_up_at)
+            else:
+                future = executor.submit(func, item, give_up_at)
+            in_flight[future] = (item[-1], time.monotonic())
+            return True
+        return False
+    
+    def fill():
+        if deadline is None:
+            while len(in_flight) < window and submit_next():
+                pass
+        else:
+            limit = deadline.concurrency(max_workers, rate)
+            while len(in_flight) < limit and deadline.can_submit() and submit_next():
+                pass
+    
+    try:
+        # 先填满窗口
+        fill()
+        
+        while in_flight:
+            timeout = None if deadline is None else max(deadline.remaining(), 0)
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # 截止时间到，在途请求不再等待
+                break
+            for future in done:
+                index, submitted_at = in_flight.pop(future)
+                try:
+                    _, result = future.result()
+                except (BudgetExceeded, CassetteMiss):
+                    raise
+                except Exception as e:
+                    print(f"\n❌ 处理第 {index + 1} 条数据时出错: {e}")
+                    result = error_result
+                if deadline is not None:
+                    deadline.observe(time.monotonic() - submitted_at)
+                # 每完成一个任务补充新任务，形成背压
+                fill()
+                yield index, result
+    finally:
+        # 正常结束时任务都已完成；截止时间模式下取消未开始的任务，也不等待在途请求（其结果仍会写入缓存）
+        # 因异常（预算耗尽、回放缺少录制等）提前结束时同样取消未开始的任务
+        if deadline is not None:
+            deadline.abandoned += len(in_flight)
+        executor.shutdown(wait=deadline is None, cancel_futures=deadline is not None or bool(in_flight))
+
+def classify_all_data_concurrent(purchaser_names, num2name, num2desc, max_workers=10, window=None):
+    """
+    使用并发对全量数据进行分类
+    """
+    print(f"\n🚀 开始对全量数据进行并发分类...")
+    print(f"📊 总数据量: {len(purchaser_names)}")
+    print(f"🔧 使用 {max_workers} 个线程进行并发处理")
+    
+    all_classifications = [None] * len(purchaser_names)  # 预分配结果列表
+    
+    from tqdm import tqdm
+    
+    # 使用tqdm显示进度
+    with tqdm(total=len(purchaser_names), desc="并发分类进度") as pbar:
+        results = iter_classify_windowed(purchaser_names, num2name, num2desc, max_workers, window)
+        for completed, (index, result) in enumerate(results, 1):
+            all_classifications[index] = result
+            pbar.update(1)
+            
+            # 每100条数据显示一次进度
+            if completed % 100 == 0:
+                print(f"\n📈 已处理 {completed}/{len(purchaser_names)} 条数据")
+    
+    return all_classifications
+
+def choose_max_workers(total):
+    """
+    根据数据量动态调整线程数，配置多个后端时按后端数量等比增加
+    """
+    if total > 1000:
+        base = 15
+    elif total > 500:
+        base = 10
+    elif total > 100:
+        base = 5
+    else:
+        return 1
+    return base * len(api_pool.backends)
+
+def classify_unique_names(purchaser_names, num2name, num2desc):
+    """
+    按数据量选择单线程或并发方式对名称列表逐条请求分类
+    """
+    # 根据数据量决定是否使用并发
+    if len(purchaser_names) > 100:
+        max_workers = choose_max_workers(len(purchaser_names))
+        return classify_all_data_concurrent(purchaser_names, num2name, num2desc, max_workers)
+    else:
+        # 小数据量使用单线程
+        from tqdm import tqdm
+        print(f"\n🚀 开始对全量数据进行分类...")
+        print(f"📊 总数据量: {len(purchaser_names)}")
+        
+        all_classifications = []
+        pbar = tqdm(total=len(purchaser_names), desc="全量数据分类进度")
+        
+        for i, name in enumerate(purchaser_names):
+            try:
+                # classify_with_desc 已返回类别名称，无需再按编号映射
+                final_label = classify_with_desc(name, num2name, num2desc)
+                all_classifications.append(final_label)
+                
+                # 更新进度条
+                pbar.update(1)
+                
+                # 控制请求频率
+                time.sleep(0.5)
+                
+                # 每100条数据显示一次进度
+                if (i + 1) % 100 == 0:
+                    print(f"\n📈 已处理 {i + 1}/{len(purchaser_names)} 条数据")
+                    
+            except CassetteMiss:
+                raise
+            except Exception as e:
+                print(f"\n❌ 处理第 {i + 1} 条数据时出错: {e}")
+                all_classifications.append("其他")  # 出错时归为"其他"
+                pbar.update(1)
+        
+        pbar.close()
+        return all_classifications
+
+def classify_all_data(purchaser_names, num2name, num2desc):
+    """
+    对全量数据进行分类（保持向后兼容）
+    重复名称和已缓存的名称只请求一次，结果按原顺序展开
+    """
+    taxonomy_key = get_taxonomy_key(num2name, num2desc)
+    with cache_lock:
+        cached = dict(result_cache.get(taxonomy_key, {}))
+    pending_names = list(dict.fromkeys(name for name in purchaser_names if name not in cached))
+    
+    cache_hits = len(purchaser_names) - len(pending_names)
+    record_stat("cache_hits", cache_hits)
+    if cache_hits:
+        print(f"\n💾 缓存/重复命中 {cache_hits} 条，需请求API {len(pending_names)} 条")
+    
+    if pending_names:
+        pending_labels = classify_unique_names(pending_names, num2name, num2desc)
+        cached.update(zip(pending_names, pending_labels))
+    
+    return [cached[name] for name in purchaser_names]
+
+SCHEDULE_MODES = ("frequency", "file")
+
+def name_priorities(purchaser_names, weights=None):
+    """
+    每个名称的优先级：默认是出现的行数，给出 weights（如合同金额列）时为该名称各行权重之和
+    """
+    scores = {}
+    if weights is None:
+        for name in purchaser_names:
+            scores[name] = scores.get(name, 0) + 1
+    else:
+        for name, weight in zip(purchaser_names, weights):
+            scores[name] = scores.get(name, 0) + weight
+    return scores
+
+def prioritize_names(pending_names, scores):
+    """
+    按优先级从高到低排列待请求的名称（同优先级保持原顺序），中途停止时已分类的行覆盖面最大
+    """
+    return sorted(pending_names, key=lambda name: -scores.get(name, 0))
+
+def partial_output_path(output_file):
+    base, ext = os.path.splitext(output_file)
+    return f"{base}_partial{ext}"
+
+def write_partial_output(df, purchaser_names, resolved, output_file, excel_split="sheets", sources=None):
+    """
+    检查点：把已得到类别的行（按输入顺序）写到 <输出文件>_partial，未分类的行不写出
+    先写临时文件再替换，读取方不会看到写了一半的文件
+    传入 sources（{名称: 来源}，未记录的为缓存）时额外写出 Label_Source 列
+    """
+    from data_io import open_result_sink
+    
+    path = partial_output_path(output_file)
+    base, ext = os.path.splitext(path)
+    tmp_path = f"{base}.tmp{ext}"
+    columns = list(df.columns) + ['Classification'] + (['Label_Source'] if sources is not None else [])
+    sink = open_result_sink(tmp_path, columns, excel_split=excel_split, column_types=df.dtypes.to_dict())
+    rows = []
+    for name, row in zip(purchaser_names, df.itertuples(index=False, name=None)):
+        label = resolved.get(name)
+        if label is not None:
+            rows.append(row + ((label,) if sources is None else (label, sources.get(name, "cache"))))
+            if len(rows) >= 10000:
+                sink.write_rows(rows)
+                rows = []
+    sink.write_rows(rows)
+    sink.close()
+    os.replace(tmp_path, path)
+    return path
+
+def classify_to_file(df, purchaser_names, num2name, num2desc, output_file, max_workers=10, excel_split="sheets",
+                     rule_table=None, schedule="frequency", priorities=None, checkpoint_every=0,
+                     checkpoint_callback=None, deadline=None):
+    """
+    边分类边写出结果：去重后的名称并发请求，按输入顺序把已得到类别的行持续写入输出文件
+    传入 rule_table 时，命中本地后缀规则的名称不再请求API
+    schedule="frequency" 时按名称出现的行数（或 priorities 给出的每行权重之和）从高到低请求，
+    schedule="file" 时按输入顺序请求
+    checkpoint_every > 0 时每完成这么多个名称写一次检查点（见 write_partial_output），并调用 checkpoint_callback()
+    传入 deadline（deadline.Deadline）时只在截止时间前请求大模型，剩余名称用本地兜底补齐，
+    并在输出中增加 Label_Source 列（llm / cache / rules / offline / default）
+    返回：全部行的类别（labels.LabelCodes，每行1字节编码）
+    """
+    from labels import LabelCodes
+    
+    taxonomy_key = get_taxonomy_key(num2name, num2desc)
+    with cache_lock:
+        resolved = dict(result_cache.get(taxonomy_key, {}))
+    pending_names = list(dict.fromkeys(name for name in purchaser_names if name not in resolved))
+    record_stat("cache_hits", len(purchaser_names) - len(pending_names))
+    # 各名称类别的来源，只在截止时间模式下记录；没有记录的名称来自缓存
+    sources = {} if deadline is not None else None
+    
+    if rule_table:
+        from rules import apply_rules
+        unmatched = []
+        for name in pending_names:
+            label = apply_rules(name, rule_table)
+            if label is None:
+                unmatched.append(name)
+            else:
+                resolved[name] = label
+                if sources is not None:
+                    sources[name] = "rules"
+        record_stat("rule_hits", len(pending_names) - len(unmatched))
+        pending_names = unmatched
+    
+    print(f"\n🚀 开始分类并流式写出到 {output_file}")
+    print(f"📊 总数据量: {len(purchaser_names)}，需请求API {len(pending_names)} 条")
+    if deadline is not None:
+        deadline.prepare(len(purchaser_names), len(pending_names), output_file, active_pool())
+        deadline.print_plan(len(pending_names), max_workers, active_pool().total_rate())
+    
+    columns = list(df.columns) + ['Classification'] + (['Label_Source'] if sources is not None else [])
+    all_classifications = LabelCodes.from_taxonomy(num2name)
+    
+    def row_labels(name, label):
+        if sources is None:
+            return (label,)
+        return (label, sources.get(name, "cache"))
+    
+    def on_row(name, label):
+        all_classifications.append(label)
+        if sources is not None:
+            deadline.source_rows[sources.get(name, "cache")] += 1
+    
+    def on_result(name, label):
+        if sources is not None:
+            sources[name] = "llm"
+    
+    def checkpoint(coverage):
+        path = write_partial_output(df, purchaser_names, resolved, output_file, excel_split, sources)
+        print(f"\n💾 检查点：已覆盖 {coverage:.1%} 的行，部分结果已写出到 {path}")
+        if checkpoint_callback is not None:
+            checkpoint_callback()
+    
+    def finish(unresolved):
+        # 截止时间到：未得到结果的名称用本地兜底补齐后写出剩余行
+        if deadline is None or not unresolved:
+            return
+        print(f"\n⏰ 截止时间到，{len(unresolved)} 个名称改用本地兜底（缓存 → 规则 → 离线分类 → 其他）")
+        with span("deadline_fallback", names=len(unresolved)):
+            for name, (label, source) in deadline.fallback_labels(unresolved, num2name, num2desc,
+                                                                  rule_table).items():
+                resolved[name] = label
+                sources[name] = source
+    
+    def classify_name(name, give_up_at):
+        return classify_single_item((name, num2name, num2desc, 0), give_up_at)[1]
+    
+    stream_classify_to_file(df, purchaser_names, resolved, pending_names, classify_name, output_file, columns,
+                            row_labels, on_row, on_result=on_result, max_workers=max_workers,
+                            excel_split=excel_split, schedule=schedule, priorities=priorities,
+                            checkpoint_every=checkpoint_every, checkpoint=checkpoint, deadline=deadline,
+                            finish=finish)
+    return all_classifications
+
+def stream_classify_to_file(df, purchaser_names, resolved, pending_names, classify_name, output_file, columns,
+                            row_labels, on_row, on_result=None, max_workers=10, excel_split="sheets",
+                            schedule="frequency", priorities=None, checkpoint_every=0, checkpoint=None,
+                            deadline=None, finish=None, error_result="其他", desc="并发分类进度"):
+    """
+    逐名称并发分类并按输入顺序流式写出的公共流程（classify_to_file 和 multi_taxonomy.classify_multi_to_file 共用）
+    resolved 为 {名称: 结果}，已有结果的名称直接写出，运行中得到的结果也写入其中；pending_names 为需要请求的名称
+    - classify_name(name, give_up_at) 返回一个名称的结果（出错时该名称的结果为 error_result）
+    - row_labels(name, result) 返回追加在原始行后面的列值，on_row(name, result) 在每行写出时调用
+    - on_result(name, result) 在每个名称得到结果时调用
+    - checkpoint(已覆盖行比例) 每完成 checkpoint_every 个名称和预算耗尽时调用
+    - finish(未得到结果的名称) 在并发分类结束后（如截止时间到）调用，由调用方补齐 resolved
+    schedule="frequency" 时按名称出现的行数（或 priorities 给出的每行权重之和）从高到低请求，
+    schedule="file" 时按输入顺序请求
+    """
+    from tqdm import tqdm
+    from data_io import open_result_sink, OrderedResultWriter
+    
+    # 按行数统计覆盖率；按频次或优先级列排序待请求的名称
+    row_counts = name_priorities(purchaser_names)
+    if schedule == "frequency" and pending_names:
+        scores = row_counts if priorities is None else name_priorities(purchaser_names, priorities)
+        pending_names = prioritize_names(pending_names, scores)
+    covered_rows = len(purchaser_names) - sum(row_counts[name] for name in pending_names)
+    
+    row_iter = df.itertuples(index=False, name=None)
+    written = 0
+    sink = open_result_sink(output_file, columns, excel_split=excel_split, column_types=df.dtypes.to_dict())
+    with OrderedResultWriter(sink) as writer:
+        def write_ready_rows():
+            # 输入顺序中下一行的名称已有结果时即可写出
+            nonlocal written
+            while written < len(purchaser_names) and purchaser_names[written] in resolved:
+                name = purchaser_names[written]
+                result = resolved[name]
+                writer.push(written, next(row_iter) + tuple(row_labels(name, result)))
+                on_row(name, result)
+                written += 1
+        
+        def classify_item(item, give_up_at=None):
+            name, index = item
+            return index, classify_name(name, give_up_at)
+        
+        write_ready_rows()
+        items = ((name, index) for index, name in enumerate(pending_names))
+        with tqdm(total=len(pending_names), desc=desc) as pbar:
+            try:
+                for completed, (index, result) in enumerate(
+                        iter_windowed(classify_item, items, max_workers, deadline=deadline,
+                                      error_result=error_result), 1):
+                    name = pending_names[index]
+                    resolved[name] = result
+                    if on_result is not None:
+                        on_result(name, result)
+                    covered_rows += row_counts[name]
+                    pbar.update(1)
+                    write_ready_rows()
+                    if (checkpoint is not None and checkpoint_every and completed % checkpoint_every == 0
+                            and completed < len(pending_names)):
+                        checkpoint(covered_rows / len(purchaser_names))
+            except BudgetExceeded:
+                # 中途停止时把已分类的高优先级名称对应的行全部写出
+                if checkpoint is not None:
+                    checkpoint(covered_rows / len(purchaser_names))
+                raise
+        
+        if finish is not None:
+            finish([name for name in pending_names if name not in resolved])
+            write_ready_rows()
+    
+    if len(writer.paths) > 1:
+        print(f"📄 超出Excel行数上限，已拆分为 {len(writer.paths)} 个文件: {writer.paths}")
+    return writer.paths
+
+def calculate_gini_coefficient(values):
+    """
+    计算基尼系数，用于衡量分布的不均衡程度
+    基尼系数越小，分布越均衡
+    """
+    import numpy as np
+    
+    if len(values) == 0:
+        return 0
+    
+    values = sorted(values)
+    n = len(values)
+    cumsum = np.cumsum(values)
+    return (n + 1 - 2 * np.sum(cumsum) / cumsum[-1]) / n
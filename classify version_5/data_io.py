@@ -0,0 +1,292 @@
+"""
+输入数据读取与分类结果的流式输出
+- load_input_table：读取 CSV / Parquet / JSONL / Excel，只解析名称列（及可选的ID列）
+- OrderedResultWriter：重排缓冲区，乱序完成的结果按输入顺序写出
+- 支持 CSV / JSONL / Parquet / Excel，运行过程中边分类边写入
+- xlsx 只能在结束时整体保存，Excel 输出先逐批写入同名的 .rows.jsonl 暂存文件（运行中断时已写出的行仍在其中），
+  结束时再转换为 xlsx 并删除暂存文件
+- Excel 超过单表行数上限（1,048,576行）时自动拆分为多个工作表或多个文件
+"""
+
+import csv
+import json
+import os
+
+from tracing import span
+from input_cache import load_cached, store_cached
+
+# Excel 单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+
+def _module_available(name):
+    import importlib.util
+    return importlib.util.find_spec(name) is not None
+
+def _names_as_str(names):
+    """
+    名称列统一转为字符串；空单元格转为空字符串（pandas 3 的 astype(str) 会保留 NaN）
+    """
+    return names.fillna("").astype(str)
+
+def load_input_table(path, name_column="Purchaser_Name", id_column=None, extra_columns=()):
+    """
+    按扩展名读取输入文件，只读取名称列、可选的ID列和 extra_columns（如优先级列），并为每种格式选用可用的最快引擎
+    Excel/CSV/JSONL 第一次解析后保存列式缓存（见 input_cache.py），之后直接内存映射读取
+    返回：只包含所需列的 DataFrame，名称列统一转为字符串（空单元格为空字符串）
+    """
+    import pandas as pd
+    
+    columns = [id_column, name_column] if id_column else [name_column]
+    columns += [column for column in extra_columns if column not in columns]
+    ext = os.path.splitext(path)[1].lower()
+    has_pyarrow = _module_available("pyarrow")
+    # Parquet 本身就是列式格式，无需再缓存
+    use_cache = ext not in ('.parquet', '.pq')
+    
+    if use_cache:
+        df = load_cached(path, columns)
+        if df is not None:
+            print(f"⚡ 使用输入缓存，跳过解析 {os.path.basename(path)}")
+            df[name_column] = _names_as_str(df[name_column])
+            return df
+    
+    if ext in ('.parquet', '.pq'):
+        if has_pyarrow:
+            import pyarrow.parquet as pq
+            df = pq.read_table(path, columns=columns).to_pandas()
+        else:
+            df = pd.read_parquet(path, columns=columns)
+    elif ext in ('.csv', '.tsv', '.txt'):
+        sep = '\t' if ext == '.tsv' else ','
+        engine = "pyarrow" if has_pyarrow else "c"
+        df = pd.read_csv(path, sep=sep, usecols=columns, dtype=str, engine=engine)
+    elif ext in ('.jsonl', '.ndjson'):
+        if has_pyarrow:
+            import pyarrow.json as pa_json
+            df = pa_json.read_json(path).select(columns).to_pandas()
+        else:
+            # 分块读取，每块只保留所需列，避免整表常驻内存
+            chunks = pd.read_json(path, lines=True, dtype=False, chunksize=100000)
+            df = pd.concat([chunk[columns] for chunk in chunks], ignore_index=True)
+    elif ext in ('.xlsx', '.xlsm', '.xls'):
+        engine = "calamine" if _module_available("python_calamine") else None
+        df = pd.read_excel(path, usecols=columns, engine=engine)
+    else:
+        raise ValueError(f"不支持的输入格式: {ext}（支持 .csv/.parquet/.jsonl/.xlsx）")
+    
+    df = df[columns]
+    if use_cache:
+        store_cached(path, columns, df)
+    df[name_column] = _names_as_str(df[name_column])
+    return df
+
+class CsvSink:
+    def __init__(self, path, columns):
+        # utf-8-sig 便于 Excel 直接打开中文 CSV
+        self.file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+        self.paths = [path]
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class JsonlSink:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.columns = columns
+        self.paths = [path]
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False, default=str))
+            self.file.write('\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def _arrow_type(pa, dtype):
+    """
+    输入列的 pandas 类型对应的 Arrow 类型：数值、布尔和时间列保持原类型，其余（文本、object）写成字符串
+    """
+    import pandas as pd
+    if dtype is None:
+        return pa.string()
+    if pd.api.types.is_bool_dtype(dtype):
+        return pa.bool_()
+    if pd.api.types.is_integer_dtype(dtype):
+        return pa.int64()
+    if pd.api.types.is_float_dtype(dtype):
+        return pa.float64()
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pa.timestamp("ns")
+    return pa.string()
+
+class ParquetSink:
+    """
+    每批行写成一个 row group，需要安装 pyarrow
+    类别列（dictionary_columns）写成字典编码列，读回 pandas 时直接是 Categorical
+    表结构在打开时按 column_types（{列名: pandas 类型}，通常是输入表的 dtypes）确定，
+    不从第一批数据推断：第一批中全为空值的列不会被推断成 null 类型而导致后续批次无法写入
+    """
+    def __init__(self, path, columns, dictionary_columns=("Classification",), column_types=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("写入 Parquet 需要安装 pyarrow：pip install pyarrow")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.columns = columns
+        self.dictionary_columns = set(dictionary_columns)
+        column_types = column_types or {}
+        self.schema = pa.schema([
+            (column, pa.dictionary(pa.int32(), pa.string()) if column in self.dictionary_columns
+             else _arrow_type(pa, column_types.get(column)))
+            for column in columns
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.paths = [path]
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        arrays = []
+        for i, field in enumerate(self.schema):
+            values = [row[i] for row in rows]
+            if self.pa.types.is_dictionary(field.type):
+                arrays.append(self.pa.array(values, type=self.pa.string()).dictionary_encode().cast(field.type))
+            elif self.pa.types.is_string(field.type):
+                arrays.append(self.pa.array([None if value is None else str(value) for value in values],
+                                            type=field.type, from_pandas=True))
+            else:
+                arrays.append(self.pa.array(values, type=field.type, from_pandas=True))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        # 没有任何数据时也是只有表头的空文件
+        self.writer.close()
+
+class ExcelSink:
+    """
+    运行过程中把行写入暂存文件 <输出文件>.rows.jsonl（每行一个JSON数组，保留数值类型），
+    close() 时用 openpyxl 只写模式转换为 xlsx：
+    split="sheets" 时超出行数上限新建工作表，split="files" 时新建 _part2.xlsx 等文件
+    """
+    def __init__(self, path, columns, split="sheets", max_rows=EXCEL_MAX_ROWS):
+        from openpyxl import Workbook
+        self.Workbook = Workbook
+        self.base_path = path
+        self.columns = columns
+        self.split = split
+        self.max_data_rows = max_rows - 1
+        self.paths = [path]
+        self.workbook = None
+        self.part = 0
+        self.spool_path = path + ".rows.jsonl"
+        self.spool = open(self.spool_path, 'w', encoding='utf-8')
+        self.rows = 0
+
+    def _new_workbook(self):
+        if self.workbook is not None:
+            self.workbook.save(self.paths[-1])
+        self.part += 1
+        base, ext = os.path.splitext(self.base_path)
+        self.paths.append(self.base_path if self.part == 1 else f"{base}_part{self.part}{ext}")
+        self.workbook = self.Workbook(write_only=True)
+        self.sheet_count = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.sheet_count += 1
+        self.sheet = self.workbook.create_sheet(f"Sheet{self.sheet_count}")
+        self.sheet.append(self.columns)
+        self.sheet_rows = 0
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.spool.write(json.dumps(list(row), ensure_ascii=False, default=str))
+            self.spool.write('\n')
+        self.spool.flush()
+        self.rows += len(rows)
+
+    def close(self):
+        self.spool.close()
+        self.paths = []
+        self._new_workbook()
+        with span("excel_convert", rows=self.rows):
+            with open(self.spool_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if self.sheet_rows >= self.max_data_rows:
+                        if self.split == "files":
+                            self._new_workbook()
+                        else:
+                            self._new_sheet()
+                    self.sheet.append(json.loads(line))
+                    self.sheet_rows += 1
+            self.workbook.save(self.paths[-1])
+        os.remove(self.spool_path)
+
+def open_result_sink(path, columns, excel_split="sheets", column_types=None):
+    """
+    按文件扩展名选择输出格式；column_types（{列名: pandas 类型}）用于确定 Parquet 的表结构
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return CsvSink(path, columns)
+    if ext in ('.jsonl', '.ndjson'):
+        return JsonlSink(path, columns)
+    if ext in ('.parquet', '.pq'):
+        return ParquetSink(path, columns, column_types=column_types)
+    if ext in ('.xlsx', '.xlsm'):
+        return ExcelSink(path, columns, split=excel_split)
+    raise ValueError(f"不支持的输出格式: {ext}（支持 .csv/.jsonl/.parquet/.xlsx）")
+
+class OrderedResultWriter:
+    """
+    重排缓冲区：push 可以乱序调用，数据按序号从 start_index 开始连续写出
+    缓冲区只保存尚未轮到写出的行，写出的行凑满 flush_rows 后批量交给输出端
+    """
+    def __init__(self, sink, start_index=0, flush_rows=1000):
+        self.sink = sink
+        self.next_index = start_index
+        self.flush_rows = flush_rows
+        self.buffer = {}
+        self.ready = []
+        self.rows_written = 0
+
+    def push(self, index, row):
+        self.buffer[index] = row
+        while self.next_index in self.buffer:
+            self.ready.append(self.buffer.pop(self.next_index))
+            self.next_index += 1
+        if len(self.ready) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if self.ready:
+            with span("write", rows=len(self.ready)):
+                self.sink.write_rows(self.ready)
+            self.rows_written += len(self.ready)
+            self.ready = []
+
+    def close(self):
+        self.flush()
+        if self.buffer:
+            print(f"⚠️ 仍有 {len(self.buffer)} 条结果因前序数据缺失未能写出")
+        self.sink.close()
+
+    @property
+    def paths(self):
+        return self.sink.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
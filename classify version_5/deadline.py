@@ -0,0 +1,214 @@
+"""
+截止时间模式（--deadline）
+在给定的墙钟时间内尽量多地把名称交给大模型分类，到点后剩余名称立即用最快的本地兜底补齐：
+缓存 → 后缀规则 → 离线分类（字符二元组）→ "其他"，输出中用 Label_Source 列记录每行类别的来源。
+
+- 在途请求数按观测吞吐规划：单次请求延迟 × 后端合计请求速率，刚好跑满频率限制，不在线程池中排队
+- 剩余时间不足以完成一次请求（按已观测延迟的 p90 估计）时停止提交新请求
+- 到点后不再等待在途请求（线程池 shutdown(wait=False, cancel_futures=True)），迟到的结果只写入缓存
+- 截止时间前预留写出剩余行所需的时间（按行数估算，可用 --deadline-reserve 指定秒数）
+"""
+
+import argparse
+import datetime
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from core import get_taxonomy_key, lookup_cache, record_stat
+from rules import build_rule_table, apply_rules
+from backends import OfflineBackend
+from planner import DEFAULT_LATENCY
+
+# 类别来源：输出文件 Label_Source 列的取值
+SOURCE_NAMES = {
+    "llm": "大模型",
+    "cache": "缓存",
+    "rules": "后缀规则",
+    "offline": "离线分类",
+    "default": "默认其他",
+}
+
+# 预留时间估算：固定开销 + 每行写出耗时 + 每个兜底名称的离线分类耗时（秒）
+BASE_RESERVE = 3.0
+ROW_WRITE_SECONDS = {".xlsx": 5e-5, ".parquet": 5e-6}
+DEFAULT_ROW_WRITE_SECONDS = 1e-5
+FALLBACK_SECONDS = 2e-5
+
+_DURATION_PATTERN = re.compile(r"(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s?)?")
+_CLOCK_PATTERN = re.compile(r"(\d{1,2}):(\d{2})(?::(\d{2}))?")
+
+def parse_deadline(value, now=None):
+    """
+    把截止时间换算为时间戳（time.time()）：
+    - "18:30" / "18:30:00"：今天的该时刻，已经过去时为明天
+    - "600" / "600s" / "45m" / "2h" / "1h30m"：从现在起的时长
+    """
+    now = time.time() if now is None else now
+    value = value.strip().lower()
+    clock = _CLOCK_PATTERN.fullmatch(value)
+    if clock:
+        hour, minute, second = int(clock.group(1)), int(clock.group(2)), int(clock.group(3) or 0)
+        if hour > 23 or minute > 59 or second > 59:
+            raise ValueError(f"无效的截止时刻: {value}")
+        current = datetime.datetime.fromtimestamp(now)
+        target = current.replace(hour=hour, minute=minute, second=second, microsecond=0)
+        if target <= current:
+            target += datetime.timedelta(days=1)
+        return target.timestamp()
+    duration = _DURATION_PATTERN.fullmatch(value)
+    if value and duration:
+        hours, minutes, seconds = (float(part or 0) for part in duration.groups())
+        return now + hours * 3600 + minutes * 60 + seconds
+    raise ValueError(f"无法识别的截止时间: {value}（如 18:30、45m、1h30m、600）")
+
+def deadline_arg(value):
+    """
+    argparse 类型：只校验格式，开始分类时才换算（时长从开始分类时起算）
+    """
+    try:
+        parse_deadline(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def estimate_reserve(rows, fallback_names, output_file):
+    """
+    估算写出剩余行与本地兜底所需的时间（秒）
+    """
+    ext = os.path.splitext(output_file)[1].lower()
+    row_seconds = ROW_WRITE_SECONDS.get(ext, DEFAULT_ROW_WRITE_SECONDS)
+    return BASE_RESERVE + rows * row_seconds + fallback_names * FALLBACK_SECONDS
+
+def observed_latency(pool):
+    """
+    后端池中已成功请求的平均延迟（秒），没有记录时返回 None
+    """
+    successes = sum(backend.stats["successes"] for backend in pool.backends)
+    if not successes:
+        return None
+    return sum(backend.stats["latency"] for backend in pool.backends) / successes
+
+class Deadline:
+    def __init__(self, at, reserve=None):
+        self.at = at
+        # 内部用 monotonic 计时，不受系统时钟调整影响
+        self.end = time.monotonic() + (at - time.time())
+        self.reserve = reserve
+        self.stop_at = self.end
+        self.latencies = deque(maxlen=500)
+        self.lock = threading.Lock()
+        self.abandoned = 0
+        self.fallbacks = 0
+        self.source_rows = Counter()
+
+    def prepare(self, rows, pending_names, output_file, pool):
+        """
+        每个输出文件开始分类前调用：按行数扣除预留时间，并用后端池已有的延迟记录作为初始估计
+        """
+        reserve = self.reserve
+        if reserve is None:
+            reserve = estimate_reserve(rows, pending_names, output_file)
+        self.stop_at = self.end - reserve
+        latency = observed_latency(pool)
+        if latency is not None and not self.latencies:
+            self.latencies.append(latency)
+        return reserve
+
+    def remaining(self):
+        """
+        距离停止请求大模型还有多少秒（已扣除预留时间）
+        """
+        return self.stop_at - time.monotonic()
+
+    def observe(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+
+    def expected_latency(self, quantile=0.9):
+        with self.lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return DEFAULT_LATENCY
+        return samples[int(quantile * (len(samples) - 1))]
+
+    def can_submit(self):
+        """
+        剩余时间足够完成一次请求（按 p90 延迟估计）时才提交新请求
+        """
+        return self.remaining() > self.expected_latency()
+
+    def concurrency(self, max_workers, rate):
+        """
+        跑满请求频率限制所需的在途请求数：吞吐 × 中位延迟（Little 定律），留 20% 余量，不超过线程数
+        """
+        if math.isinf(rate):
+            return max_workers
+        needed = math.ceil(rate * self.expected_latency(0.5) * 1.2)
+        return max(1, min(max_workers, needed))
+
+    def print_plan(self, pending, max_workers, rate):
+        remaining = max(self.remaining(), 0.0)
+        latency = self.expected_latency(0.5)
+        workers = self.concurrency(max_workers, rate)
+        throughput = min(workers / latency, rate)
+        print(f"⏰ 截止时间 {time.strftime('%H:%M:%S', time.localtime(self.at))}，"
+              f"可用于请求的时间 {remaining:.0f} 秒，在途请求 {workers} 个")
+        print(f"💡 按当前吞吐约 {throughput:.1f} 条/秒，预计截止前可请求 "
+              f"{min(pending, int(throughput * remaining))}/{pending} 个名称，其余使用本地兜底")
+
+    def fallback_labels(self, names, num2name, num2desc, rule_table=None):
+        """
+        最快的本地兜底：缓存 → 后缀规则 → 离线分类 → "其他"，返回 {名称: (类别名称, 来源)}
+        兜底结果不写入缓存，下次运行仍会请求大模型
+        """
+        taxonomy_key = get_taxonomy_key(num2name, num2desc)
+        rule_table = rule_table or build_rule_table(num2name)
+        offline = OfflineBackend()
+        results = {}
+        for name in names:
+            label = lookup_cache(taxonomy_key, name)
+            if label is not None:
+                results[name] = (label, "cache")
+                continue
+            label = apply_rules(name, rule_table)
+            if label is not None:
+                results[name] = (label, "rules")
+                continue
+            label = num2name.get(offline.classify_name(name, num2name, num2desc), "其他")
+            results[name] = (label, "offline") if label != "其他" else ("其他", "default")
+        self.fallbacks += len(names)
+        record_stat("deadline_fallbacks", len(names))
+        return results
+
+    def summary(self):
+        finished = self.end - time.monotonic()
+        return {
+            "截止时间": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.at)),
+            "结束时距截止(秒)": round(finished, 1),
+            "兜底名称数": self.fallbacks,
+            "放弃的在途请求": self.abandoned,
+            "类别来源(行)": {SOURCE_NAMES.get(source, source): rows for source, rows in self.source_rows.most_common()},
+        }
+
+def start_deadline(value, reserve=None):
+    """
+    开始分类时换算截止时间；value 为空时返回 None（不启用截止时间模式）
+    """
+    if not value:
+        return None
+    return Deadline(parse_deadline(value), reserve)
+
+def print_deadline_summary(deadline):
+    report = deadline.summary()
+    print(f"\n⏰ 截止时间模式:")
+    for item, value in report.items():
+        if item != "类别来源(行)":
+            print(f"   {item}: {value}")
+    total = sum(deadline.source_rows.values()) or 1
+    print(f"   各来源行数:")
+    for source, rows in deadline.source_rows.most_common():
+        print(f"      {SOURCE_NAMES.get(source, source)}: {rows} ({rows / total:.1%})")
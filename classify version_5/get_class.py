@@ -1,194 +1,62 @@
-import pandas as pd
-import requests
-from tqdm import tqdm
 import time
+import atexit
 import random
-import numpy as np
-from collections import Counter
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
-
-API_KEY = "your deepseek api key"
-API_URL = "https://api.deepseek.com/v1/chat/completions"
-
-# 线程锁，用于控制API请求频率
-request_lock = threading.Lock()
-
-# 创建带有重试机制的session
-def create_session():
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=3,  # 总重试次数
-        backoff_factor=1,  # 重试间隔
-        status_forcelist=[429, 500, 502, 503, 504],  # 需要重试的HTTP状态码
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
-
-# 全局session
-session = create_session()
+import argparse
+from data_io import load_input_table
+from budget import TokenBudget
+from backends import BACKEND_KINDS, DEFAULT_LOCAL_URL, create_backend, enable_streaming, print_label_latency
+from cassette import CASSETTE_MODES, CassetteMiss, parse_latency, use_cassette
+import tracing
+import input_cache
+import rate_limiter
+from tracing import span
+from prompts import DEFAULT_NUM2NAME, DEFAULT_NUM2DESC
+from labels import count_labels
+from sampling import SAMPLING_MODES, NameSampler
+from taxonomy import diff_taxonomies, print_taxonomy_diff, plan_reclassification
+import core
+from core import (
+    set_backend, set_token_budget,
+    classify_single_item, classify_with_desc, iter_classify_windowed, calculate_gini_coefficient,
+)
 
 def get_categories_with_desc(purchaser_names):
     """
     让API总结10个最合适的分类（含其他），并为每个类别写一句简要解释。
     返回：编号到名称的映射、编号到解释的映射
     """
-    prompt = (
-        f"以下是{len(purchaser_names)}个采购方名称，请你根据内容总结出10个最合适的分类（其中一个为'其他'），"
-        "并为每个类别写一句简要解释。请用如下格式输出：\n"
-        "类别1：政府机构：负责行政管理的机构\n类别2：教育机构：负责教育教学的机构\n...（用中文，不要其他内容）\n"
-        + "\n".join(purchaser_names)
-    )
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": "deepseek-chat",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
-    }
-    
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = session.post(API_URL, headers=headers, json=data, timeout=30)
-            response.raise_for_status()
-            content = response.json()['choices'][0]['message']['content'].strip()
-            # 解析编号、名称和解释
-            lines = [line for line in content.split('\n') if '：' in line or ':' in line]
-            num2name, num2desc = {}, {}
-            for line in lines:
-                parts = line.replace('：', ':').split(':')
-                if len(parts) >= 3:
-                    num, name, desc = parts[0].strip(), parts[1].strip(), parts[2].strip()
-                elif len(parts) == 2:
-                    num, name, desc = parts[0].strip(), parts[1].strip(), ""
-                else:
-                    continue
-                num2name[num] = name
-                num2desc[num] = desc
-            return num2name, num2desc
-        except requests.exceptions.SSLError as e:
-            print(f"SSL错误 (尝试 {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # 指数退避
-                continue
-        except requests.exceptions.RequestException as e:
-            print(f"请求错误 (尝试 {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
+            return core.backend.generate_categories(purchaser_names)
+        except CassetteMiss:
+            # 回放录制缺少该请求时重试也不会命中，不能悄悄改用默认分类
+            raise
         except Exception as e:
             print(f"其他错误 (尝试 {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
+                time.sleep(2 ** attempt)  # 指数退避
                 continue
     
     print("所有重试都失败了，使用默认分类")
-    # 默认
-    num2name = {
-        "类别1": "政府机构", "类别2": "教育机构", "类别3": "医疗机构", "类别4": "企业", "类别5": "科研机构",
-        "类别6": "交通运输", "类别7": "执法机构", "类别8": "文化机构", "类别9": "公共服务", "类别10": "其他"
-    }
-    num2desc = {
-        "类别1": "负责行政管理的机构", "类别2": "负责教育教学的机构", "类别3": "提供医疗服务的机构", "类别4": "各类企业公司",
-        "类别5": "从事科学研究的机构", "类别6": "负责交通运输的单位", "类别7": "执法和安全相关机构",
-        "类别8": "文化宣传和活动相关机构", "类别9": "提供公共服务的单位", "类别10": "不属于以上类别的其他机构"
-    }
-    return num2name, num2desc
-
-def classify_single_item(args):
-    """
-    对单个项目进行分类（用于并发处理）
-    """
-    name, num2name, num2desc, index = args
-    
-    # 使用线程锁控制API请求频率
-    with request_lock:
-        time.sleep(0.1)  # 控制请求频率，避免API限制
-    
-    # 将所有类别编号、类别名称和类别描述组成一个字符串（每个类别的描述一行）
-    cat_desc_str = "\n".join([f"{num}:{num2name[num]}：{num2desc[num]}" for num in num2name])
-    prompt = (
-        f"""已知有如下类别及解释：\n{cat_desc_str}\n请判断\"{name}\"最适合归入哪个类别，只返回类别编号，如'类别10'、'类别5'，不要其他解释。"""
-    )
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": "deepseek-chat",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
-    }
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            # 发送 POST 请求到 API URL，获取 API 的响应
-            response = session.post(API_URL, headers=headers, json=data, timeout=30)
-            # 如果请求失败，抛出异常
-            response.raise_for_status()
-            # 从返回的 JSON 中提取类别编号并去除多余的空白字符
-            result = response.json()['choices'][0]['message']['content'].strip()
-            result_clean = result.replace('：', ':').split(':')[0].strip()  # 只保留编号
-            final_label = num2name.get(result_clean, "其他")
-            return index, final_label
-        except requests.exceptions.SSLError as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-    
-    # 如果所有重试都失败了，返回默认类别
-    return index, "其他"
-
-def classify_with_desc(name, num2name, num2desc):
-    # 兼容单线程版本
-    result = classify_single_item((name, num2name, num2desc, 0))
-    return result[1]
+    return dict(DEFAULT_NUM2NAME), dict(DEFAULT_NUM2DESC)
 
 def classify_sample_data_concurrent(sample_names, num2name, num2desc, max_workers=5):
     """
     使用并发对抽样数据进行分类
     """
-    print(f"🚀 使用 {max_workers} 个线程进行并发分类...")
+    from tqdm import tqdm
     
-    # 准备任务参数
-    tasks = [(name, num2name, num2desc, i) for i, name in enumerate(sample_names)]
+    print(f"🚀 使用 {max_workers} 个线程进行并发分类...")
     
     classifications = [None] * len(sample_names)  # 预分配结果列表
     
-    # 使用线程池执行并发任务
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有任务
-        future_to_index = {executor.submit(classify_single_item, task): task[3] for task in tasks}
-        
-        # 使用tqdm显示进度
-        with tqdm(total=len(sample_names), desc="并发分类进度") as pbar:
-            for future in as_completed(future_to_index):
-                try:
-                    index, result = future.result()
-                    classifications[index] = result
-                    pbar.update(1)
-                except Exception as e:
-                    index = future_to_index[future]
-                    print(f"\n❌ 处理第 {index + 1} 条数据时出错: {e}")
-                    classifications[index] = "其他"
-                    pbar.update(1)
+    # 使用有界并发窗口执行任务，tqdm显示进度
+    with tqdm(total=len(sample_names), desc="并发分类进度") as pbar:
+        for index, result in iter_classify_windowed(sample_names, num2name, num2desc, max_workers):
+            classifications[index] = result
+            pbar.update(1)
     
     return classifications
 
@@ -201,12 +69,12 @@ def classify_sample_data(sample_names, num2name, num2desc):
         return classify_sample_data_concurrent(sample_names, num2name, num2desc)
     else:
         # 小数据量使用单线程
+        from tqdm import tqdm
         classifications = []
         pbar = tqdm(total=len(sample_names), desc="抽样数据分类进度")
         for name in sample_names:
-            result = classify_with_desc(name, num2name, num2desc)
-            result_clean = result.replace('：', ':').split(':')[0].strip()  # 只保留编号
-            final_label = num2name.get(result_clean, "其他")
+            # classify_with_desc 已返回类别名称，无需再按编号映射
+            final_label = classify_with_desc(name, num2name, num2desc)
             classifications.append(final_label)
             pbar.update(1)
             time.sleep(0.5)
@@ -218,8 +86,8 @@ def evaluate_classification_quality(classifications):
     评估分类质量的函数，使用积分制量化评估
     返回：总分、各项得分详情
     """
-    # 统计各类别数量
-    class_counts = Counter(classifications)
+    # 统计各类别数量（LabelCodes 直接对编码做 bincount）
+    class_counts = count_labels(classifications)
     total_count = len(classifications)
     
     # 计算各类别占比
@@ -303,24 +171,15 @@ def evaluate_classification_quality(classifications):
     
     return evaluation_report
 
-def calculate_gini_coefficient(values):
-    """
-    计算基尼系数，用于衡量分布的不均衡程度
-    基尼系数越小，分布越均衡
-    """
-    if len(values) == 0:
-        return 0
-    
-    values = sorted(values)
-    n = len(values)
-    cumsum = np.cumsum(values)
-    return (n + 1 - 2 * np.sum(cumsum) / cumsum[-1]) / n
-
-def print_evaluation_report(report, iteration=None):
+def print_evaluation_report(report, iteration=None, title=None):
     """
     打印评估报告
     """
-    if iteration:
+    if title:
+        print(f"\n" + "="*60)
+        print(title)
+        print("="*60)
+    elif iteration:
         print(f"\n" + "="*60)
         print(f"第{iteration}次抽样分类质量评估报告")
         print("="*60)
@@ -330,6 +189,8 @@ def print_evaluation_report(report, iteration=None):
         print("="*60)
     
     print(f"\n📊 总体评分: {report['总分']}/100分")
+    if "抽样" in report:
+        print(f"🎲 检验样本: {report['抽样']}")
     
     if report['总分'] >= 90:
         grade = "优秀"
@@ -358,31 +219,219 @@ def print_evaluation_report(report, iteration=None):
     
     print("="*60)
 
-def save_categories_to_json(num2name, num2desc, filename="categories.json"):
+# 修订分类时视为有问题的占比（%），与评分中"优秀"档的界限一致
+REFINE_MAX_SHARE = 20
+REFINE_OTHER_SHARE = 5
+REFINE_MIN_SHARE = 3
+# 每个问题类别提供给模型的名称示例数
+REFINE_EXAMPLES = 30
+
+def feedback_from_report(report, num2name, sample_names, classifications):
+    """
+    从评估报告中找出需要修订的类别：过大的类别（拆分）、过小或没有样本的类别（合并）、"其他"过多（吸收）
+    返回：(问题描述列表, {类别名称: 名称示例}, 有问题的类别名称列表)
+    """
+    percentages = report["各类别分布"]
+    issues, problem_labels = [], []
+    for label, share in sorted(percentages.items(), key=lambda x: x[1], reverse=True):
+        if label == "其他":
+            if share > REFINE_OTHER_SHARE:
+                issues.append(f'"其他"占比{share:.1f}%，过高，请新增或调整类别吸收其中的名称')
+                problem_labels.append(label)
+        elif share > REFINE_MAX_SHARE:
+            issues.append(f'类别"{label}"占比{share:.1f}%，过大，请拆分为更具体的类别')
+            problem_labels.append(label)
+        elif share < REFINE_MIN_SHARE:
+            issues.append(f'类别"{label}"占比{share:.1f}%，过小，请与相近的类别合并')
+            problem_labels.append(label)
+    for label in num2name.values():
+        if label != "其他" and label not in percentages:
+            issues.append(f'类别"{label}"在样本中没有名称，请删除或与相近的类别合并')
+
+    examples = {label: [] for label in problem_labels}
+    for name, label in zip(sample_names, classifications):
+        if label in examples and len(examples[label]) < REFINE_EXAMPLES and name not in examples[label]:
+            examples[label].append(name)
+    return issues, examples, problem_labels
+
+def refine_categories_with_feedback(num2name, num2desc, issues, examples):
+    """
+    把评估发现的问题交给模型修订分类；请求失败或结果不可用（类别过少、缺少"其他"）时返回 None
+    """
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            refined_num2name, refined_num2desc = core.backend.refine_categories(num2name, num2desc, issues, examples)
+            break
+        except CassetteMiss:
+            raise
+        except Exception as e:
+            print(f"其他错误 (尝试 {attempt + 1}/{max_retries}): {e}")
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)  # 指数退避
+                continue
+            return None
+    if len(refined_num2name) < 2 or "其他" not in refined_num2name.values():
+        print("⚠️ 修订结果不完整，放弃本次修订")
+        return None
+    return refined_num2name, refined_num2desc
+
+def refine_taxonomy(num2name, num2desc, evaluation_report, sample_names, classifications, quality_threshold,
+                    max_rounds, iteration):
+    """
+    根据评估报告修订分类，而不是重新抽样生成：每轮一次修订请求，
+    检验样本中只重新分类标签可能变化的名称（原类别有质量问题或被删除/修改、原为"其他"、可能归入新增类别），其余沿用，
+    然后在同一检验样本上重新评估。得分没有提高时保留修订前的分类并停止修订。
+    返回：(num2name, num2desc, evaluation_report, classifications, 采用的修订次数)
+    """
+    accepted = 0
+    for refine_round in range(1, max_rounds + 1):
+        issues, examples, problem_labels = feedback_from_report(evaluation_report, num2name, sample_names,
+                                                                classifications)
+        if not issues:
+            break
+        print(f"\n🛠️ 第{iteration}次迭代 - 第{refine_round}轮修订：根据评估结果修订分类...")
+        for issue in issues:
+            print(f"   {issue}")
+        with span("refine_categories", iteration=iteration, round=refine_round):
+            refined = refine_categories_with_feedback(num2name, num2desc, issues, examples)
+        if refined is None:
+            break
+        refined_num2name, refined_num2desc = refined
+        diff = diff_taxonomies(num2name, num2desc, refined_num2name, refined_num2desc)
+        print_taxonomy_diff(diff)
+        if not (diff["added"] or diff["removed"] or diff["renamed"] or diff["desc_changed"]):
+            print("⚠️ 模型没有修改分类，停止修订")
+            break
+
+        # 被指出有问题的类别中的名称总是重新分类，即使模型没有改动该类别的名称和描述
+        kept, resend, reasons = plan_reclassification(sample_names, classifications, refined_num2name, diff,
+                                                      problem_labels)
+        print(f"♻️ 检验样本中沿用 {len(kept)} 个名称的结果，重新分类 {len(resend)} 个")
+        for reason, count in reasons.items():
+            print(f"   {reason}: {count}")
+        relabeled = {}
+        if resend:
+            with span("classify_sample", iteration=iteration, round=refine_round):
+                relabeled = dict(zip(resend, classify_sample_data(resend, refined_num2name, refined_num2desc)))
+        refined_classifications = [kept[name] if name in kept else relabeled[name] for name in sample_names]
+
+        with span("evaluate", iteration=iteration, round=refine_round):
+            refined_report = evaluate_classification_quality(refined_classifications)
+        if "抽样" in evaluation_report:
+            refined_report["抽样"] = evaluation_report["抽样"]
+        print_evaluation_report(refined_report, title=f"第{iteration}次迭代 - 第{refine_round}轮修订后质量评估报告")
+        if refined_report['总分'] <= evaluation_report['总分']:
+            print(f"⚠️ 修订后得分未提高({refined_report['总分']}分 <= {evaluation_report['总分']}分)，保留修订前的分类")
+            break
+
+        num2name, num2desc = refined_num2name, refined_num2desc
+        evaluation_report, classifications = refined_report, refined_classifications
+        accepted += 1
+        if evaluation_report['总分'] >= quality_threshold:
+            break
+    return num2name, num2desc, evaluation_report, classifications, accepted
+
+def exclude_sampled(purchaser_names, sample_names):
+    """
+    返回不在抽样中的名称（保持原顺序），用集合判断成员，数据量大时也是线性耗时
+    """
+    sampled = set(sample_names)
+    return [name for name in purchaser_names if name not in sampled]
+
+def save_categories_to_json(num2name, num2desc, filename="categories.json", validation=None):
     """
     将分类结果保存为JSON文件
+    同时记录内容指纹和上一版本指纹，并把新旧版本归档到 taxonomy_versions/，供增量重分类使用
+    validation 为质量检验信息（得分、样本量、抽样方式、迭代次数），一并写入
     """
+    from taxonomy import archive_taxonomy, current_hash, read_taxonomy_file, versions_dir_for
+    
+    versions_dir = versions_dir_for(filename)
+    previous_hash = current_hash(filename)
+    if previous_hash is not None:
+        old_num2name, old_num2desc, old_data = read_taxonomy_file(filename)
+        archive_taxonomy(old_num2name, old_num2desc, versions_dir, old_data.get("timestamp"))
+    
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    taxonomy_hash = archive_taxonomy(num2name, num2desc, versions_dir, timestamp)
     categories_data = {
         "num2name": num2name,
         "num2desc": num2desc,
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "total_categories": len(num2name)
+        "timestamp": timestamp,
+        "total_categories": len(num2name),
+        "taxonomy_hash": taxonomy_hash,
+        "previous_hash": previous_hash if previous_hash != taxonomy_hash else None,
     }
+    if validation is not None:
+        categories_data["validation"] = validation
     
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(categories_data, f, ensure_ascii=False, indent=2)
     
-    print(f"✅ 分类结果已保存到 {filename}")
+    print(f"✅ 分类结果已保存到 {filename}（版本 {taxonomy_hash[:8]}）")
 
-def main():
+def parse_args(argv=None):
+    """
+    解析命令行参数；未指定 --input 时进入交互模式
+    """
+    parser = argparse.ArgumentParser(description="招投标机构分类系统 - 生成分类")
+    parser.add_argument("--input", help="输入数据文件路径，支持Excel/CSV/Parquet/JSONL（指定后不再交互询问）")
+    parser.add_argument("--output", default="categories.json", help="分类结果保存路径（默认为'categories.json'）")
+    parser.add_argument("--column", default="Purchaser_Name", help="采购方名称所在列（默认为'Purchaser_Name'）")
+    parser.add_argument("--sampling", choices=SAMPLING_MODES, default="stratified",
+                        help="抽样方式：stratified 按机构后缀、地区、名称长度分层（默认）/ random 简单随机抽样")
+    parser.add_argument("--sample-size", type=int, default=300, help="生成分类和检验质量各抽取的名称数（默认300）")
+    parser.add_argument("--refine-rounds", type=int, default=2,
+                        help="质量未达标时先按评估结果修订分类的最多轮数，仍未达标再重新生成（0为不修订）")
+    parser.add_argument("--cassette", help="请求录制文件（JSON）：录制真实请求或离线回放")
+    parser.add_argument("--cassette-mode", choices=CASSETTE_MODES, default="auto",
+                        help="record 录制 / replay 只回放（不访问网络）/ auto 已录制的回放、其余录制")
+    parser.add_argument("--replay-latency", type=parse_latency, default="recorded",
+                        help="回放耗时：recorded 按录制时的真实耗时，或固定秒数")
+    parser.add_argument("--budget-file", default="token_budget.json", help="每日Token用量的保存文件")
+    parser.add_argument("--backend", choices=BACKEND_KINDS, default="remote",
+                        help="分类后端：remote 远程API / local 本地OpenAI兼容推理服务 / offline 纯Python离线分类")
+    parser.add_argument("--local-url", default=DEFAULT_LOCAL_URL, help="本地推理服务地址")
+    parser.add_argument("--local-model", default="local", help="本地推理服务的模型名")
+    parser.add_argument("--stream", action="store_true",
+                        help="逐条分类使用流式响应，识别出类别编号后立即关闭连接，并统计出类别耗时")
+    parser.add_argument("--input-cache-dir", default=input_cache.DEFAULT_CACHE_DIR,
+                        help="输入文件列式缓存目录，重复读取同一个Excel时跳过解析")
+    parser.add_argument("--no-input-cache", action="store_true", help="不使用输入文件列式缓存")
+    rate_limiter.add_arguments(parser)
+    tracing.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    return tracing.run_instrumented(run, args)
+
+def run(args):
+    input_cache.set_cache_dir(None if args.no_input_cache else args.input_cache_dir)
+    rate_limiter.configure(args)
+    if args.cassette:
+        cassette = use_cassette(args.cassette, args.cassette_mode, args.replay_latency)
+        atexit.register(cassette.save)
+    token_budget = TokenBudget(args.budget_file)
+    set_token_budget(token_budget)
+    if args.backend != "remote":
+        set_backend(create_backend(args.backend, core.api_pool, local_url=args.local_url, local_model=args.local_model))
+        print(f"🧠 使用 {args.backend} 分类后端")
+    if args.stream and enable_streaming(core.backend):
+        print("📡 抽样检验的逐条分类使用流式响应")
+    
     # 读取Excel文件
-    input_file = input("请输入Excel文件路径（默认为'合并后的表格.xlsx'）: ").strip()
+    input_file = args.input
+    if not input_file:
+        input_file = input("请输入Excel文件路径（默认为'合并后的表格.xlsx'）: ").strip()
     if not input_file:
         input_file = "合并后的表格.xlsx"
     
     try:
-        df = pd.read_excel(input_file)
-        purchaser_names = df['Purchaser_Name'].astype(str).tolist()
+        with span("load_input"):
+            df = load_input_table(input_file, args.column)
+        purchaser_names = df[args.column].tolist()
         print(f"✅ 成功读取数据，总数据量: {len(purchaser_names)}")
     except Exception as e:
         print(f"❌ 读取文件失败: {e}")
@@ -390,56 +439,61 @@ def main():
     
     # 设置随机种子确保结果可重现
     random.seed(42)
+    sampler = NameSampler(purchaser_names, args.sampling)
+    sample_size = args.sample_size
     
     # 迭代抽样和分类质量检验
     iteration = 1
     max_iterations = 5  # 最大迭代次数，避免无限循环
     quality_threshold = 90  # 质量阈值，达到90分即可
+    refinements = 0  # 采用的修订次数
     
     while iteration <= max_iterations:
         print(f"\n🔄 第{iteration}次迭代开始...")
         
-        # 第一次抽样：生成分类
+        # 第一次抽样：生成分类（分层抽样时每层至少1个，罕见机构类型也能出现在提示词中）
         print("📝 第一次抽样：生成10个分类...")
-        if len(purchaser_names) > 500:
-            sample_names_1 = random.sample(purchaser_names, 500)
-            print(f"已随机抽样500个数据用于生成分类")
-        else:
-            sample_names_1 = purchaser_names
-            print(f"数据量({len(purchaser_names)})未超过500个，使用全部数据生成分类")
+        with span("sample", iteration=iteration):
+            sample_names_1 = sampler.sample(sample_size, min_per_stratum=1)
+        print(f"已{sampler.describe()}数据用于生成分类")
         
         # 获取分类
         print("正在获取10个最合适的分类及解释...")
-        num2name, num2desc = get_categories_with_desc(sample_names_1)
+        with span("generate_categories", iteration=iteration):
+            num2name, num2desc = get_categories_with_desc(sample_names_1)
         print("API返回的分类及解释：")
         for num in num2name:
             print(f"{num}: {num2name[num]} - {num2desc[num]}")
         
-        # 第二次抽样：检验分类质量
+        # 第二次抽样：检验分类质量（按比例分层，样本中的类别占比与全量数据一致）
         print("\n🔍 第二次抽样：检验分类质量...")
-        # 从剩余数据中抽样，避免重复
-        remaining_names = [name for name in purchaser_names if name not in sample_names_1]
-        if len(remaining_names) >= 500:
-            sample_names_2 = random.sample(remaining_names, 500)
-            print(f"已从剩余数据中随机抽样500个数据用于质量检验")
-        elif len(remaining_names) > 0:
-            sample_names_2 = remaining_names
-            print(f"剩余数据量({len(remaining_names)})不足500个，使用全部剩余数据进行质量检验")
-        else:
-            # 如果剩余数据不足，从全部数据中重新抽样，但不超过总数据量
-            sample_size = min(500, len(purchaser_names))
-            sample_names_2 = random.sample(purchaser_names, sample_size)
-            print(f"剩余数据不足，重新从全部数据中抽样{sample_size}个进行质量检验")
+        # 从剩余数据中抽样，避免重复；剩余数据为空时从全部数据中重新抽样
+        with span("sample", iteration=iteration):
+            sample_names_2 = sampler.sample(sample_size, exclude=set(sample_names_1))
+            if not sample_names_2:
+                sample_names_2 = sampler.sample(sample_size)
+        sample_description = sampler.describe()
+        print(f"已{sample_description}数据用于质量检验")
         
         # 对第二次抽样数据进行分类
         print("正在对第二次抽样数据进行分类...")
-        sample_classifications = classify_sample_data(sample_names_2, num2name, num2desc)
+        with span("classify_sample", iteration=iteration):
+            sample_classifications = classify_sample_data(sample_names_2, num2name, num2desc)
         
         # 评估分类质量
         print("正在评估分类质量...")
-        evaluation_report = evaluate_classification_quality(sample_classifications)
+        with span("evaluate", iteration=iteration):
+            evaluation_report = evaluate_classification_quality(sample_classifications)
+        evaluation_report["抽样"] = sample_description
         print_evaluation_report(evaluation_report, iteration)
         
+        # 未达标时先按评估结果修订分类（拆分过大的类别、合并过小的类别、压缩"其他"），只重新分类受影响的检验名称
+        if evaluation_report['总分'] < quality_threshold and args.refine_rounds > 0:
+            num2name, num2desc, evaluation_report, sample_classifications, accepted = refine_taxonomy(
+                num2name, num2desc, evaluation_report, sample_names_2, sample_classifications,
+                quality_threshold, args.refine_rounds, iteration)
+            refinements += accepted
+        
         # 检查是否达到质量标准
         if evaluation_report['总分'] >= quality_threshold:
             print(f"\n✅ 分类质量达到标准({evaluation_report['总分']}分 >= {quality_threshold}分)，生成最终分类...")
@@ -451,9 +505,19 @@ def main():
                 print(f"⚠️ 已达到最大迭代次数({max_iterations})，使用当前分类结果")
                 break
     
-    # 保存分类结果
+    # 保存分类结果（连同最终得分和样本量）
     print("\n💾 保存分类结果...")
-    save_categories_to_json(num2name, num2desc)
+    print(f"📊 最终得分 {evaluation_report['总分']}/100分，{sample_description}，共迭代 {min(iteration, max_iterations)} 次，"
+          f"采用修订 {refinements} 次")
+    validation = {
+        "score": evaluation_report['总分'],
+        "sample_size": len(sample_names_2),
+        "generation_sample_size": len(sample_names_1),
+        "sampling": args.sampling,
+        "iterations": min(iteration, max_iterations),
+        "refinements": refinements,
+    }
+    save_categories_to_json(num2name, num2desc, args.output, validation)
     
     # 打印最终分类结果
     print("\n📋 最终生成的10个分类：")
@@ -463,7 +527,12 @@ def main():
         print(f"   描述: {num2desc[num]}")
         print("-" * 40)
     
-    print(f"\n🎉 分类生成完成！结果已保存到 categories.json")
+    print_label_latency(core.backend)
+    rate_limiter.print_limiter_summary()
+    token_budget.save()
+    print(f"\n💰 本次消耗tokens: {token_budget.run_used['total_tokens']}，今日累计: {token_budget.daily_used()}")
+    
+    print(f"\n🎉 分类生成完成！结果已保存到 {args.output}")
     print("💡 提示：现在可以使用 classify.py 对全量数据进行分类")
 
 if __name__ == "__main__":
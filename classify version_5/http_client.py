@@ -0,0 +1,67 @@
+"""
+HTTP会话
+requests 只在第一次发请求时导入，全局session在首次使用时才创建，导入本模块几乎没有开销
+"""
+
+import json
+import threading
+
+_session = None
+_session_lock = threading.Lock()
+
+# 创建带有重试机制的session
+def create_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    session = requests.Session()
+    # 429 不在这里重试：交给后端池处理（按 Retry-After 冷却该后端并写入跨进程共享的冷却时间，重试时重新预约时间槽）
+    retry_strategy = Retry(
+        total=3,  # 总重试次数
+        backoff_factor=1,  # 重试间隔
+        status_forcelist=[500, 502, 503, 504],  # 需要重试的HTTP状态码
+        raise_on_status=False,  # 重试用尽时返回最后一个响应，由 raise_for_status 抛出带状态码的异常
+    )
+    adapter = HTTPAdapter(max_retries=retry_strategy)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_session():
+    """
+    返回全局session（首次调用时创建），所有后端共享同一个连接池
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+def iter_sse_chunks(response):
+    """
+    逐条读取聊天补全的 SSE 流式响应（data: {...} 行），产出 (内容增量, usage)
+    usage 只出现在最后一个数据块中（请求时需带 stream_options.include_usage），其余为 None
+    """
+    for line in response.iter_lines():
+        if isinstance(line, bytes):
+            # 按行解码：换行不会落在多字节字符中间；text/event-stream 常不带 charset，不能依赖 requests 的默认编码
+            line = line.decode('utf-8')
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            return
+        chunk = json.loads(payload)
+        choices = chunk.get("choices") or []
+        delta = (choices[0].get("delta") or {}).get("content") or "" if choices else ""
+        yield delta, chunk.get("usage")
+
+def set_session(session):
+    """
+    替换全局session，例如换成 cassette.Cassette 以录制或回放请求
+    """
+    global _session
+    with _session_lock:
+        _session = session
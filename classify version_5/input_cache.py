@@ -0,0 +1,229 @@
+"""
+输入文件的列式缓存
+同一个大Excel会被 get_class.py、classify.py 和每次重跑反复解析，解析本身就要几分钟。
+第一次读取后把所需的列另存为可内存映射的列式文件，之后的运行（包括其他进程）直接映射读取：
+- 安装 pyarrow 时使用 Arrow IPC 文件（pa.memory_map 零拷贝映射）
+- 否则每列保存为 numpy 文件：字符串列为 UTF-8 字节块 + 字符偏移量数组 + 缺失值掩码，用 mmap_mode='r' 映射；
+  数值列零拷贝，字符串列读取时整块解码一次再按偏移切分为 Python 字符串（不是零拷贝）
+
+缓存按 (源文件绝对路径, 读取的列) 命名，元数据中记录源文件的大小、修改时间和内容MD5：
+大小和修改时间都没变时直接使用；只有修改时间变化时重新计算MD5，内容相同则继续使用。
+每次写入新缓存时清理旧条目：源文件已删除/改名或大小已变、超过 MAX_UNUSED_DAYS 天没有使用，以及写到一半中断留下的文件。
+"""
+
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_CACHE_DIR = ".input_cache"
+
+# 缓存文件格式版本，格式变化后旧缓存自动失效
+CACHE_VERSION = 2
+
+# 超过这么多天没有读取过的缓存在清理时删除（读取缓存时刷新元数据文件的修改时间）
+MAX_UNUSED_DAYS = 30
+
+# 没有元数据的文件（写入中或中断）超过这么多秒才删除，避免删掉其他进程正在写的缓存
+INCOMPLETE_GRACE = 3600
+
+# 输入缓存目录，为 None 时不使用缓存
+cache_dir = DEFAULT_CACHE_DIR
+
+def set_cache_dir(directory):
+    global cache_dir
+    cache_dir = directory
+
+def _file_md5(path, chunk_size=1 << 20):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cache_base(path, columns):
+    key = json.dumps([os.path.abspath(path), columns], ensure_ascii=False)
+    return os.path.join(cache_dir, hashlib.md5(key.encode('utf-8')).hexdigest())
+
+def _has_pyarrow():
+    import importlib.util
+    return importlib.util.find_spec("pyarrow") is not None
+
+def _read_meta(base):
+    try:
+        with open(base + ".json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(base, meta):
+    tmp_file = base + ".json.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, base + ".json")
+
+def _is_fresh(path, base, meta):
+    """
+    判断缓存是否仍对应源文件；只有修改时间变化时校验内容MD5
+    """
+    stat = os.stat(path)
+    if meta["size"] != stat.st_size:
+        return False
+    if meta["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if _file_md5(path) != meta["md5"]:
+        return False
+    meta["mtime_ns"] = stat.st_mtime_ns
+    _write_meta(base, meta)
+    return True
+
+def _save_arrow(base, df):
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_file = base + ".arrow.tmp"
+    with pa.OSFile(tmp_file, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_file, base + ".arrow")
+
+def _load_arrow(base, columns):
+    import pyarrow as pa
+    with pa.memory_map(base + ".arrow", 'r') as source:
+        return pa.ipc.open_file(source).read_all().select(columns).to_pandas()
+
+def _is_string_column(values):
+    """
+    object 列和 pandas 字符串列（pandas 3 起读入的文本默认为 str 类型）都按字符串保存
+    """
+    import pandas as pd
+    return pd.api.types.is_string_dtype(values.dtype)
+
+def _save_numpy(base, df):
+    import numpy as np
+    for position, column in enumerate(df.columns):
+        values = df[column]
+        if _is_string_column(values):
+            # 缺失值（None/NaN）保存为空字符串并记入掩码，读取时还原为 None
+            missing = values.isna().to_numpy()
+            texts = ["" if is_missing else str(value) for value, is_missing in zip(values, missing)]
+            offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+            np.cumsum([len(text) for text in texts], out=offsets[1:])
+            np.save(f"{base}.{position}.offsets.npy", offsets)
+            np.save(f"{base}.{position}.missing.npy", missing)
+            np.save(f"{base}.{position}.blob.npy", np.frombuffer("".join(texts).encode('utf-8'), dtype=np.uint8))
+        else:
+            np.save(f"{base}.{position}.values.npy", values.to_numpy())
+
+def _load_numpy(base, columns, meta):
+    import numpy as np
+    import pandas as pd
+    data = {}
+    for position, column in enumerate(columns):
+        if meta["kinds"][position] == "string":
+            offsets = np.load(f"{base}.{position}.offsets.npy", mmap_mode='r').tolist()
+            missing = np.load(f"{base}.{position}.missing.npy", mmap_mode='r')
+            blob = np.load(f"{base}.{position}.blob.npy", mmap_mode='r')
+            # 偏移量按字符计，整块只解码一次
+            text = blob.tobytes().decode('utf-8')
+            values = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+            for i in np.flatnonzero(missing).tolist():
+                values[i] = None
+            data[column] = values
+        else:
+            data[column] = np.load(f"{base}.{position}.values.npy", mmap_mode='r')
+    return pd.DataFrame(data, columns=columns)
+
+def load_cached(path, columns):
+    """
+    返回缓存中的 DataFrame；没有缓存或已过期时返回 None
+    """
+    if cache_dir is None:
+        return None
+    base = _cache_base(path, columns)
+    meta = _read_meta(base)
+    if meta is None or meta.get("version") != CACHE_VERSION or meta.get("columns") != columns:
+        return None
+    try:
+        if not _is_fresh(path, base, meta):
+            return None
+        if meta["format"] == "arrow":
+            df = _load_arrow(base, columns)
+        else:
+            df = _load_numpy(base, columns, meta)
+        # 记录最近一次使用时间，供 prune_cache 判断
+        os.utime(base + ".json")
+        return df
+    except Exception as e:
+        print(f"⚠️ 输入缓存读取失败，重新解析源文件: {e}")
+        return None
+
+def store_cached(path, columns, df):
+    """
+    把刚解析出的列保存为缓存（失败时只提示，不影响本次运行）
+    """
+    if cache_dir is None:
+        return
+    base = _cache_base(path, columns)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 先删除元数据，写到一半的缓存不会被其他进程当作有效缓存
+        if os.path.exists(base + ".json"):
+            os.remove(base + ".json")
+        stat = os.stat(path)
+        fmt = "arrow" if _has_pyarrow() else "numpy"
+        if fmt == "arrow":
+            _save_arrow(base, df)
+        else:
+            _save_numpy(base, df)
+        _write_meta(base, {
+            "version": CACHE_VERSION,
+            "source": os.path.abspath(path),
+            "columns": columns,
+            "kinds": ["string" if _is_string_column(df[column]) else "values" for column in columns],
+            "format": fmt,
+            "rows": len(df),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "md5": _file_md5(path),
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    except Exception as e:
+        print(f"⚠️ 输入缓存写入失败: {e}")
+        return
+    removed = prune_cache()
+    if removed:
+        print(f"🧹 已清理 {removed} 个过期的输入缓存")
+
+def _is_stale(base, filenames, now, max_unused_days):
+    meta = _read_meta(base)
+    if meta is None:
+        return all(now - os.path.getmtime(os.path.join(cache_dir, filename)) > INCOMPLETE_GRACE
+                   for filename in filenames)
+    source = meta.get("source")
+    return (meta.get("version") != CACHE_VERSION or not source or not os.path.exists(source)
+            or os.path.getsize(source) != meta.get("size")
+            or now - os.path.getmtime(base + ".json") > max_unused_days * 86400)
+
+def prune_cache(max_unused_days=MAX_UNUSED_DAYS):
+    """
+    删除源文件已不存在或大小已变、超过 max_unused_days 天没有使用的缓存，以及写到一半中断留下的文件
+    返回：删除的缓存条目数
+    """
+    if cache_dir is None or not os.path.isdir(cache_dir):
+        return 0
+    now = time.time()
+    entries = {}
+    for filename in os.listdir(cache_dir):
+        entries.setdefault(filename.split(".", 1)[0], []).append(filename)
+    removed = 0
+    for key, filenames in entries.items():
+        try:
+            if not _is_stale(os.path.join(cache_dir, key), filenames, now, max_unused_days):
+                continue
+            for filename in filenames:
+                os.remove(os.path.join(cache_dir, filename))
+        except OSError:
+            # 其他进程同时在写入或清理，下次再处理
+            continue
+        removed += 1
+    return removed
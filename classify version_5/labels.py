@@ -0,0 +1,96 @@
+"""
+紧凑的类别标签存储
+每个分类体系只有十个左右的类别，逐行保存 Python 字符串既占内存又拖慢统计。
+LabelCodes 把每行的类别保存为 1 字节编码（array('B')），编码对应分类体系中的类别名称：
+- counts() 用 np.bincount 直接统计各类别数量，评估时无需逐行遍历字符串
+- to_categorical() 交给 pandas 时是 Categorical，不会生成 object 列
+- 仍可像列表一样 len() / 迭代 / 下标访问（返回类别名称），兼容原有调用方
+"""
+
+from array import array
+from collections import Counter
+
+# array('B') 每行1字节，最多255个类别
+MAX_CATEGORIES = 255
+
+class LabelCodes:
+    def __init__(self, categories=()):
+        self.categories = []
+        self.index = {}
+        self.codes = array('B')
+        for label in categories:
+            self._code(label)
+
+    @classmethod
+    def from_taxonomy(cls, num2name):
+        """
+        按分类体系的类别顺序编码，"其他"始终存在（请求失败、预算兜底时使用）
+        """
+        categories = list(dict.fromkeys(num2name.values()))
+        if "其他" not in categories:
+            categories.append("其他")
+        return cls(categories)
+
+    def _code(self, label):
+        code = self.index.get(label)
+        if code is None:
+            if len(self.categories) >= MAX_CATEGORIES:
+                raise ValueError(f"类别数超过 {MAX_CATEGORIES}，无法用1字节编码")
+            code = len(self.categories)
+            self.categories.append(label)
+            self.index[label] = code
+        return code
+
+    def append(self, label):
+        self.codes.append(self._code(label))
+
+    def extend(self, labels):
+        if isinstance(labels, LabelCodes):
+            if labels.categories == self.categories:
+                self.codes.extend(labels.codes)
+                return
+            # 类别顺序不同时按名称重新编码
+            remap = [self._code(label) for label in labels.categories]
+            self.codes.extend(remap[code] for code in labels.codes)
+            return
+        for label in labels:
+            self.append(label)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        categories = self.categories
+        return (categories[code] for code in self.codes)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.categories[code] for code in self.codes[position]]
+        return self.categories[self.codes[position]]
+
+    def to_numpy(self):
+        """
+        零拷贝转换为 uint8 数组
+        """
+        import numpy as np
+        return np.frombuffer(self.codes, dtype=np.uint8)
+
+    def counts(self):
+        """
+        返回 {类别名称: 数量}，只包含出现过的类别
+        """
+        import numpy as np
+        counts = np.bincount(self.to_numpy(), minlength=len(self.categories))
+        return {label: int(count) for label, count in zip(self.categories, counts) if count}
+
+    def to_categorical(self):
+        import pandas as pd
+        return pd.Categorical.from_codes(self.to_numpy(), categories=self.categories)
+
+def count_labels(classifications):
+    """
+    统计各类别数量：LabelCodes 走 bincount，普通列表退回 Counter
+    """
+    if isinstance(classifications, LabelCodes):
+        return classifications.counts()
+    return Counter(classifications)
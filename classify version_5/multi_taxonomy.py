@@ -0,0 +1,178 @@
+"""
+多分类体系一次分类
+同一批名称需要按多套分类体系（如业务类型、政府层级）分别分类时，不再对每套体系各跑一遍全量数据：
+每个名称只发一次请求，提示词中同时给出所有体系，模型按体系各返回一个类别编号（见 prompts.build_multi_classify_prompt）。
+
+- 每套体系使用各自的结果缓存（与单体系运行共用同一指纹），只为缺少结果的体系请求
+- 某个体系的编号缺失或无法识别时，只对该体系单独退回逐条分类
+- 输出中每套体系一列（默认 Classification_<分类文件名>，也可写成 列名=分类文件），质量评估按体系分别进行
+
+用法：python classify.py --taxonomies 业务类型=business.json 政府层级=level.json
+"""
+
+import os
+import time
+
+import core
+from core import (
+    result_cache, cache_lock, get_taxonomy_key, lookup_cache, store_cache, record_stat, budget_fallback_label,
+    classify_single_item, stream_classify_to_file, name_priorities, load_categories_from_json,
+)
+from cassette import CassetteMiss
+
+class Taxonomy:
+    """
+    一套分类体系及其在输出中的列名
+    """
+    def __init__(self, column, num2name, num2desc, path=None):
+        self.column = column
+        self.num2name = num2name
+        self.num2desc = num2desc
+        self.path = path
+        self.key = get_taxonomy_key(num2name, num2desc)
+
+def parse_taxonomy_spec(spec):
+    """
+    "列名=分类文件" 或 "分类文件"（列名默认为 Classification_<文件名>）
+    """
+    if "=" in spec:
+        column, path = spec.split("=", 1)
+        return column.strip(), path.strip()
+    return f"Classification_{os.path.splitext(os.path.basename(spec))[0]}", spec
+
+def load_taxonomies(specs):
+    """
+    加载全部分类体系，任何一个加载失败或列名重复时返回 None
+    """
+    taxonomies = []
+    for spec in specs:
+        column, path = parse_taxonomy_spec(spec)
+        print(f"\n📋 分类体系 {column}（{path}）")
+        num2name, num2desc = load_categories_from_json(path)
+        if num2name is None or num2desc is None:
+            return None
+        if any(taxonomy.column == column for taxonomy in taxonomies):
+            print(f"❌ 输出列名重复: {column}，请用 列名=分类文件 指定不同的列名")
+            return None
+        taxonomies.append(Taxonomy(column, num2name, num2desc, path))
+    return taxonomies
+
+def classify_multi_item(args, give_up_at=None):
+    """
+    对单个名称按全部分类体系分类（用于并发处理），一次请求只包含还没有缓存结果的体系
+    返回：(序号, 与 taxonomies 等长的类别名称列表)
+    """
+    name, taxonomies, index = args
+    if not name.strip():
+        return index, ["其他"] * len(taxonomies)
+    labels = [lookup_cache(taxonomy.key, name) for taxonomy in taxonomies]
+    missing = [i for i, label in enumerate(labels) if label is None]
+    if not missing:
+        return index, labels
+
+    if core.token_budget is not None and not core.token_budget.before_request():
+        for i in missing:
+            labels[i] = budget_fallback_label(name, taxonomies[i].num2name)
+        return index, labels
+
+    pending = [(taxonomies[i].num2name, taxonomies[i].num2desc) for i in missing]
+    nums = None
+    record_stat("api_requests")
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            record_stat("api_calls")
+            nums = core.backend.classify_multi(name, pending)
+            break
+        except CassetteMiss:
+            raise
+        except Exception as e:
+            if give_up_at is not None and time.monotonic() + 2 ** attempt >= give_up_at:
+                break
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)
+                continue
+
+    if nums is None:
+        # 所有重试都失败时归为"其他"（不写入缓存，下次重新请求）
+        record_stat("failed_calls")
+        for i in missing:
+            labels[i] = "其他"
+        return index, labels
+
+    for position, i in enumerate(missing):
+        taxonomy = taxonomies[i]
+        num = nums[position]
+        if num in taxonomy.num2name:
+            labels[i] = taxonomy.num2name[num]
+            store_cache(taxonomy.key, name, labels[i])
+        else:
+            labels[i] = classify_single_item((name, taxonomy.num2name, taxonomy.num2desc, index), give_up_at)[1]
+    return index, labels
+
+def classify_multi_to_file(df, purchaser_names, taxonomies, output_file, max_workers=10, excel_split="sheets",
+                           schedule="frequency", priorities=None):
+    """
+    一次遍历按全部分类体系分类并流式写出，每套体系一列（流程同 core.classify_to_file，见 core.stream_classify_to_file）
+    返回：{列名: labels.LabelCodes}
+    """
+    from labels import LabelCodes
+
+    with cache_lock:
+        cached = [dict(result_cache.get(taxonomy.key, {})) for taxonomy in taxonomies]
+    resolved = {}
+    pending_names = []
+    for name in dict.fromkeys(purchaser_names):
+        labels = [labels_by_name.get(name) for labels_by_name in cached]
+        if None in labels:
+            pending_names.append(name)
+        else:
+            resolved[name] = labels
+    row_counts = name_priorities(purchaser_names)
+    record_stat("cache_hits", len(purchaser_names) - sum(row_counts[name] for name in pending_names))
+
+    print(f"\n🚀 开始按 {len(taxonomies)} 套分类体系分类并流式写出到 {output_file}")
+    print(f"📊 总数据量: {len(purchaser_names)}，需请求API {len(pending_names)} 条（每条一次请求覆盖全部体系）")
+
+    columns = list(df.columns) + [taxonomy.column for taxonomy in taxonomies]
+    all_classifications = [LabelCodes.from_taxonomy(taxonomy.num2name) for taxonomy in taxonomies]
+
+    def on_row(name, labels):
+        for codes, label in zip(all_classifications, labels):
+            codes.append(label)
+
+    def classify_name(name, give_up_at):
+        return classify_multi_item((name, taxonomies, 0), give_up_at)[1]
+
+    stream_classify_to_file(df, purchaser_names, resolved, pending_names, classify_name, output_file, columns,
+                            lambda name, labels: labels, on_row, max_workers=max_workers, excel_split=excel_split,
+                            schedule=schedule, priorities=priorities, error_result=["其他"] * len(taxonomies),
+                            desc="多体系分类进度")
+    return {taxonomy.column: codes for taxonomy, codes in zip(taxonomies, all_classifications)}
+
+def evaluate_taxonomies(classifications):
+    """
+    按分类体系分别评估：{列名: 评估报告}
+    """
+    from classify import evaluate_final_classification
+    return {column: evaluate_final_classification(codes) for column, codes in classifications.items() if len(codes)}
+
+def print_taxonomy_reports(reports):
+    from classify import print_final_report
+    for column, report in reports.items():
+        print_final_report(report, title=f"分类质量评估报告 - {column}")
+
+def check_unsupported_options(args):
+    """
+    多分类体系模式（classify.run 中 --taxonomies）不支持的选项：
+    --dry-run 直接报错（不能把试运行变成真实的付费分类），其余选项提示后关闭
+    返回：是否可以继续运行
+    """
+    if args.dry_run:
+        print("❌ 多分类体系模式暂不支持试运行规划")
+        return False
+    for option in ("reclassify", "deadline", "rules", "checkpoint_every"):
+        if getattr(args, option):
+            print(f"⚠️ 多分类体系模式不支持 --{option.replace('_', '-')}，已忽略")
+            setattr(args, option, None)
+    return True
@@ -0,0 +1,121 @@
+"""
+运行前的试运行规划（dry-run）
+统计唯一名称数、预计缓存与规则命中数，按本地估算的tokens计算费用，
+并用少量真实请求探测接口延迟，按当前并发数和请求频率限制推算总耗时。
+"""
+
+import math
+import time
+
+import core
+from core import (
+    result_cache, cache_lock, get_taxonomy_key, classify_single_item, choose_max_workers, run_stats,
+)
+from prompts import build_classify_prompt
+
+# DeepSeek deepseek-chat 参考价格（元/百万tokens），可通过命令行覆盖
+DEFAULT_PRICE_INPUT = 2.0
+DEFAULT_PRICE_OUTPUT = 8.0
+
+# 未探测时假设的单次请求延迟（秒）
+DEFAULT_LATENCY = 1.0
+
+# 只返回类别编号，每次输出约几个tokens
+OUTPUT_TOKENS_PER_CALL = 4
+
+def estimate_tokens(text):
+    """
+    本地粗略估算tokens：中文约0.6个/字，其余字符约0.3个/字符
+    """
+    cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+    return math.ceil(cjk * 0.6 + (len(text) - cjk) * 0.3)
+
+def probe_latency(names, num2name, num2desc, probe_size=3):
+    """
+    对少量名称发起真实请求，返回平均单次请求延迟（秒）；全部失败时返回 None
+    探测结果会写入缓存，正式运行时不会重复请求
+    """
+    latencies = []
+    for i, name in enumerate(names[:probe_size]):
+        failed_before = run_stats["failed_calls"]
+        start_time = time.perf_counter()
+        classify_single_item((name, num2name, num2desc, i))
+        elapsed = time.perf_counter() - start_time
+        if run_stats["failed_calls"] == failed_before:
+            latencies.append(max(elapsed, 0.0))
+    if not latencies:
+        return None
+    return sum(latencies) / len(latencies)
+
+def plan_run(purchaser_names, num2name, num2desc, rule_table=None, probe_size=3,
+             price_input=DEFAULT_PRICE_INPUT, price_output=DEFAULT_PRICE_OUTPUT, max_workers=None):
+    """
+    生成运行规划报告，不修改数据（探测请求除外）
+    """
+    unique_names = list(dict.fromkeys(purchaser_names))
+    taxonomy_key = get_taxonomy_key(num2name, num2desc)
+    with cache_lock:
+        cached = result_cache.get(taxonomy_key, {})
+        pending = [name for name in unique_names if name not in cached]
+    cache_hits = len(unique_names) - len(pending)
+
+    rule_hits = 0
+    if rule_table:
+        from rules import apply_rules
+        unmatched = [name for name in pending if apply_rules(name, rule_table) is None]
+        rule_hits = len(pending) - len(unmatched)
+        pending = unmatched
+
+    # 提示词中分类说明部分对每个名称都相同，只需估算一次
+    base_tokens = estimate_tokens(build_classify_prompt("", num2name, num2desc))
+    input_tokens = sum(base_tokens + estimate_tokens(name) for name in pending)
+    output_tokens = OUTPUT_TOKENS_PER_CALL * len(pending)
+    cost = input_tokens / 1e6 * price_input + output_tokens / 1e6 * price_output
+
+    latency = None
+    if probe_size > 0 and pending:
+        print(f"🔍 正在发送 {min(probe_size, len(pending))} 个探测请求测量接口延迟...")
+        latency = probe_latency(pending, num2name, num2desc, probe_size)
+    measured = latency is not None
+    if not measured:
+        latency = DEFAULT_LATENCY
+
+    if max_workers is None:
+        # 与正式运行相同：按总行数选择线程数
+        max_workers = choose_max_workers(len(purchaser_names))
+    # 每个后端有最小请求间隔，全局吞吐不超过各后端速率之和（按当前分类后端实际使用的后端池）
+    pool = core.active_pool()
+    worker_throughput = max_workers / latency
+    rate_limit_throughput = pool.total_rate()
+    throughput = min(worker_throughput, rate_limit_throughput)
+    bottleneck = "请求频率限制" if rate_limit_throughput < worker_throughput else "并发线程数"
+
+    return {
+        "总行数": len(purchaser_names),
+        "唯一名称数": len(unique_names),
+        "缓存命中名称数": cache_hits,
+        "规则命中名称数": rule_hits,
+        "需请求API名称数": len(pending),
+        "单条提示词tokens": base_tokens,
+        "预计输入tokens": input_tokens,
+        "预计输出tokens": output_tokens,
+        "预计费用(元)": round(cost, 2),
+        "单次请求延迟(秒)": round(latency, 3),
+        "延迟来源": "探测实测" if measured else "默认假设",
+        "并发线程数": max_workers,
+        "后端数量": len(pool.backends),
+        "预计吞吐(条/秒)": round(throughput, 2),
+        "吞吐瓶颈": bottleneck,
+        "预计耗时(分钟)": round(len(pending) / throughput / 60, 1) if pending else 0.0,
+    }
+
+def print_plan_report(plan):
+    """
+    打印运行规划报告
+    """
+    print("\n" + "="*60)
+    print("试运行规划报告（dry-run）")
+    print("="*60)
+    for item, value in plan.items():
+        print(f"   {item}: {value}")
+    print("="*60)
@@ -0,0 +1,191 @@
+"""
+提示词构造与模型输出解析
+生成分类、单条分类、批量分类共用，所有后端使用同一套提示词和解析规则
+"""
+
+import math
+import re
+
+# 生成分类失败时使用的默认分类
+DEFAULT_NUM2NAME = {
+    "类别1": "政府机构", "类别2": "教育机构", "类别3": "医疗机构", "类别4": "企业", "类别5": "科研机构",
+    "类别6": "交通运输", "类别7": "执法机构", "类别8": "文化机构", "类别9": "公共服务", "类别10": "其他"
+}
+DEFAULT_NUM2DESC = {
+    "类别1": "负责行政管理的机构", "类别2": "负责教育教学的机构", "类别3": "提供医疗服务的机构", "类别4": "各类企业公司",
+    "类别5": "从事科学研究的机构", "类别6": "负责交通运输的单位", "类别7": "执法和安全相关机构",
+    "类别8": "文化宣传和活动相关机构", "类别9": "提供公共服务的单位", "类别10": "不属于以上类别的其他机构"
+}
+
+def format_categories(num2name, num2desc):
+    # 将所有类别编号、类别名称和类别描述组成一个字符串（每个类别的描述一行）
+    return "\n".join([f"{num}:{num2name[num]}：{num2desc[num]}" for num in num2name])
+
+def build_categories_prompt(purchaser_names):
+    """
+    构造生成分类的提示词
+    """
+    return (
+        f"以下是{len(purchaser_names)}个采购方名称，请你根据内容总结出10个最合适的分类（其中一个为'其他'），"
+        "并为每个类别写一句简要解释。请用如下格式输出：\n"
+        "类别1：政府机构：负责行政管理的机构\n类别2：教育机构：负责教育教学的机构\n...（用中文，不要其他内容）\n"
+        + "\n".join(purchaser_names)
+    )
+
+def build_refine_prompt(num2name, num2desc, issues, examples):
+    """
+    构造修订分类的提示词：给出当前分类、质量评估发现的问题和问题类别中的名称示例，
+    要求只修改有问题的类别，输出格式与生成分类相同（用 parse_categories_response 解析）
+    """
+    cat_desc_str = format_categories(num2name, num2desc)
+    issues_str = "\n".join(f"- {issue}" for issue in issues)
+    examples_str = "\n".join(f"【{label}】{'、'.join(names)}" for label, names in examples.items())
+    return (
+        f"以下是当前的{len(num2name)}个分类及解释：\n{cat_desc_str}\n"
+        f"用这套分类对抽样的采购方名称分类后，质量评估发现以下问题：\n{issues_str}\n"
+        f"问题类别中的名称示例：\n{examples_str}\n"
+        f"请据此修订分类：只修改有问题的类别，其余类别的名称和解释保持原样不变；"
+        f"修订后仍为{len(num2name)}个类别（其中一个为'其他'）。请用如下格式输出：\n"
+        "类别1：政府机构：负责行政管理的机构\n类别2：教育机构：负责教育教学的机构\n...（用中文，不要其他内容）"
+    )
+
+def parse_categories_response(content):
+    """
+    解析编号、名称和解释
+    返回：编号到名称的映射、编号到解释的映射
+    """
+    lines = [line for line in content.split('\n') if '：' in line or ':' in line]
+    num2name, num2desc = {}, {}
+    for line in lines:
+        parts = line.replace('：', ':').split(':')
+        if len(parts) >= 3:
+            num, name, desc = parts[0].strip(), parts[1].strip(), parts[2].strip()
+        elif len(parts) == 2:
+            num, name, desc = parts[0].strip(), parts[1].strip(), ""
+        else:
+            continue
+        num2name[num] = name
+        num2desc[num] = desc
+    return num2name, num2desc
+
+def build_classify_prompt(name, num2name, num2desc):
+    """
+    构造单条分类的提示词
+    """
+    cat_desc_str = format_categories(num2name, num2desc)
+    return (
+        f"""已知有如下类别及解释：\n{cat_desc_str}\n请判断\"{name}\"最适合归入哪个类别，只返回类别编号，如'类别10'、'类别5'，不要其他解释。"""
+    )
+
+def parse_category_code(content):
+    """
+    从单条分类结果中提取类别编号
+    """
+    return content.strip().replace('：', ':').split(':')[0].strip()  # 只保留编号
+
+def match_category_prefix(content, num2name):
+    """
+    流式输出时判断已收到的内容是否以完整的类别编号开头：
+    编号后面已经出现了不能把它延长成另一个编号的字符（如'类别1'后是':'而不是'0'）时返回该编号，否则返回 None
+    """
+    text = content.lstrip()
+    for code in num2name:
+        if len(text) > len(code) and text.startswith(code):
+            extended = text[:len(code) + 1]
+            if not any(other.startswith(extended) for other in num2name):
+                return code
+    return None
+
+def category_confidence(token_logprobs, code, num2name):
+    """
+    由逐token的对数概率估计类别编号的置信度：组成编号的各token概率之积，不含编号之后的解释
+    编号是另一个编号的前缀时（'类别1'与'类别10'），再乘上紧随其后的token的概率（确认编号到此结束）
+    token_logprobs 为响应中的 choices[0].logprobs.content，没有对数概率时返回 None
+    """
+    if not token_logprobs:
+        return None
+    ambiguous = any(other != code and other.startswith(code) for other in num2name)
+    text = ""
+    total = 0.0
+    covered = False
+    for item in token_logprobs:
+        if covered:
+            return math.exp(total + item["logprob"])
+        text += item["token"]
+        total += item["logprob"]
+        if len(text.lstrip()) >= len(code):
+            if not ambiguous:
+                return math.exp(total)
+            covered = True
+    return math.exp(total) if covered else None
+
+def build_batch_prompt(names, num2name, num2desc):
+    """
+    构造批量分类的提示词，每个名称带序号
+    """
+    cat_desc_str = format_categories(num2name, num2desc)
+    names_str = "\n".join(f"{position + 1}. {name}" for position, name in enumerate(names))
+    return (
+        f"已知有如下类别及解释：\n{cat_desc_str}\n请判断以下每个名称最适合归入哪个类别，"
+        f"每行按'序号:类别编号'格式输出，如'1:类别5'，不要其他解释。\n{names_str}"
+    )
+
+def parse_batch_response(content, batch_size):
+    """
+    解析批量分类结果，每行形如 '3:类别5'
+    返回：序号（从0开始）到类别编号的映射
+    """
+    index2num = {}
+    for line in content.split('\n'):
+        parts = line.replace('：', ':').split(':')
+        if len(parts) < 2:
+            continue
+        position = parts[0].strip().rstrip('.、')
+        if position.isdigit() and 1 <= int(position) <= batch_size:
+            index2num[int(position) - 1] = parts[1].strip()
+    return index2num
+
+# 多分类体系提示词中各体系的编号前缀（体系A的类别编为A1、A2……）
+TAXONOMY_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def multi_taxonomy_codes(taxonomies):
+    """
+    多个分类体系的类别编号互相重复（都是'类别1'……），提示词中改用 体系字母+序号 区分
+    返回：每个体系的 {提示词编号: 原类别编号}
+    """
+    if len(taxonomies) > len(TAXONOMY_LETTERS):
+        raise ValueError(f"一次最多同时使用 {len(TAXONOMY_LETTERS)} 个分类体系")
+    return [
+        {f"{letter}{position + 1}": num for position, num in enumerate(num2name)}
+        for letter, (num2name, _) in zip(TAXONOMY_LETTERS, taxonomies)
+    ]
+
+def build_multi_classify_prompt(name, taxonomies):
+    """
+    构造多分类体系的单条分类提示词：一次请求给出名称在每个体系下的类别
+    taxonomies 为 [(num2name, num2desc)]
+    """
+    sections = []
+    for letter, codes, (num2name, num2desc) in zip(TAXONOMY_LETTERS, multi_taxonomy_codes(taxonomies), taxonomies):
+        lines = "\n".join(f"{code}:{num2name[num]}：{num2desc.get(num, '')}" for code, num in codes.items())
+        sections.append(f"分类体系{letter}：\n{lines}")
+    example = ",".join(f"{letter}1" for letter in TAXONOMY_LETTERS[:len(taxonomies)])
+    return (
+        f"已知有如下{len(taxonomies)}套相互独立的分类体系：\n" + "\n".join(sections) +
+        f"\n请判断\"{name}\"在每套分类体系中最适合归入的类别，每套体系只返回一个类别编号，用逗号分隔，"
+        f"如'{example}'，不要其他解释。"
+    )
+
+_MULTI_CODE_PATTERN = re.compile(r"([A-Z])\s*(\d+)")
+
+def parse_multi_response(content, taxonomies):
+    """
+    解析多分类体系的结果（如'A3,B5'），返回与 taxonomies 等长的原类别编号列表，缺失或无法识别的位置为 None
+    """
+    codes = multi_taxonomy_codes(taxonomies)
+    nums = [None] * len(taxonomies)
+    for letter, digits in _MULTI_CODE_PATTERN.findall(content.upper()):
+        position = TAXONOMY_LETTERS.find(letter)
+        if position < len(codes) and nums[position] is None:
+            nums[position] = codes[position].get(f"{letter}{digits}")
+    return nums
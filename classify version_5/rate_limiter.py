@@ -0,0 +1,214 @@
+"""
+跨进程共享的请求频率控制
+后端池只在本进程内为每个后端排时间槽；get_class.py、classify.py 和临时脚本同时使用同一个Key时，
+各进程互不知道对方，合计请求速率超过限额，触发成片的429。
+
+同一台机器上的所有进程从同一个 SQLite 表中预约时间槽（默认在系统临时目录，WAL 模式，
+BEGIN IMMEDIATE 保证预约互斥）：
+- 每个 (接口地址, Key) 一行，记录下一个可用时间槽和冷却截止时间（墙钟时间，各进程共用）
+- 任一进程收到429时写入冷却截止时间，其他进程在冷却期内也不再发请求
+- 不限速的后端（min_interval 为0，如本地推理服务）不经过共享表
+- 只有命令行入口调用 configure() 后才启用；回放录制（--cassette-mode replay）和离线后端不访问网络，不启用。
+  其他脚本需要时调用 set_limiter(SharedRateLimiter())
+- 数据库不可用时提示一次并退回进程内限速
+
+summary() 给出本进程的等待时间分位数、访问数据库的耗时，以及运行期间其他进程占用的时间槽数
+"""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from tracing import span, LatencyRecorder
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), "bidding_classifier_rate_limit.sqlite")
+
+# 最近多少秒内预约过时间槽的进程视为正在使用，更早的记录在预约时删除
+ACTIVE_WINDOW = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    limit_key TEXT PRIMARY KEY,
+    next_slot REAL NOT NULL,
+    cooldown_until REAL NOT NULL,
+    reservations INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clients (
+    limit_key TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (limit_key, pid)
+);
+"""
+
+def limit_key(backend):
+    """
+    同一个接口地址和Key共用一个限额（表中只保存Key的摘要）
+    """
+    return hashlib.sha256(f"{backend.url}|{backend.key}".encode('utf-8')).hexdigest()[:16]
+
+class SharedRateLimiter:
+    def __init__(self, path=DEFAULT_DB_PATH, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self.pid = os.getpid()
+        # sqlite3 连接不能跨线程共用，每个线程一个连接
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.disabled = False
+        self.waits = LatencyRecorder()
+        self.stats = {"reservations": 0, "wait": 0.0, "db_time": 0.0, "cooldowns": 0}
+        # 每个限额第一次预约时表中的累计预约数，用于计算其他进程占用的时间槽
+        self.first_seen = {}
+        self.last_total = {}
+        self.active_clients = 0
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self.local.connection = connection
+        return connection
+
+    def _transaction(self, func):
+        """
+        在 BEGIN IMMEDIATE 事务中执行 func(connection)；数据库不可用时返回 None 并停用共享限速
+        """
+        if self.disabled:
+            return None
+        start_time = time.perf_counter()
+        try:
+            with span("rate_limiter.db"):
+                connection = self._connection()
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    result = func(connection)
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            with self.lock:
+                if not self.disabled:
+                    self.disabled = True
+                    print(f"⚠️ 共享限速数据库不可用，改用进程内限速: {e}")
+            return None
+        with self.lock:
+            self.stats["db_time"] += time.perf_counter() - start_time
+        return result
+
+    def reserve(self, backend):
+        """
+        为后端预约下一个时间槽，返回需要等待的秒数（共享限速不可用时返回 None）
+        """
+        key = limit_key(backend)
+
+        def claim(connection):
+            now = time.time()
+            row = connection.execute(
+                "SELECT next_slot, cooldown_until, reservations FROM slots WHERE limit_key = ?", (key,)).fetchone()
+            next_slot, cooldown_until, reservations = row if row else (0.0, 0.0, 0)
+            slot = max(next_slot, cooldown_until, now)
+            connection.execute(
+                "INSERT OR REPLACE INTO slots (limit_key, next_slot, cooldown_until, reservations) VALUES (?, ?, ?, ?)",
+                (key, slot + backend.min_interval, cooldown_until, reservations + 1))
+            connection.execute("DELETE FROM clients WHERE last_seen < ?", (now - ACTIVE_WINDOW,))
+            connection.execute("INSERT OR REPLACE INTO clients (limit_key, pid, last_seen) VALUES (?, ?, ?)",
+                               (key, self.pid, now))
+            active = connection.execute("SELECT COUNT(*) FROM clients WHERE limit_key = ?", (key,)).fetchone()[0]
+            return slot - now, reservations, active
+
+        result = self._transaction(claim)
+        if result is None:
+            return None
+        wait, total_before, active = result
+        with self.lock:
+            self.first_seen.setdefault(key, total_before)
+            self.last_total[key] = total_before + 1
+            self.active_clients = max(self.active_clients, active)
+            self.stats["reservations"] += 1
+            self.stats["wait"] += max(wait, 0.0)
+        self.waits.record(backend.name, max(wait, 0.0))
+        return max(wait, 0.0)
+
+    def cooldown(self, backend, seconds):
+        """
+        收到429后让所有进程在 seconds 秒内都不再向该后端发请求
+        """
+        key = limit_key(backend)
+
+        def extend(connection):
+            until = time.time() + seconds
+            connection.execute(
+                "INSERT INTO slots (limit_key, next_slot, cooldown_until, reservations) VALUES (?, 0, ?, 0) "
+                "ON CONFLICT(limit_key) DO UPDATE SET cooldown_until = MAX(cooldown_until, excluded.cooldown_until)",
+                (key, until))
+
+        self._transaction(extend)
+        with self.lock:
+            self.stats["cooldowns"] += 1
+
+    def summary(self):
+        with self.lock:
+            stats = dict(self.stats)
+            others = sum(self.last_total[key] - self.first_seen[key] for key in self.last_total) - stats["reservations"]
+            active = self.active_clients
+        if not stats["reservations"]:
+            return {}
+        return {
+            "共享数据库": self.path,
+            "预约次数": stats["reservations"],
+            "累计等待(秒)": round(stats["wait"], 2),
+            "数据库耗时(秒)": round(stats["db_time"], 3),
+            "其他进程占用时间槽": max(others, 0),
+            "同时使用的进程数": active,
+            "触发全局冷却": stats["cooldowns"],
+            "等待分位数": self.waits.summary(),
+        }
+
+# 当前进程使用的共享限速，为 None 时只在进程内限速（由 configure() 按命令行参数创建）
+limiter = None
+
+def set_limiter(new_limiter):
+    global limiter
+    limiter = new_limiter
+
+def add_arguments(parser):
+    """
+    为命令行添加 --rate-limit-db / --no-shared-rate-limit 参数
+    """
+    parser.add_argument("--rate-limit-db", default=DEFAULT_DB_PATH,
+                        help="跨进程共享限速的 SQLite 文件（同一台机器上的进程共用同一个文件）")
+    parser.add_argument("--no-shared-rate-limit", action="store_true", help="只在本进程内控制请求频率")
+
+def configure(args):
+    """
+    按命令行参数设置共享限速；回放录制和离线后端不发真实请求，不与其他进程争用时间槽
+    """
+    replay = getattr(args, "cassette", None) and getattr(args, "cassette_mode", None) == "replay"
+    offline = getattr(args, "backend", "remote") == "offline"
+    if getattr(args, "no_shared_rate_limit", False) or replay or offline:
+        set_limiter(None)
+    else:
+        set_limiter(SharedRateLimiter(getattr(args, "rate_limit_db", DEFAULT_DB_PATH)))
+    return limiter
+
+def print_limiter_summary():
+    summary = limiter.summary() if limiter is not None else {}
+    if not summary:
+        return
+    print(f"\n🚦 跨进程共享限速:")
+    for item, value in summary.items():
+        if item != "等待分位数":
+            print(f"   {item}: {value}")
+    for name, stats in summary["等待分位数"].items():
+        details = ", ".join(f"{k}: {v}" for k, v in stats.items())
+        print(f"   {name} 等待 - {details}")
@@ -0,0 +1,39 @@
+"""
+基于名称后缀的本地规则分类
+只收录判断把握很高的后缀（如"医院""大学"），命中时无需请求API。
+规则指向的是类别名称中的关键词，因此可以适配每次重新生成的分类体系。
+"""
+
+# (名称后缀, 类别名称关键词)：名称以任一后缀结尾时，归入名称包含任一关键词的类别
+SUFFIX_RULES = [
+    (("附属医院", "医院", "卫生院", "社区卫生服务中心", "疾病预防控制中心", "妇幼保健院"), ("医疗", "卫生")),
+    (("大学", "学院", "职业技术学校", "中学", "小学", "幼儿园"), ("教育", "学校")),
+    (("公安局", "派出所", "人民法院", "人民检察院", "监狱", "海关"), ("执法", "公安", "司法")),
+    (("研究院", "研究所", "科学院", "实验室"), ("科研", "研究")),
+    (("图书馆", "博物馆", "文化馆", "美术馆", "档案馆"), ("文化",)),
+    (("人民政府", "街道办事处", "管理委员会"), ("政府", "行政")),
+    (("有限公司", "有限责任公司", "股份公司", "集团公司"), ("企业", "公司")),
+]
+
+def build_rule_table(num2name):
+    """
+    把后缀规则落到当前分类体系上
+    返回：[(名称后缀元组, 类别名称)]，类别体系中找不到对应类别的规则会被跳过
+    """
+    rule_table = []
+    for suffixes, keywords in SUFFIX_RULES:
+        for label in num2name.values():
+            if label != "其他" and any(keyword in label for keyword in keywords):
+                rule_table.append((suffixes, label))
+                break
+    return rule_table
+
+def apply_rules(name, rule_table):
+    """
+    返回规则给出的类别名称，未命中时返回 None
+    """
+    name = name.strip()
+    for suffixes, label in rule_table:
+        if name.endswith(suffixes):
+            return label
+    return None
@@ -0,0 +1,162 @@
+"""
+分层抽样
+生成分类和检验分类质量时，纯随机抽样经常漏掉数量少的机构类型，生成的分类体系缺少对应类别，
+检验时这些名称落入"其他"，导致质量不达标、需要多轮迭代。
+
+按三个本地特征对全部名称分层（在整列上向量化计算，不请求API）：
+- 机构后缀：匹配常见机构类型后缀（医院、大学、公安局……），未匹配时取最后一个字（局、院、所、站……）
+- 地区前缀：省级行政区简称，未匹配时取前两个字
+- 名称长度分档
+层 = 后缀 × 长度分档；层内按地区排序后等距抽取，样本在各地区之间也是分散的。
+
+- 生成分类（min_per_stratum=1）：每层至少抽1个（层数超过样本量时优先较大的层），其余按比例分配，罕见类型也能出现在提示词中
+- 检验质量（min_per_stratum=0）：严格按比例分配，样本中的类别占比与全量数据一致，评分不会被放大的小层扭曲
+"""
+
+import random
+
+from rules import SUFFIX_RULES
+
+# 规则中的后缀之外，再补充一些常见的机构类型后缀（长后缀在前，优先匹配）
+EXTRA_SUFFIXES = (
+    "委员会", "管理局", "管理处", "管理站", "服务中心", "事务中心", "保障中心", "工作站",
+    "分公司", "合作社", "事务所", "联合会", "协会", "学会", "基金会", "银行", "支行", "分行",
+    "部队", "医疗中心", "检测中心", "监测站", "大队", "支队", "总队", "中心",
+)
+
+REGION_PREFIXES = (
+    "北京", "天津", "上海", "重庆", "河北", "山西", "辽宁", "吉林", "黑龙江", "江苏", "浙江", "安徽",
+    "福建", "江西", "山东", "河南", "湖北", "湖南", "广东", "海南", "四川", "贵州", "云南", "陕西",
+    "甘肃", "青海", "台湾", "内蒙古", "广西", "西藏", "宁夏", "新疆", "香港", "澳门",
+)
+
+LENGTH_BINS = [0, 6, 10, 15, 20, float("inf")]
+LENGTH_LABELS = ["≤6", "7-10", "11-15", "16-20", ">20"]
+
+SAMPLING_MODES = ("stratified", "random")
+
+def _alternation(words):
+    return "|".join(sorted(set(words), key=len, reverse=True))
+
+SUFFIX_PATTERN = f"({_alternation([s for suffixes, _ in SUFFIX_RULES for s in suffixes] + list(EXTRA_SUFFIXES))})$"
+REGION_PATTERN = f"^({_alternation(REGION_PREFIXES)})"
+
+def name_features(names):
+    """
+    对整列名称向量化计算分层特征，返回 DataFrame（suffix / region / length 三列，与 names 同索引）
+    """
+    import pandas as pd
+    names = pd.Series(names, dtype=object).astype(str).str.strip()
+    suffix = names.str.extract(SUFFIX_PATTERN, expand=False).fillna(names.str[-1:])
+    region = names.str.extract(REGION_PATTERN, expand=False).fillna(names.str[:2])
+    length = pd.cut(names.str.len(), LENGTH_BINS, labels=LENGTH_LABELS, include_lowest=True)
+    return pd.DataFrame({"suffix": suffix, "region": region, "length": length.astype(str)}, index=names.index)
+
+def allocate(stratum_sizes, sample_size, min_per_stratum=0):
+    """
+    按比例把样本量分配到各层（最大余数法），min_per_stratum > 0 时先保证每层的最少数量
+    stratum_sizes 需按从大到小排列；层数过多、保证不了全部层时优先较大的层
+    返回：与 stratum_sizes 对应的各层抽样数
+    """
+    import numpy as np
+    sizes = np.asarray(stratum_sizes, dtype=np.int64)
+    quotas = np.zeros(len(sizes), dtype=np.int64)
+    if min_per_stratum > 0:
+        guaranteed = np.minimum(sizes, min_per_stratum)
+        affordable = np.cumsum(guaranteed) <= sample_size
+        quotas[affordable] = guaranteed[affordable]
+    remaining = sample_size - int(quotas.sum())
+    capacity = sizes - quotas
+    if remaining <= 0 or not capacity.sum():
+        return quotas
+    exact = capacity / capacity.sum() * remaining
+    extra = np.minimum(np.floor(exact).astype(np.int64), capacity)
+    leftover = remaining - int(extra.sum())
+    # 余数最大的层依次多分1个（不超过该层剩余数量）
+    for position in np.argsort(-(exact - extra), kind="stable"):
+        if leftover <= 0:
+            break
+        if extra[position] < capacity[position]:
+            extra[position] += 1
+            leftover -= 1
+    return quotas + extra
+
+class NameSampler:
+    """
+    对同一列名称多次抽样；分层特征在第一次分层抽样时计算，之后复用
+    """
+    def __init__(self, names, mode="stratified"):
+        import pandas as pd
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"未知的抽样方式: {mode}（可选 {', '.join(SAMPLING_MODES)}）")
+        self.names = pd.Series(list(names), dtype=object)
+        self.mode = mode
+        self.strata = None
+        self.regions = None
+        self.last_report = {}
+
+    def _ensure_features(self):
+        if self.strata is None:
+            features = name_features(self.names)
+            self.strata = features["suffix"] + "|" + features["length"]
+            self.regions = features["region"]
+
+    def sample(self, sample_size, min_per_stratum=0, exclude=None, rng=random):
+        """
+        抽取 sample_size 个名称（可以重复出现，与按行随机抽样一致），候选不足时返回全部候选
+        exclude 为已抽过的名称集合，这些名称不再参与本次抽样
+        """
+        candidates = self.names.index
+        if exclude:
+            candidates = candidates[~self.names.isin(exclude).to_numpy()]
+        if len(candidates) <= sample_size:
+            chosen = list(candidates)
+            self.last_report = {"抽样方式": "全部", "样本量": len(chosen)}
+        elif self.mode == "random":
+            chosen = rng.sample(list(candidates), sample_size)
+            self.last_report = {"抽样方式": "随机", "样本量": len(chosen)}
+        else:
+            chosen = self._stratified(candidates, sample_size, min_per_stratum, rng)
+        return self.names.loc[chosen].tolist()
+
+    def _stratified(self, candidates, sample_size, min_per_stratum, rng):
+        import pandas as pd
+        self._ensure_features()
+        # 层内按地区排序，同地区内随机打乱，再等距抽取
+        frame = pd.DataFrame({
+            "stratum": self.strata.loc[candidates].to_numpy(),
+            "region": self.regions.loc[candidates].to_numpy(),
+            "shuffle": [rng.random() for _ in range(len(candidates))],
+        }, index=candidates)
+        frame = frame.sort_values(["stratum", "region", "shuffle"], kind="stable")
+        stratum_sizes = frame["stratum"].value_counts()
+        quotas = dict(zip(stratum_sizes.index, allocate(stratum_sizes.to_numpy(), sample_size, min_per_stratum)))
+
+        chosen = []
+        for stratum, rows in frame.groupby("stratum", sort=False).groups.items():
+            quota = quotas[stratum]
+            if not quota:
+                continue
+            step = len(rows) / quota
+            start = rng.random() * step
+            chosen.extend(rows[int(start + i * step)] for i in range(quota))
+        rng.shuffle(chosen)
+        self.last_report = {
+            "抽样方式": "分层",
+            "样本量": len(chosen),
+            "总层数": len(stratum_sizes),
+            "覆盖层数": sum(1 for quota in quotas.values() if quota),
+        }
+        return chosen
+
+    def describe(self):
+        """
+        上一次抽样的说明，如"分层抽样 300 个（覆盖 42/57 层）"
+        """
+        report = self.last_report
+        if report["抽样方式"] == "全部":
+            return f"使用全部 {report['样本量']} 个"
+        text = f"{report['抽样方式']}抽样 {report['样本量']} 个"
+        if "总层数" in report:
+            text += f"（覆盖 {report['覆盖层数']}/{report['总层数']} 层）"
+        return text
@@ -0,0 +1,291 @@
+"""
+实时分类API服务
+常驻进程只加载一次 categories.json，把并发到达的请求合并成微批次后再调用大模型：
+- 同一名称在处理中时，后续请求直接复用同一个结果
+- 批次大小和最长等待时间都有上限，保证单条请求的响应时间
+- 分类文件修改后自动热加载，也可以调用 /reload 手动加载；每个请求在到达时取定分类体系，
+  处理中的请求不受重新加载影响，响应中的 taxonomy 就是分类所用的体系
+- 等待分类的名称数有上限（--max-pending），排队的批次也有上限，超载时返回 503 而不是无限排队
+- /stats 返回各接口的延迟分位数
+
+用法：python server.py --categories categories.json --port 8000
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core import classify_batch_items, get_taxonomy_key, load_categories_from_json
+from tracing import LatencyRecorder
+
+# 延迟统计按固定的接口名称分组，其他路径统一记为 other，避免任意路径撑大统计表
+ROUTES = {("GET", "/health"), ("GET", "/stats"), ("POST", "/classify"), ("POST", "/reload")}
+
+class ServerOverloaded(Exception):
+    """
+    等待分类的名称数已达上限
+    """
+
+class TaxonomyStore:
+    """
+    持有当前分类体系，文件修改时间变化时自动重新加载
+    """
+    def __init__(self, filename, check_interval=2.0):
+        self.filename = filename
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.last_check = 0.0
+        self.num2name, self.num2desc, self.key = None, None, None
+        if not self.reload():
+            raise RuntimeError(f"无法加载分类文件 {filename}")
+
+    def reload(self):
+        num2name, num2desc = load_categories_from_json(self.filename)
+        if num2name is None or num2desc is None:
+            return False
+        with self.lock:
+            self.num2name, self.num2desc = num2name, num2desc
+            self.key = get_taxonomy_key(num2name, num2desc)
+            self.mtime = os.path.getmtime(self.filename)
+        return True
+
+    def snapshot(self):
+        """
+        返回 (分类体系指纹, num2name, num2desc)，必要时先检查文件是否更新
+        """
+        now = time.time()
+        if now - self.last_check >= self.check_interval:
+            self.last_check = now
+            try:
+                if os.path.getmtime(self.filename) != self.mtime:
+                    print(f"🔄 检测到 {self.filename} 已更新，重新加载分类")
+                    self.reload()
+            except OSError:
+                pass
+        with self.lock:
+            return self.key, self.num2name, self.num2desc
+
+class MicroBatcher:
+    """
+    把单条分类请求合并成微批次
+    批次在达到 max_batch_size 或第一条请求等待超过 max_wait_ms 时发出
+    同时执行 max_concurrent_batches 个批次，另有 max_queued_batches 个批次排队；都占满时名称留在 pending 中，
+    pending 达到 max_pending 后新名称直接拒绝（ServerOverloaded）
+    """
+    def __init__(self, store, max_batch_size=20, max_wait_ms=50, max_concurrent_batches=4, max_queued_batches=4,
+                 max_pending=1000):
+        self.store = store
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.condition = threading.Condition()
+        self.pending = []       # 等待发出的 (分类体系快照, 名称)
+        self.in_flight = {}     # (分类体系指纹, 名称) -> Future
+        self.first_arrival = None
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_batches)
+        # 执行中和排队的批次数上限
+        self.batch_slots = threading.Semaphore(max_concurrent_batches + max_queued_batches)
+        self.stats = {"requests": 0, "coalesced": 0, "rejected": 0, "batches": 0, "batched_names": 0}
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+
+    def submit(self, name, taxonomy=None):
+        """
+        taxonomy 为请求到达时取定的 (分类体系指纹, num2name, num2desc)，不指定时使用当前分类体系
+        """
+        return self.submit_many([name], taxonomy)[0]
+
+    def submit_many(self, names, taxonomy=None):
+        """
+        提交一个请求中的全部名称，返回与 names 等长的 Future 列表
+        先检查容量再入队：超载时整个请求被拒绝，不会留下已入队的部分名称
+        """
+        if taxonomy is None:
+            taxonomy = self.store.snapshot()
+        with self.condition:
+            self.stats["requests"] += len(names)
+            new_names = [name for name in dict.fromkeys(names) if (taxonomy[0], name) not in self.in_flight]
+            if len(self.pending) + len(new_names) > self.max_pending:
+                self.stats["rejected"] += len(names)
+                raise ServerOverloaded(f"等待分类的名称已达上限 {self.max_pending}")
+            self.stats["coalesced"] += len(names) - len(new_names)
+            for name in new_names:
+                self.in_flight[(taxonomy[0], name)] = Future()
+                self.pending.append((taxonomy, name))
+            if new_names:
+                if self.first_arrival is None:
+                    self.first_arrival = time.monotonic()
+                self.condition.notify()
+            return [self.in_flight[(taxonomy[0], name)] for name in names]
+
+    def _dispatch_loop(self):
+        while True:
+            # 执行中和排队的批次都已占满时不再取批次，新名称留在 pending 中（超过上限时拒绝）
+            self.batch_slots.acquire()
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                # 凑满一批或等到超时
+                while len(self.pending) < self.max_batch_size:
+                    remaining = self.first_arrival + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self.pending[:self.max_batch_size]
+                self.pending = self.pending[self.max_batch_size:]
+                self.first_arrival = time.monotonic() if self.pending else None
+                self.stats["batches"] += 1
+                self.stats["batched_names"] += len(batch)
+            self.executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        try:
+            # 重新加载分类前后到达的名称可能在同一批次中，按各自的分类体系分别处理
+            groups = {}
+            for taxonomy, name in batch:
+                groups.setdefault(taxonomy[0], (taxonomy, []))[1].append(name)
+            for (taxonomy_key, num2name, num2desc), names in groups.values():
+                try:
+                    labels = classify_batch_items(names, num2name, num2desc)
+                    error = None
+                except Exception as e:
+                    labels, error = None, e
+                with self.condition:
+                    futures = [self.in_flight.pop((taxonomy_key, name)) for name in names]
+                for i, future in enumerate(futures):
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(labels[i])
+        finally:
+            self.batch_slots.release()
+
+def parse_names(body):
+    """
+    从请求体中取出名称列表：{"names": [...]} 或 {"name": "..."}，名称必须是非空字符串
+    """
+    if not isinstance(body, dict):
+        raise ValueError("请求体必须是JSON对象")
+    names = body["names"] if "names" in body else [body["name"]]
+    if not isinstance(names, list) or not names:
+        raise ValueError("names 必须是非空列表")
+    if not all(isinstance(name, str) and name.strip() for name in names):
+        raise ValueError("names 中的每个名称都必须是非空字符串")
+    return names
+
+class ClassifyRequestHandler(BaseHTTPRequestHandler):
+    store = None
+    batcher = None
+    latency = None
+    request_timeout = 60
+
+    def do_GET(self):
+        start_time = time.perf_counter()
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "taxonomy": self.store.snapshot()[0]})
+        elif self.path == "/stats":
+            self._send_json(200, {"latency": self.latency.summary(), "batching": dict(self.batcher.stats)})
+        else:
+            self._send_json(404, {"error": "not found"})
+        self._record_latency("GET", start_time)
+
+    def do_POST(self):
+        start_time = time.perf_counter()
+        if self.path == "/classify":
+            self._handle_classify()
+        elif self.path == "/reload":
+            ok = self.store.reload()
+            self._send_json(200 if ok else 500, {"reloaded": ok, "taxonomy": self.store.snapshot()[0]})
+        else:
+            self._send_json(404, {"error": "not found"})
+        self._record_latency("POST", start_time)
+
+    def _record_latency(self, method, start_time):
+        route = f"{method} {self.path}" if (method, self.path) in ROUTES else "other"
+        self.latency.record(route, time.perf_counter() - start_time)
+
+    def _handle_classify(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            names = parse_names(body)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"请求格式错误: {e}"})
+            return
+        # 整个请求使用到达时的分类体系，处理期间重新加载不会混用新旧分类
+        taxonomy = self.store.snapshot()
+        try:
+            futures = self.batcher.submit_many(names, taxonomy)
+        except ServerOverloaded as e:
+            self._send_json(503, {"error": f"服务繁忙: {e}"}, {"Retry-After": "1"})
+            return
+        try:
+            labels = [future.result(timeout=self.request_timeout) for future in futures]
+        except Exception as e:
+            self._send_json(502, {"error": f"分类失败: {e}"})
+            return
+        self._send_json(200, {
+            "labels": labels,
+            "results": [{"name": name, "label": label} for name, label in zip(names, labels)],
+            "taxonomy": taxonomy[0],
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def create_server(categories_file="categories.json", host="127.0.0.1", port=8000,
+                  max_batch_size=20, max_wait_ms=50, max_concurrent_batches=4, max_queued_batches=4, max_pending=1000):
+    """
+    创建实时分类服务（调用 serve_forever() 启动）
+    """
+    store = TaxonomyStore(categories_file)
+    handler = type("Handler", (ClassifyRequestHandler,), {
+        "store": store,
+        "batcher": MicroBatcher(store, max_batch_size, max_wait_ms, max_concurrent_batches, max_queued_batches,
+                                max_pending),
+        "latency": LatencyRecorder(),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="招投标机构分类系统 - 实时分类API服务")
+    parser.add_argument("--categories", default="categories.json", help="分类文件路径")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--batch-size", type=int, default=20, help="每个微批次的最大名称数")
+    parser.add_argument("--max-wait-ms", type=int, default=50, help="凑批的最长等待时间（毫秒）")
+    parser.add_argument("--concurrent-batches", type=int, default=4, help="同时进行的批次数")
+    parser.add_argument("--queued-batches", type=int, default=4, help="等待执行的批次数上限")
+    parser.add_argument("--max-pending", type=int, default=1000, help="等待分类的名称数上限，超过时返回503")
+    args = parser.parse_args(argv)
+
+    server = create_server(args.categories, args.host, args.port,
+                           args.batch_size, args.max_wait_ms, args.concurrent_batches,
+                           args.queued_batches, args.max_pending)
+    print(f"🚀 实时分类服务已启动: http://{args.host}:{args.port}")
+    print("   POST /classify  {\"name\": ...} 或 {\"names\": [...]}")
+    print("   POST /reload    重新加载分类文件")
+    print("   GET  /stats     延迟分位数与批处理统计")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 服务已停止")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+分类体系版本管理与增量重分类
+- categories.json 中记录内容指纹 taxonomy_hash 和上一版本的 previous_hash，
+  每个版本另存到 taxonomy_versions/<指纹>.json，可随时取回旧版本
+- diff_taxonomies 按类别名称比较两个版本：新增、删除、改名（描述基本不变）、描述修改
+- 重分类时只重新请求"原类别受影响"或"可能改判"的名称，其余名称沿用上次结果
+
+用法：python taxonomy.py 旧分类.json 新分类.json   （也可以用指纹代替文件路径）
+"""
+
+import argparse
+import glob
+import json
+import os
+from collections import Counter
+
+from core import get_taxonomy_key, store_cache
+from rules import build_rule_table, apply_rules
+
+VERSIONS_DIR = "taxonomy_versions"
+
+# 识别改名时两段描述的最低相似度（字符二元组 Jaccard）
+RENAME_SIMILARITY = 0.5
+
+# 新增类别名称中去掉这些通用后缀后，剩余部分出现在名称里的视为可能改判
+GENERIC_SUFFIXES = ("机构", "单位", "部门", "组织", "类")
+
+def taxonomy_hash(num2name, num2desc):
+    """
+    分类体系内容指纹，与结果缓存使用同一指纹
+    """
+    return get_taxonomy_key(num2name, num2desc)
+
+def versions_dir_for(categories_file):
+    return os.path.join(os.path.dirname(os.path.abspath(categories_file)), VERSIONS_DIR)
+
+def archive_taxonomy(num2name, num2desc, versions_dir, timestamp=None):
+    """
+    把一个分类版本保存到 versions_dir/<指纹>.json，返回指纹
+    """
+    key = taxonomy_hash(num2name, num2desc)
+    os.makedirs(versions_dir, exist_ok=True)
+    path = os.path.join(versions_dir, f"{key}.json")
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"num2name": num2name, "num2desc": num2desc, "timestamp": timestamp,
+                       "taxonomy_hash": key}, f, ensure_ascii=False, indent=2)
+    return key
+
+def read_taxonomy_file(filename):
+    """
+    读取分类文件，返回 (num2name, num2desc, 原始JSON)
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data["num2name"], data["num2desc"], data
+
+def current_hash(filename):
+    """
+    返回已有分类文件的指纹（旧文件没有记录时现场计算），文件不存在时返回 None
+    """
+    if not os.path.exists(filename):
+        return None
+    num2name, num2desc, data = read_taxonomy_file(filename)
+    return data.get("taxonomy_hash") or taxonomy_hash(num2name, num2desc)
+
+def resolve_taxonomy(ref, versions_dir):
+    """
+    按文件路径或指纹（可只写前缀）找到分类版本
+    返回：(num2name, num2desc)
+    """
+    if os.path.exists(ref):
+        num2name, num2desc, _ = read_taxonomy_file(ref)
+        return num2name, num2desc
+    matches = glob.glob(os.path.join(versions_dir, f"{ref}*.json"))
+    if len(matches) != 1:
+        raise FileNotFoundError(f"在 {versions_dir} 中找到 {len(matches)} 个匹配 '{ref}' 的分类版本")
+    num2name, num2desc, _ = read_taxonomy_file(matches[0])
+    return num2name, num2desc
+
+def _similarity(a, b):
+    grams_a = {a[i:i + 2] for i in range(len(a) - 1)}
+    grams_b = {b[i:i + 2] for i in range(len(b) - 1)}
+    if not grams_a and not grams_b:
+        return 1.0 if a == b else 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+def diff_taxonomies(old_num2name, old_num2desc, new_num2name, new_num2desc):
+    """
+    按类别名称比较两个分类版本（输出文件中保存的是类别名称，而编号每次生成都可能变化）
+    删除的类别与新增的类别描述足够相似时视为改名
+    """
+    old_desc = {name: old_num2desc.get(num, "") for num, name in old_num2name.items()}
+    new_desc = {name: new_num2desc.get(num, "") for num, name in new_num2name.items()}
+    removed = [name for name in old_desc if name not in new_desc]
+    added = [name for name in new_desc if name not in old_desc]
+    desc_changed = [name for name in old_desc if name in new_desc and old_desc[name] != new_desc[name]]
+
+    renamed = {}
+    candidates = sorted(
+        ((_similarity(old_desc[old], new_desc[new]), old, new) for old in removed for new in added),
+        reverse=True,
+    )
+    for score, old, new in candidates:
+        if score < RENAME_SIMILARITY:
+            break
+        if old not in renamed and new not in renamed.values():
+            renamed[old] = new
+
+    return {
+        "old_hash": taxonomy_hash(old_num2name, old_num2desc),
+        "new_hash": taxonomy_hash(new_num2name, new_num2desc),
+        "added": [name for name in added if name not in renamed.values()],
+        "removed": [name for name in removed if name not in renamed],
+        "renamed": renamed,
+        "desc_changed": desc_changed,
+    }
+
+def print_taxonomy_diff(diff):
+    print(f"\n🔀 分类版本变化: {diff['old_hash'][:8]} → {diff['new_hash'][:8]}")
+    if not (diff["added"] or diff["removed"] or diff["renamed"] or diff["desc_changed"]):
+        print("   两个版本完全相同")
+        return
+    for name in diff["added"]:
+        print(f"   ➕ 新增: {name}")
+    for name in diff["removed"]:
+        print(f"   ➖ 删除: {name}")
+    for old, new in diff["renamed"].items():
+        print(f"   ✏️ 改名: {old} → {new}")
+    for name in diff["desc_changed"]:
+        print(f"   📝 描述修改: {name}")
+
+def plan_reclassification(names, previous_labels, new_num2name, diff, problem_labels=()):
+    """
+    决定哪些名称需要重新请求：
+    - 没有历史结果、原类别被删除或描述修改
+    - 原类别在质量评估中被指出有问题（problem_labels，如过大需拆分、过小需合并），即使修订后名称和描述未变
+    - 原为"其他"且有新增类别或描述修改（可能被新类别吸收）
+    - 命中新增类别的后缀规则，或名称中含有新增类别的关键词
+    其余名称沿用历史结果（改名的类别自动换成新名称）
+    返回：(沿用的 {名称: 类别}, 需重新请求的名称列表, 各原因计数)
+    """
+    new_labels = set(new_num2name.values())
+    problem_labels = set(problem_labels)
+    affected = set(diff["removed"]) | set(diff["desc_changed"])
+    other_at_risk = bool(diff["added"] or diff["desc_changed"])
+    added = set(diff["added"])
+    added_rules = [(suffixes, label) for suffixes, label in build_rule_table(new_num2name) if label in added]
+    added_keywords = []
+    for label in diff["added"]:
+        keyword = label
+        for suffix in GENERIC_SUFFIXES:
+            if keyword.endswith(suffix) and len(keyword) > len(suffix) + 1:
+                keyword = keyword[:-len(suffix)]
+                break
+        if len(keyword) >= 2:
+            added_keywords.append(keyword)
+
+    kept, resend, reasons = {}, [], Counter()
+    seen = set()
+    for name, label in zip(names, previous_labels):
+        if name in seen:
+            continue
+        seen.add(name)
+        if not isinstance(label, str) or not label:
+            reason = "无历史结果"
+        elif label in problem_labels:
+            reason = "原类别有质量问题"
+        else:
+            label = diff["renamed"].get(label, label)
+            if label in affected:
+                reason = "原类别已删除或修改"
+            elif label not in new_labels:
+                reason = "原类别不在新分类中"
+            elif label == "其他" and other_at_risk:
+                reason = "原为其他"
+            elif apply_rules(name, added_rules) is not None or any(k in name for k in added_keywords):
+                reason = "可能归入新增类别"
+            else:
+                kept[name] = label
+                continue
+        reasons[reason] += 1
+        resend.append(name)
+    return kept, resend, reasons
+
+def load_previous_labels(previous_output, name_column="Purchaser_Name"):
+    """
+    读取上次的分类输出，返回 (名称列表, 类别列表)
+    """
+    from data_io import load_input_table
+    df = load_input_table(previous_output, name_column, "Classification")
+    return df[name_column].tolist(), df["Classification"].tolist()
+
+def prepare_reclassification(num2name, num2desc, previous_output, categories_file,
+                             previous_ref=None, name_column="Purchaser_Name"):
+    """
+    对比上次输出所用的分类版本与当前版本，把可沿用的结果写入结果缓存，
+    之后的正常分类流程只会请求需重新判断的名称
+    previous_ref 为旧分类文件或指纹，不指定时使用 categories.json 中记录的 previous_hash
+    返回：重分类摘要；找不到旧版本时返回 None
+    """
+    versions_dir = versions_dir_for(categories_file)
+    if not previous_ref:
+        _, _, data = read_taxonomy_file(categories_file)
+        previous_ref = data.get("previous_hash")
+        if not previous_ref:
+            print(f"❌ {categories_file} 中没有记录上一个分类版本，请用 --previous-categories 指定")
+            return None
+    try:
+        old_num2name, old_num2desc = resolve_taxonomy(previous_ref, versions_dir)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return None
+
+    diff = diff_taxonomies(old_num2name, old_num2desc, num2name, num2desc)
+    print_taxonomy_diff(diff)
+
+    names, labels = load_previous_labels(previous_output, name_column)
+    kept, resend, reasons = plan_reclassification(names, labels, num2name, diff)
+    new_key = taxonomy_hash(num2name, num2desc)
+    for name, label in kept.items():
+        store_cache(new_key, name, label)
+
+    summary = {
+        "历史结果名称数": len(kept) + len(resend),
+        "沿用结果数": len(kept),
+        "需重新分类数": len(resend),
+        "重新分类原因": dict(reasons),
+    }
+    print(f"\n♻️ 增量重分类: 沿用 {len(kept)} 条，重新分类 {len(resend)} 条")
+    for reason, count in reasons.items():
+        print(f"   {reason}: {count}")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="招投标机构分类系统 - 分类版本对比")
+    parser.add_argument("old", help="旧分类文件路径或指纹")
+    parser.add_argument("new", nargs="?", default="categories.json", help="新分类文件路径或指纹（默认categories.json）")
+    parser.add_argument("--versions-dir", default=VERSIONS_DIR, help="分类版本目录")
+    args = parser.parse_args(argv)
+    old_num2name, old_num2desc = resolve_taxonomy(args.old, args.versions_dir)
+    new_num2name, new_num2desc = resolve_taxonomy(args.new, args.versions_dir)
+    print_taxonomy_diff(diff_taxonomies(old_num2name, old_num2desc, new_num2name, new_num2desc))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+分类后端测试
+离线后端不访问网络，直接检查分类结果
+"""
+
+from backends import OfflineBackend
+from prompts import DEFAULT_NUM2NAME, DEFAULT_NUM2DESC
+
+def classify(name):
+    code = OfflineBackend().classify_name(name, DEFAULT_NUM2NAME, DEFAULT_NUM2DESC)
+    return DEFAULT_NUM2NAME[code]
+
+def test_offline_ignores_bigrams_shared_by_most_categories():
+    # 只和类别名共有"机构"的名称不能落到第一个类别
+    assert classify("奇怪机构") == "其他"
+    assert classify("其他测试机构") == "其他"
+
+def test_offline_matches_distinctive_bigrams():
+    assert classify("北京市政府") == "政府机构"
+    assert classify("市文化馆") == "文化机构"
+
+def test_offline_tie_is_other():
+    # "政府"对应政府机构，"文化"对应文化机构，得分并列
+    assert classify("政府文化") == "其他"
+
+def test_offline_rules_win():
+    assert classify("清华大学") == "教育机构"
@@ -0,0 +1,75 @@
+"""
+批量模式测试
+分类后端用桩代替，不访问网络
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("tqdm")
+
+import core
+import input_cache
+from backends import ClassifierBackend
+from batch import run_batch_from_args
+from classify import parse_args
+
+NUM2NAME = {"类别1": "教育机构", "类别2": "其他"}
+
+class FlakyBackend(ClassifierBackend):
+    """
+    每个名称的前 failures 次请求失败
+    """
+    def __init__(self, failures=2):
+        super().__init__()
+        self.failures = failures
+        self.attempts = {}
+
+    def classify_name(self, name, num2name, num2desc):
+        self.attempts[name] = self.attempts.get(name, 0) + 1
+        if self.attempts[name] <= self.failures:
+            raise RuntimeError("temporary failure")
+        return "类别1" if name.endswith("大学") else "类别2"
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    categories = tmp_path / "categories.json"
+    categories.write_text(json.dumps({"num2name": NUM2NAME, "num2desc": NUM2NAME}, ensure_ascii=False),
+                          encoding="utf-8")
+    data = tmp_path / "a.csv"
+    data.write_text("Purchaser_Name\n清华大学\n某公司\n清华大学\n", encoding="utf-8")
+    previous_backend, previous_cache_dir = core.backend, input_cache.cache_dir
+    previous_stats = dict(core.run_stats)
+    input_cache.set_cache_dir(None)
+    monkeypatch.setattr(core.time, "sleep", lambda seconds: None)
+    core.result_cache.clear()
+    yield tmp_path
+    core.set_backend(previous_backend)
+    input_cache.set_cache_dir(previous_cache_dir)
+    core.run_stats.update(previous_stats)
+    core.result_cache.clear()
+
+def test_reclassify_is_rejected(workspace, capsys):
+    args = parse_args([str(workspace / "a.csv"), "--categories", str(workspace / "categories.json"),
+                       "--reclassify", str(workspace / "old.xlsx")])
+    assert run_batch_from_args(args) is None
+    assert "--reclassify" in capsys.readouterr().out
+    assert not (workspace / "a_classified.csv").exists()
+
+def test_request_counts_exclude_retries(workspace):
+    core.set_backend(FlakyBackend(failures=2))
+    for key in core.run_stats:
+        core.run_stats[key] = 0
+    args = parse_args([str(workspace / "a.csv"), "--categories", str(workspace / "categories.json"),
+                       "--output-format", "csv"])
+    report = run_batch_from_args(args)
+    entry = report["文件明细"][0]
+    assert entry["状态"] == "成功"
+    # 两个不同的名称各请求一次，每次请求前两次尝试失败
+    assert entry["API请求数"] == 2
+    assert entry["API请求次数(含重试)"] == 6
+    assert report["API请求数"] == 2
+    assert (workspace / "a_classified.csv").read_text(encoding="utf-8-sig").splitlines()[1:] == [
+        "清华大学,教育机构", "某公司,其他", "清华大学,教育机构"]
@@ -0,0 +1,88 @@
+"""
+Token预算测试
+不访问网络，直接记录模拟的 usage
+"""
+
+import json
+import threading
+
+import pytest
+
+import budget
+from budget import TokenBudget, BudgetExceeded
+
+def usage(tokens):
+    return {"prompt_tokens": tokens, "completion_tokens": 0, "total_tokens": tokens}
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(budget.time, "sleep", calls.append)
+    return calls
+
+def test_throttle_at_80_percent(sleeps):
+    token_budget = TokenBudget(None, run_limit=100, throttle_delay=0.5)
+    token_budget.record(usage(79))
+    assert token_budget.before_request() is True
+    assert sleeps == []
+    token_budget.record(usage(1))
+    assert token_budget.before_request() is True
+    assert sleeps == [0.5]
+
+def test_fallback_at_95_percent(sleeps):
+    token_budget = TokenBudget(None, run_limit=100)
+    token_budget.record(usage(95))
+    assert token_budget.before_request() is False
+    assert sleeps == []
+
+def test_stop_at_95_percent(tmp_path, sleeps):
+    state_file = str(tmp_path / "budget.json")
+    token_budget = TokenBudget(state_file, daily_limit=100, on_exhausted="stop")
+    token_budget.record(usage(94))
+    assert token_budget.before_request() is True
+    token_budget.record(usage(1))
+    with pytest.raises(BudgetExceeded):
+        token_budget.before_request()
+    # 停止前保存每日用量，下次运行继续累计
+    with open(state_file, encoding="utf-8") as f:
+        assert json.load(f)["daily"][TokenBudget.today()] == 95
+
+def test_processes_sharing_a_file_do_not_overwrite_each_other(tmp_path):
+    state_file = str(tmp_path / "budget.json")
+    # 两个实例模拟两个进程（如 watcher 和 classify.py），各自先读入了同一个旧状态
+    first, second = TokenBudget(state_file), TokenBudget(state_file)
+    first.record(usage(100))
+    second.record(usage(50))
+    first.save()
+    second.save()
+    assert second.daily_used() == 150
+    first.save()
+    assert first.daily_used() == 150
+    with open(state_file, encoding="utf-8") as f:
+        assert json.load(f)["daily"][TokenBudget.today()] == 150
+
+def test_concurrent_saves_keep_every_record(tmp_path):
+    state_file = str(tmp_path / "budget.json")
+    budgets = [TokenBudget(state_file) for _ in range(4)]
+
+    def worker(token_budget):
+        for _ in range(50):
+            token_budget.record(usage(1))
+            token_budget.save()
+
+    threads = [threading.Thread(target=worker, args=(token_budget,)) for token_budget in budgets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(state_file, encoding="utf-8") as f:
+        assert json.load(f)["daily"][TokenBudget.today()] == 200
+
+def test_daily_limit_sees_other_process_usage(tmp_path, monkeypatch, sleeps):
+    state_file = str(tmp_path / "budget.json")
+    monkeypatch.setattr(budget, "SYNC_INTERVAL", 0.0)
+    watcher, classify = TokenBudget(state_file, daily_limit=100), TokenBudget(state_file, daily_limit=100)
+    watcher.record(usage(96))
+    watcher.save()
+    # 本进程没有任何消耗，但另一个进程已经用掉了每日预算
+    assert classify.before_request() is False
@@ -0,0 +1,200 @@
+"""
+模型级联测试
+快速层和强模型都用桩后端代替，不访问网络
+"""
+
+import math
+import time
+
+import pytest
+
+import cascade
+import core
+from api_pool import Backend, BackendPool
+from backends import ClassifierBackend, ChatBackend, RemoteChatBackend, OfflineBackend
+from prompts import category_confidence
+
+NUM2NAME = {"类别1": "政府机构", "类别2": "教育机构", "类别10": "文化机构", "类别3": "其他"}
+NUM2DESC = {num: label for num, label in NUM2NAME.items()}
+
+class StubFast(ClassifierBackend):
+    """
+    按名称返回预设的 (类别编号, 置信度)
+    """
+    def __init__(self, results):
+        super().__init__()
+        self.results = results
+        self.calls = []
+
+    def classify_name_scored(self, name, num2name, num2desc):
+        self.calls.append(name)
+        return self.results[name]
+
+class StubStrong(ClassifierBackend):
+    """
+    前 failures 次请求失败，之后返回 code
+    """
+    def __init__(self, code="类别2", failures=0):
+        super().__init__()
+        self.code = code
+        self.failures = failures
+        self.calls = 0
+
+    def classify_name(self, name, num2name, num2desc):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("strong tier unavailable")
+        return self.code
+
+class FixedRandom:
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(cascade.time, "sleep", sleeps.append)
+    monkeypatch.setattr(core.time, "sleep", sleeps.append)
+    return sleeps
+
+def make_cascade(fast_results, strong, audit=1.0):
+    # audit 为随机数：小于 audit_rate 时抽检
+    return cascade.CascadeBackend(StubFast(fast_results), strong, threshold=0.9, audit_rate=0.1,
+                                  rng=FixedRandom(audit))
+
+def test_confident_fast_result_is_used():
+    strong = StubStrong()
+    backend = make_cascade({"清华大学": ("类别2", 0.99)}, strong)
+    assert backend.classify_name("清华大学", NUM2NAME, NUM2DESC) == "类别2"
+    assert strong.calls == 0
+    assert backend.summary()["快速层解决"] == "1 (100.0%)"
+
+@pytest.mark.parametrize("fast_result, reason", [
+    (("类别1", 0.5), "其中置信度低"),
+    (("类别1", None), "其中置信度低"),
+    (("类别9", 0.99), "其中快速层无法识别"),
+])
+def test_escalates_low_confidence_and_unparsed(fast_result, reason):
+    strong = StubStrong("类别2")
+    backend = make_cascade({"某机构": fast_result}, strong)
+    assert backend.classify_name("某机构", NUM2NAME, NUM2DESC) == "类别2"
+    assert strong.calls == 1
+    report = backend.summary()
+    assert report["升级到强模型"] == "1 (100.0%)"
+    assert report[reason] == 1
+
+def test_escalation_retries_without_rerunning_fast_tier(no_sleep):
+    strong = StubStrong("类别2", failures=2)
+    backend = make_cascade({"某机构": ("类别1", 0.2)}, strong)
+    assert backend.classify_name("某机构", NUM2NAME, NUM2DESC) == "类别2"
+    assert backend.fast.calls == ["某机构"]
+    assert strong.calls == 3
+    assert no_sleep == [1, 2]
+
+def test_escalation_failure_is_final_for_classify_single_item():
+    strong = StubStrong(failures=99)
+    backend = make_cascade({"某机构": ("类别1", 0.2)}, strong)
+    previous = core.backend
+    core.set_backend(backend)
+    try:
+        core.result_cache.clear()
+        assert core.classify_single_item(("某机构", NUM2NAME, NUM2DESC, 7)) == (7, "其他")
+    finally:
+        core.set_backend(previous)
+        core.result_cache.clear()
+    # 快速层只请求一次，强模型在级联内部尝试3次，失败结果不写入缓存
+    assert backend.fast.calls == ["某机构"]
+    assert strong.calls == cascade.ESCALATION_RETRIES
+    assert backend.counts["escalation_failed"] == 1
+
+def test_escalation_stops_retrying_at_give_up_time(no_sleep):
+    strong = StubStrong(failures=99)
+    backend = make_cascade({"某机构": ("类别1", 0.2)}, strong)
+    previous = core.backend
+    core.set_backend(backend)
+    try:
+        core.result_cache.clear()
+        # 放弃时间在0.5秒后，第一次退避（1秒）就会超过
+        result = core.classify_single_item(("某机构", NUM2NAME, NUM2DESC, 0), time.monotonic() + 0.5)
+    finally:
+        core.set_backend(previous)
+        core.result_cache.clear()
+    assert result == (0, "其他")
+    assert strong.calls == 1
+    assert no_sleep == []
+
+def test_batch_failure_does_not_rerun_cascade():
+    strong = StubStrong(failures=99)
+    backend = make_cascade({"甲": ("类别1", 0.2), "乙": ("类别2", 0.99)}, strong)
+    previous = core.backend
+    core.set_backend(backend)
+    try:
+        core.result_cache.clear()
+        assert core.classify_batch_items(["甲", "乙"], NUM2NAME, NUM2DESC) == ["其他", "教育机构"]
+    finally:
+        core.set_backend(previous)
+        core.result_cache.clear()
+    assert backend.fast.calls == ["甲", "乙"]
+
+@pytest.mark.parametrize("strong_code, agreed", [("类别2", 1), ("类别1", 0)])
+def test_audit_sample_uses_strong_result(strong_code, agreed):
+    strong = StubStrong(strong_code)
+    backend = make_cascade({"清华大学": ("类别2", 0.99)}, strong, audit=0.0)
+    assert backend.classify_name("清华大学", NUM2NAME, NUM2DESC) == strong_code
+    assert backend.counts["audited"] == 1
+    assert backend.counts["agreed"] == agreed
+    assert backend.summary()["抽检一致率"] == f"{agreed:.1%}"
+
+def test_failed_audit_keeps_fast_result():
+    strong = StubStrong(failures=99)
+    backend = make_cascade({"清华大学": ("类别2", 0.99)}, strong, audit=0.0)
+    assert backend.classify_name("清华大学", NUM2NAME, NUM2DESC) == "类别2"
+    assert backend.counts["audited"] == 0
+    assert strong.calls == 1
+
+def logprobs(*pairs):
+    return [{"token": token, "logprob": math.log(p)} for token, p in pairs]
+
+def test_confidence_is_product_of_code_tokens():
+    tokens = logprobs(("类别", 0.9), ("2", 0.8), ("。", 0.1))
+    assert category_confidence(tokens, "类别2", NUM2NAME) == pytest.approx(0.72)
+
+def test_confidence_of_prefix_code_includes_next_token():
+    # '类别1' 是 '类别10' 的前缀，还要乘上编号到此结束的概率
+    tokens = logprobs(("类别", 0.9), ("1", 0.8), ("\n", 0.5))
+    assert category_confidence(tokens, "类别1", NUM2NAME) == pytest.approx(0.36)
+    # 输出在编号后结束时编号必然完整
+    assert category_confidence(logprobs(("类别", 0.9), ("1", 0.8)), "类别1", NUM2NAME) == pytest.approx(0.72)
+    assert category_confidence(logprobs(("类别", 0.9)), "类别1", NUM2NAME) is None
+    assert category_confidence([], "类别2", NUM2NAME) is None
+
+class StubChat(ChatBackend):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+        self.requests = []
+
+    def post_chat(self, data):
+        self.requests.append(data)
+        return self.response
+
+def test_chat_backend_scored_requests_logprobs():
+    backend = StubChat({"choices": [{
+        "message": {"content": "类别2"},
+        "logprobs": {"content": logprobs(("类别", 0.99), ("2", 0.5))},
+    }]})
+    code, confidence = backend.classify_name_scored("清华大学", NUM2NAME, NUM2DESC)
+    assert code == "类别2"
+    assert confidence == pytest.approx(0.495)
+    assert backend.requests[0]["logprobs"] is True
+
+def test_same_model_tiers_are_refused():
+    pool = BackendPool([Backend("http://api/v1/chat/completions", "sk", "deepseek-chat", name="a")])
+    small = BackendPool([Backend("http://api/v1/chat/completions", "sk", "small-model", name="b")])
+    strong = RemoteChatBackend(pool)
+    assert cascade.check_tiers(cascade.create_fast_tier("remote", pool), strong) is not None
+    assert cascade.check_tiers(cascade.create_fast_tier("remote", small), strong) is None
+    assert cascade.check_tiers(OfflineBackend(), strong) is None
@@ -1,33 +1,107 @@
 """
 并发功能测试脚本
 用于验证get_class.py和classify.py的并发处理功能
+
+使用请求录制文件 cassettes/test_concurrent.json，离线回放（按录制时的耗时等待），结果可重复，不受模型输出波动影响。
+用 pytest 运行时只回放（不访问网络），并检查类别数量、结果顺序和每个名称的类别。
+  python -m pytest test_concurrent.py                  只回放，不访问网络
+  python test_concurrent.py --cassette-mode record     重新录制（重新录制后需同步更新 EXPECTED_LABELS）
+  python test_concurrent.py --cassette-mode replay     只回放，不访问网络
+  python test_concurrent.py --replay-latency 0.5       回放时使用固定的模拟耗时
+  python test_concurrent.py --live                     直接请求真实API
 """
 
+import os
 import time
 import json
+import argparse
+from collections import Counter
+
+import pytest
+
+import core
+import http_client
+from cassette import CASSETTE_MODES, CassetteMiss, parse_latency, use_cassette
 from get_class import classify_sample_data_concurrent, get_categories_with_desc
 from classify import classify_all_data_concurrent, load_categories_from_json
 
-def test_concurrent_classification():
+CASSETTE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes", "test_concurrent.json")
+
+# 测试数据
+TEST_NAMES = [
+    "北京市政府",
+    "清华大学",
+    "北京大学第一医院",
+    "中国石油化工股份有限公司",
+    "中国科学院",
+    "中国铁路总公司",
+    "北京市公安局",
+    "国家图书馆",
+    "北京市自来水公司",
+    "其他测试机构"
+]
+
+# 性能对比使用的更多测试数据
+PERFORMANCE_NAMES = TEST_NAMES + [
+    "上海市政府", "复旦大学",
+    "上海交通大学医学院附属瑞金医院", "中国移动通信集团有限公司",
+    "中国科学技术大学", "中国民用航空局", "上海市公安局", "上海图书馆",
+    "上海市自来水公司", "测试机构A"
+]
+
+# 录制文件中每个名称的类别
+EXPECTED_LABELS = {
+    "北京市政府": "政府机构",
+    "清华大学": "教育机构",
+    "北京大学第一医院": "医疗卫生机构",
+    "中国石油化工股份有限公司": "国有企业",
+    "中国科学院": "科研机构",
+    "中国铁路总公司": "交通运输单位",
+    "北京市公安局": "公安司法机关",
+    "国家图书馆": "文化机构",
+    "北京市自来水公司": "公用事业单位",
+    "其他测试机构": "其他",
+    "上海市政府": "政府机构",
+    "复旦大学": "教育机构",
+    "上海交通大学医学院附属瑞金医院": "医疗卫生机构",
+    "中国移动通信集团有限公司": "国有企业",
+    "中国科学技术大学": "教育机构",
+    "中国民用航空局": "政府机构",
+    "上海市公安局": "公安司法机关",
+    "上海图书馆": "文化机构",
+    "上海市自来水公司": "公用事业单位",
+    "测试机构A": "其他",
+}
+
+@pytest.fixture
+def cassette():
+    """
+    以回放模式安装录制文件（不访问网络），测试结束后恢复全局session和结果缓存
+    """
+    previous_session = http_client._session
+    core.result_cache.clear()
+    replay = use_cassette(CASSETTE_FILE, "replay", 0.0)
+    yield replay
+    http_client.set_session(previous_session)
+    core.result_cache.clear()
+
+def check_labels(names, classifications, num2name):
+    """
+    检查每个名称都已分类、结果按输入顺序排列，且各类别数量与录制一致
+    """
+    assert len(classifications) == len(names)
+    assert all(label in num2name.values() for label in classifications)
+    assert classifications == [EXPECTED_LABELS[name] for name in names]
+    assert Counter(classifications) == Counter(EXPECTED_LABELS[name] for name in names)
+
+def test_concurrent_classification(cassette):
     """
     测试并发分类功能
     """
     print("🧪 开始测试并发分类功能...")
     print("="*60)
     
-    # 测试数据
-    test_names = [
-        "北京市政府",
-        "清华大学",
-        "北京大学第一医院",
-        "中国石油化工股份有限公司",
-        "中国科学院",
-        "中国铁路总公司",
-        "北京市公安局",
-        "国家图书馆",
-        "北京市自来水公司",
-        "其他测试机构"
-    ]
+    test_names = list(TEST_NAMES)
     
     print(f"📊 测试数据量: {len(test_names)}")
     print(f"📋 测试数据: {test_names}")
@@ -42,6 +116,9 @@ def test_concurrent_classification():
     print("📋 生成的分类:")
     for num in sorted(num2name.keys()):
         print(f"   {num}: {num2name[num]} - {num2desc[num]}")
+    assert len(num2name) == 10
+    assert "其他" in num2name.values()
+    assert set(num2desc) == set(num2name)
     
     # 2. 测试并发分类
     print("\n🔍 测试2: 并发分类...")
@@ -53,9 +130,11 @@ def test_concurrent_classification():
     print("📊 分类结果:")
     for i, (name, classification) in enumerate(zip(test_names, classifications)):
         print(f"   {i+1}. {name} -> {classification}")
+    check_labels(test_names, classifications, num2name)
     
-    # 3. 测试全量数据并发分类
+    # 3. 测试全量数据并发分类（清空结果缓存，确保重新请求）
     print("\n🔍 测试3: 全量数据并发分类...")
+    core.result_cache.clear()
     start_time = time.time()
     all_classifications = classify_all_data_concurrent(test_names, num2name, num2desc, max_workers=3)
     end_time = time.time()
@@ -64,19 +143,18 @@ def test_concurrent_classification():
     print("📊 全量分类结果:")
     for i, (name, classification) in enumerate(zip(test_names, all_classifications)):
         print(f"   {i+1}. {name} -> {classification}")
+    check_labels(test_names, all_classifications, num2name)
     
     # 4. 验证结果一致性
     print("\n🔍 测试4: 验证结果一致性...")
-    if classifications == all_classifications:
-        print("✅ 并发分类结果一致")
-    else:
-        print("❌ 并发分类结果不一致")
-        print(f"抽样分类: {classifications}")
-        print(f"全量分类: {all_classifications}")
+    assert classifications == all_classifications, f"抽样分类: {classifications}，全量分类: {all_classifications}"
+    print("✅ 并发分类结果一致")
+    if cassette is not None:
+        assert cassette.stats["missed"] == 0
     
     print("\n🎉 并发功能测试完成！")
 
-def test_performance_comparison():
+def test_performance_comparison(cassette):
     """
     测试性能对比
     """
@@ -84,15 +162,7 @@ def test_performance_comparison():
     print("📈 性能对比测试")
     print("="*60)
     
-    # 创建更多测试数据
-    test_names = [
-        "北京市政府", "清华大学", "北京大学第一医院", "中国石油化工股份有限公司",
-        "中国科学院", "中国铁路总公司", "北京市公安局", "国家图书馆",
-        "北京市自来水公司", "其他测试机构", "上海市政府", "复旦大学",
-        "上海交通大学医学院附属瑞金医院", "中国移动通信集团有限公司",
-        "中国科学技术大学", "中国民用航空局", "上海市公安局", "上海图书馆",
-        "上海市自来水公司", "测试机构A"
-    ]
+    test_names = list(PERFORMANCE_NAMES)
     
     print(f"📊 测试数据量: {len(test_names)}")
     
@@ -110,39 +180,72 @@ def test_performance_comparison():
     single_thread_time = time.time() - start_time
     print(f"⏱️ 单线程耗时: {single_thread_time:.2f}秒")
     
-    # 测试并发性能
+    # 测试并发性能（清空结果缓存，避免直接命中单线程测试的结果）
     print("\n🔍 并发性能测试...")
+    core.result_cache.clear()
     start_time = time.time()
     concurrent_results = classify_sample_data_concurrent(test_names, num2name, num2desc, max_workers=5)
     concurrent_time = time.time() - start_time
     print(f"⏱️ 并发耗时: {concurrent_time:.2f}秒")
     
     # 计算性能提升
-    speedup = single_thread_time / concurrent_time
+    speedup = single_thread_time / max(concurrent_time, 1e-9)
     print(f"🚀 性能提升: {speedup:.2f}x")
     print(f"⏱️ 节省时间: {single_thread_time - concurrent_time:.2f}秒")
     
     # 验证结果一致性
-    if single_thread_results == concurrent_results:
-        print("✅ 单线程和并发结果一致")
-    else:
-        print("❌ 单线程和并发结果不一致")
+    check_labels(test_names, single_thread_results, num2name)
+    assert single_thread_results == concurrent_results
+    print("✅ 单线程和并发结果一致")
+    if cassette is not None:
+        assert cassette.stats["missed"] == 0
+
+def test_replay_miss_fails_fast(cassette):
+    """
+    回放时缺少录制的请求直接失败，不重试、不归为"其他"或改用默认分类
+    """
+    num2name, num2desc = get_categories_with_desc(TEST_NAMES)
+    start_time = time.time()
+    with pytest.raises(CassetteMiss):
+        classify_sample_data_concurrent(["未录制的机构"] + TEST_NAMES, num2name, num2desc, max_workers=3)
+    with pytest.raises(CassetteMiss):
+        get_categories_with_desc(["未录制的机构"])
+    # 重试会按 1、2 秒退避；未开始的任务也会取消
+    assert time.time() - start_time < 1.0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="并发功能测试")
+    parser.add_argument("--cassette", default=CASSETTE_FILE, help="请求录制文件")
+    parser.add_argument("--cassette-mode", choices=CASSETTE_MODES, default="auto")
+    parser.add_argument("--replay-latency", type=parse_latency, default="recorded",
+                        help="回放耗时：recorded 按录制时的真实耗时，或固定秒数")
+    parser.add_argument("--live", action="store_true", help="不使用录制文件，直接请求真实API")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
     print("🎯 招投标机构分类系统 - 并发功能测试")
     print("="*60)
     
+    args = parse_args()
+    cassette = None
+    if not args.live:
+        cassette = use_cassette(args.cassette, args.cassette_mode, args.replay_latency)
+    
     try:
         # 基础功能测试
-        test_concurrent_classification()
+        test_concurrent_classification(cassette)
         
         # 性能对比测试
-        test_performance_comparison()
+        test_performance_comparison(cassette)
         
         print("\n🎉 所有测试完成！")
         print("💡 提示：如果测试通过，说明并发功能正常工作")
-        
+    
     except Exception as e:
         print(f"\n❌ 测试过程中出现错误: {e}")
         import traceback
-        traceback.print_exc() 
+        traceback.print_exc()
+    finally:
+        if cassette is not None:
+            cassette.save()
+            print(f"📼 录制统计: {cassette.stats}")
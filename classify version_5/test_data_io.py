@@ -0,0 +1,181 @@
+"""
+输入读取与流式输出测试
+不访问网络，分类后端用桩代替
+"""
+
+import os
+import time
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import core
+import input_cache
+from data_io import ExcelSink, OrderedResultWriter, open_result_sink, load_input_table
+from rules import build_rule_table, apply_rules
+
+class FailingBackend:
+    """
+    任何分类请求都直接失败，用于确认没有发出请求
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def classify_name(self, name, num2name, num2desc):
+        self.calls += 1
+        raise AssertionError(f"不应请求API: {name!r}")
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    previous = input_cache.cache_dir
+    input_cache.set_cache_dir(str(tmp_path / "input_cache"))
+    yield tmp_path
+    input_cache.set_cache_dir(previous)
+
+def test_blank_names_load_as_empty_strings(cache_dir):
+    path = cache_dir / "names.csv"
+    path.write_text("Purchaser_Name,Priority\n清华大学,1\n,2\n北京市政府,3\n", encoding="utf-8")
+    # 第一次解析源文件，第二次读取输入缓存，两条路径结果相同
+    for _ in range(2):
+        df = load_input_table(str(path), "Purchaser_Name", extra_columns=["Priority"])
+        names = df["Purchaser_Name"].tolist()
+        assert names == ["清华大学", "", "北京市政府"]
+        assert all(isinstance(name, str) for name in names)
+
+    rule_table = build_rule_table({"类别1": "教育机构", "类别2": "其他"})
+    assert [apply_rules(name, rule_table) for name in names] == ["教育机构", None, None]
+
+def test_prune_removes_entries_for_missing_or_unused_sources(cache_dir):
+    kept, deleted, unused = (cache_dir / f"{name}.csv" for name in ("kept", "deleted", "unused"))
+    for path in (kept, deleted, unused):
+        path.write_text("Purchaser_Name\n清华大学\n", encoding="utf-8")
+        load_input_table(str(path), "Purchaser_Name")
+    directory = input_cache.cache_dir
+    assert len({filename.split(".")[0] for filename in os.listdir(directory)}) == 3
+
+    deleted.unlink()
+    old = time.time() - (input_cache.MAX_UNUSED_DAYS + 1) * 86400
+    unused_base = input_cache._cache_base(str(unused), ["Purchaser_Name"])
+    os.utime(unused_base + ".json", (old, old))
+    # 写到一半中断留下的文件（没有元数据）
+    orphan = os.path.join(directory, "0" * 32 + ".arrow.tmp")
+    open(orphan, "w").close()
+    os.utime(orphan, (old, old))
+
+    assert input_cache.prune_cache() == 3
+    remaining = {filename.split(".")[0] for filename in os.listdir(directory)}
+    assert remaining == {os.path.basename(input_cache._cache_base(str(kept), ["Purchaser_Name"]))}
+    assert load_input_table(str(kept), "Purchaser_Name")["Purchaser_Name"].tolist() == ["清华大学"]
+
+def test_blank_name_is_not_sent_to_backend():
+    previous = core.backend
+    backend = FailingBackend()
+    core.set_backend(backend)
+    try:
+        assert core.classify_single_item(("", {"类别1": "其他"}, {"类别1": "其他"}, 5)) == (5, "其他")
+        assert core.classify_single_item(("  ", {"类别1": "其他"}, {"类别1": "其他"}, 6)) == (6, "其他")
+    finally:
+        core.set_backend(previous)
+    assert backend.calls == 0
+
+class ListSink:
+    """
+    记录每次写出的批次
+    """
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+        self.paths = []
+
+    def write_rows(self, rows):
+        self.batches.append(list(rows))
+
+    def close(self):
+        self.closed = True
+
+def test_ordered_writer_reorders_out_of_order_results():
+    sink = ListSink()
+    writer = OrderedResultWriter(sink, flush_rows=2)
+    writer.push(2, ("c",))
+    writer.push(1, ("b",))
+    # 序号0到达前什么都不能写出
+    assert sink.batches == [] and writer.next_index == 0
+    writer.push(0, ("a",))
+    assert sink.batches == [[("a",), ("b",), ("c",)]]
+    writer.push(3, ("d",))
+    # 未凑满 flush_rows 的行在 close 时写出
+    assert len(sink.batches) == 1
+    writer.close()
+    assert sink.batches[-1] == [("d",)]
+    assert writer.rows_written == 4 and sink.closed
+
+def test_ordered_writer_stops_at_gap(capsys):
+    sink = ListSink()
+    with OrderedResultWriter(sink, start_index=5) as writer:
+        writer.push(5, ("a",))
+        writer.push(7, ("c",))
+    # 序号6缺失：之后的行留在缓冲区，不会跳过缺口写出
+    assert [row for batch in sink.batches for row in batch] == [("a",)]
+    assert writer.buffer == {7: ("c",)}
+    assert "1 条结果因前序数据缺失" in capsys.readouterr().out
+
+def read_sheets(path):
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True)
+    return {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)] for sheet in workbook.worksheets}
+
+def write_excel(path, split, rows, max_rows):
+    sink = ExcelSink(str(path), ["Purchaser_Name", "Classification"], split=split, max_rows=max_rows)
+    # 分两批写入，跨批次也按行数拆分
+    sink.write_rows(rows[:3])
+    assert (path.parent / (path.name + ".rows.jsonl")).exists()
+    sink.write_rows(rows[3:])
+    sink.close()
+    assert not (path.parent / (path.name + ".rows.jsonl")).exists()
+    return sink.paths
+
+ROWS = [(f"机构{i}", "其他") for i in range(5)]
+HEADER = ["Purchaser_Name", "Classification"]
+
+def test_excel_splits_into_sheets(tmp_path):
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "out.xlsx"
+    # 每个工作表最多3行（含表头），即2行数据
+    assert write_excel(path, "sheets", ROWS, max_rows=3) == [str(path)]
+    sheets = read_sheets(path)
+    assert list(sheets) == ["Sheet1", "Sheet2", "Sheet3"]
+    assert all(rows[0] == HEADER for rows in sheets.values())
+    assert [row for rows in sheets.values() for row in rows[1:]] == [list(row) for row in ROWS]
+    assert [len(rows) - 1 for rows in sheets.values()] == [2, 2, 1]
+
+def test_excel_splits_into_files(tmp_path):
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "out.xlsx"
+    paths = write_excel(path, "files", ROWS, max_rows=3)
+    assert paths == [str(path), str(tmp_path / "out_part2.xlsx"), str(tmp_path / "out_part3.xlsx")]
+    data = []
+    for part in paths:
+        sheets = read_sheets(part)
+        assert list(sheets) == ["Sheet1"] and sheets["Sheet1"][0] == HEADER
+        data += sheets["Sheet1"][1:]
+    assert data == [list(row) for row in ROWS]
+
+def test_excel_exact_limit_does_not_add_empty_sheet(tmp_path):
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "out.xlsx"
+    write_excel(path, "sheets", ROWS[:4], max_rows=3)
+    assert list(read_sheets(path)) == ["Sheet1", "Sheet2"]
+
+def test_parquet_schema_survives_all_null_first_batch(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "out.parquet")
+    column_types = {"Purchaser_Name": pd.StringDtype(), "Row_ID": pd.Series([1]).dtype}
+    sink = open_result_sink(path, ["Purchaser_Name", "Row_ID", "Classification"], column_types=column_types)
+    sink.write_rows([(None, None, None)])
+    sink.write_rows([("清华大学", 2, "教育机构"), ("某公司", 3, "其他")])
+    sink.close()
+    table = pq.read_table(path)
+    assert table.column("Row_ID").to_pylist() == [None, 2, 3]
+    assert table.column("Purchaser_Name").to_pylist() == [None, "清华大学", "某公司"]
+    assert str(table.schema.field("Classification").type).startswith("dictionary")
@@ -0,0 +1,86 @@
+"""
+截止时间模式测试
+固定"当前时间"，本地兜底用桩代替离线分类，不访问网络
+"""
+
+import argparse
+import datetime
+import time
+
+import pytest
+
+import core
+import deadline
+from deadline import Deadline, deadline_arg, parse_deadline
+
+NUM2NAME = {"类别1": "政府机构", "类别2": "教育机构", "类别3": "文化机构", "类别4": "其他"}
+
+def at(hour, minute, second=0, day=19):
+    return datetime.datetime(2026, 10, day, hour, minute, second).timestamp()
+
+NOON = at(12, 0)
+
+@pytest.mark.parametrize("value, expected", [
+    ("18:30", at(18, 30)),
+    ("18:30:15", at(18, 30, 15)),
+    (" 9:05 ", at(9, 5, day=20)),      # 已经过去的时刻为明天
+    ("12:00", at(12, 0, day=20)),      # 恰好是现在也算过去
+    ("600", NOON + 600),
+    ("600s", NOON + 600),
+    ("45m", NOON + 45 * 60),
+    ("2H", NOON + 2 * 3600),
+    ("1h30m", NOON + 90 * 60),
+    ("1.5h", NOON + 90 * 60),
+])
+def test_parse_clock_time_and_duration(value, expected):
+    assert parse_deadline(value, now=NOON) == pytest.approx(expected)
+
+def test_clock_time_past_midnight():
+    now = at(23, 50)
+    assert parse_deadline("00:10", now=now) == pytest.approx(at(0, 10, day=20))
+    assert parse_deadline("00:10", now=now) - now == pytest.approx(20 * 60)
+    assert parse_deadline("23:55", now=now) == pytest.approx(at(23, 55))
+
+@pytest.mark.parametrize("value", ["", "24:00", "18:60", "abc", "1d"])
+def test_invalid_deadline_is_rejected(value):
+    with pytest.raises(ValueError):
+        parse_deadline(value, now=NOON)
+    with pytest.raises(argparse.ArgumentTypeError):
+        deadline_arg(value)
+
+class StubOffline:
+    """
+    按名称返回预设的类别编号
+    """
+    codes = {"某文化传播中心": "类别3", "某协会": "类别4", "某工作室": "类别9"}
+
+    def classify_name(self, name, num2name, num2desc):
+        return self.codes[name]
+
+@pytest.fixture
+def cache():
+    core.result_cache.clear()
+    yield core.get_taxonomy_key(NUM2NAME, NUM2NAME)
+    core.result_cache.clear()
+
+def test_fallback_chain_order(cache, monkeypatch):
+    monkeypatch.setattr(deadline, "OfflineBackend", StubOffline)
+    # 缓存优先于后缀规则
+    core.store_cache(cache, "清华大学", "文化机构")
+    names = ["清华大学", "北京大学", "某文化传播中心", "某协会", "某工作室"]
+    results = Deadline(time.time() + 60).fallback_labels(names, NUM2NAME, NUM2NAME)
+    assert results == {
+        "清华大学": ("文化机构", "cache"),
+        "北京大学": ("教育机构", "rules"),
+        "某文化传播中心": ("文化机构", "offline"),
+        "某协会": ("其他", "default"),          # 离线分类给出"其他"
+        "某工作室": ("其他", "default"),        # 离线分类的编号无法识别
+    }
+
+def test_fallback_results_are_not_cached(cache, monkeypatch):
+    monkeypatch.setattr(deadline, "OfflineBackend", StubOffline)
+    window = Deadline(time.time() + 60)
+    window.fallback_labels(["北京大学", "某文化传播中心"], NUM2NAME, NUM2NAME)
+    assert core.lookup_cache(cache, "北京大学") is None
+    assert core.lookup_cache(cache, "某文化传播中心") is None
+    assert window.fallbacks == 2
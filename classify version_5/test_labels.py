@@ -0,0 +1,60 @@
+"""
+类别标签编码测试
+"""
+
+import pytest
+
+from labels import LabelCodes, MAX_CATEGORIES, count_labels
+
+NUM2NAME = {"类别1": "政府机构", "类别2": "教育机构", "类别3": "其他"}
+
+def make_codes(labels):
+    codes = LabelCodes.from_taxonomy(NUM2NAME)
+    codes.extend(labels)
+    return codes
+
+def test_behaves_like_a_list_of_labels():
+    labels = ["教育机构", "其他", "教育机构", "政府机构"]
+    codes = make_codes(labels)
+    assert len(codes) == 4
+    assert list(codes) == labels
+    assert codes[0] == "教育机构" and codes[-1] == "政府机构"
+    assert codes[1:3] == ["其他", "教育机构"]
+    # 每行1字节
+    assert codes.to_numpy().dtype.itemsize == 1
+    assert codes.to_numpy().tolist() == [1, 2, 1, 0]
+
+def test_from_taxonomy_always_has_other():
+    codes = LabelCodes.from_taxonomy({"类别1": "政府机构"})
+    assert codes.categories == ["政府机构", "其他"]
+    codes.append("新出现的类别")
+    assert codes.categories[-1] == "新出现的类别"
+
+def test_counts_only_present_categories():
+    codes = make_codes(["教育机构", "其他", "教育机构"])
+    assert codes.counts() == {"教育机构": 2, "其他": 1}
+    assert count_labels(codes) == count_labels(list(codes))
+    assert LabelCodes.from_taxonomy(NUM2NAME).counts() == {}
+
+def test_to_categorical_keeps_category_order():
+    pd = pytest.importorskip("pandas")
+    codes = make_codes(["教育机构", "其他"])
+    categorical = codes.to_categorical()
+    assert isinstance(categorical, pd.Categorical)
+    assert list(categorical.categories) == ["政府机构", "教育机构", "其他"]
+    assert list(categorical) == ["教育机构", "其他"]
+
+def test_extend_remaps_codes_from_another_taxonomy():
+    combined = make_codes(["政府机构"])
+    other = LabelCodes(["其他", "文化机构"])
+    other.extend(["文化机构", "其他"])
+    combined.extend(other)
+    assert list(combined) == ["政府机构", "文化机构", "其他"]
+    assert combined.counts() == {"政府机构": 1, "文化机构": 1, "其他": 1}
+
+def test_more_than_255_categories_is_rejected():
+    codes = LabelCodes(f"类别{i}" for i in range(MAX_CATEGORIES))
+    codes.append(f"类别{MAX_CATEGORIES - 1}")
+    with pytest.raises(ValueError):
+        codes.append("第256个类别")
+    assert len(codes.categories) == MAX_CATEGORIES
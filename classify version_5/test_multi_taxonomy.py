@@ -0,0 +1,23 @@
+"""
+多分类体系模式测试
+"""
+
+import argparse
+
+from multi_taxonomy import check_unsupported_options
+
+def make_args(**overrides):
+    values = {"reclassify": None, "deadline": None, "rules": False, "checkpoint_every": 0, "dry_run": False}
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+def test_dry_run_is_refused():
+    # 试运行不能被当作"已忽略"的选项，继续下去就是一次真实的付费分类
+    args = make_args(dry_run=True, rules=True)
+    assert check_unsupported_options(args) is False
+    assert args.dry_run is True
+
+def test_other_options_are_switched_off():
+    args = make_args(rules=True, deadline="30m", checkpoint_every=100)
+    assert check_unsupported_options(args) is True
+    assert not args.rules and args.deadline is None and not args.checkpoint_every
@@ -0,0 +1,130 @@
+"""
+跨进程共享限速测试
+用返回429的桩适配器代替真实接口，确认429能到达后端池并写入共享冷却时间
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+import rate_limiter
+from api_pool import Backend, BackendPool
+from http_client import create_session
+
+class RateLimitedAdapter(requests.adapters.BaseAdapter):
+    """
+    对每个请求都返回 429 和 Retry-After
+    """
+    def __init__(self, retry_after="7"):
+        super().__init__()
+        self.retry_after = retry_after
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        response = requests.models.Response()
+        response.status_code = 429
+        response.headers["Retry-After"] = self.retry_after
+        response.url = request.url
+        response.request = request
+        response._content = b'{"error": "rate limited"}'
+        return response
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def shared_limiter(tmp_path):
+    previous = rate_limiter.limiter
+    limiter = rate_limiter.SharedRateLimiter(str(tmp_path / "rate_limit.sqlite"))
+    rate_limiter.set_limiter(limiter)
+    yield limiter
+    rate_limiter.set_limiter(previous)
+
+def test_session_does_not_retry_429():
+    retry = create_session().get_adapter("https://api.deepseek.com").max_retries
+    assert 429 not in retry.status_forcelist
+
+def test_429_writes_shared_cooldown(shared_limiter):
+    session = requests.Session()
+    adapter = RateLimitedAdapter(retry_after="7")
+    session.mount("http://stub/", adapter)
+    backend = Backend("http://stub/v1/chat/completions", "sk-test", min_interval=0.01, name="stub")
+    pool = BackendPool([backend])
+
+    before = time.time()
+    with pytest.raises(requests.exceptions.HTTPError) as excinfo:
+        pool.post(session, {"messages": []})
+    assert excinfo.value.response.status_code == 429
+    assert adapter.calls == 1
+
+    # 本进程的后端进入冷却，共享表中写入同样长度的冷却时间
+    assert backend.cooldown_until > time.monotonic() + 5
+    assert backend.stats["failures"] == 1
+    with sqlite3.connect(shared_limiter.path) as connection:
+        row = connection.execute("SELECT cooldown_until FROM slots WHERE limit_key = ?",
+                                 (rate_limiter.limit_key(backend),)).fetchone()
+    assert row is not None
+    assert before + 7 <= row[0] <= time.time() + 7
+
+class OkAdapter(requests.adapters.BaseAdapter):
+    def send(self, request, **kwargs):
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response._content = b'{"choices": []}'
+        return response
+
+    def close(self):
+        pass
+
+def test_429_fails_over_to_other_backend():
+    session = requests.Session()
+    session.mount("http://limited/", RateLimitedAdapter(retry_after="30"))
+    session.mount("http://healthy/", OkAdapter())
+    limited = Backend("http://limited/v1/chat/completions", "sk-a", min_interval=0.0, name="limited")
+    healthy = Backend("http://healthy/v1/chat/completions", "sk-b", min_interval=0.0, name="healthy")
+    pool = BackendPool([limited, healthy])
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        pool.post(session, {"messages": []})
+    # 冷却中的后端不再被选中，重试转到另一个后端
+    assert pool.post(session, {"messages": []}).status_code == 200
+    assert limited.stats["failures"] == 1
+    assert healthy.stats["successes"] == 1
+
+def test_shared_cooldown_delays_other_pools(shared_limiter):
+    backend = Backend("http://stub/v1/chat/completions", "sk-test", min_interval=0.01, name="stub")
+    shared_limiter.cooldown(backend, 0.3)
+    # 另一个后端池（如另一个进程）没有收到429，也要等到共享冷却结束
+    other = Backend("http://stub/v1/chat/completions", "sk-test", min_interval=0.01, name="other")
+    wait = shared_limiter.reserve(other)
+    assert 0.2 < wait <= 0.3
+
+def test_limiter_off_for_replay_and_offline(shared_limiter):
+    import argparse
+    parser = argparse.ArgumentParser()
+    rate_limiter.add_arguments(parser)
+    args = parser.parse_args([])
+    args.cassette, args.cassette_mode, args.backend = "demo.json", "replay", "remote"
+    assert rate_limiter.configure(args) is None
+    args.cassette, args.backend = None, "offline"
+    assert rate_limiter.configure(args) is None
+    args.backend = "remote"
+    assert isinstance(rate_limiter.configure(args), rate_limiter.SharedRateLimiter)
+
+def test_stale_clients_are_pruned(shared_limiter):
+    backend = Backend("http://stub/v1/chat/completions", "sk-test", min_interval=0.0, name="stub")
+    shared_limiter.reserve(backend)
+    with sqlite3.connect(shared_limiter.path) as connection:
+        connection.execute("INSERT INTO clients (limit_key, pid, last_seen) VALUES (?, ?, ?)",
+                           (rate_limiter.limit_key(backend), 999999, time.time() - 2 * rate_limiter.ACTIVE_WINDOW))
+    shared_limiter.reserve(backend)
+    with sqlite3.connect(shared_limiter.path) as connection:
+        pids = [row[0] for row in connection.execute("SELECT pid FROM clients")]
+    assert pids == [shared_limiter.pid]
+    assert shared_limiter.active_clients == 1
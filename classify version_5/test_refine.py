@@ -0,0 +1,123 @@
+"""
+按评估结果修订分类的测试
+分类后端用桩代替，不访问网络
+"""
+
+import pytest
+
+pytest.importorskip("tqdm")
+
+import core
+import get_class
+import input_cache
+from backends import ClassifierBackend
+from get_class import evaluate_classification_quality, feedback_from_report, refine_taxonomy
+from taxonomy import diff_taxonomies, plan_reclassification
+
+NUM2NAME = {"类别1": "企业", "类别2": "政府机构", "类别3": "其他"}
+NUM2DESC = {"类别1": "各类企业公司", "类别2": "负责行政管理的各级政府部门", "类别3": "不属于以上类别的机构"}
+# 修订：把过大的"企业"拆分为两个类别
+REFINED_NUM2NAME = {"类别1": "科技企业", "类别2": "制造企业", "类别3": "政府机构", "类别4": "其他"}
+REFINED_NUM2DESC = {"类别1": "软件、互联网等科技公司", "类别2": "工厂等制造业单位",
+                    "类别3": "负责行政管理的各级政府部门", "类别4": "不属于以上类别的机构"}
+
+SAMPLE = ([f"星辰科技{i}号" for i in range(7)] + [f"重工制造{i}厂" for i in range(7)]
+          + [f"某市财政局{i}" for i in range(4)] + ["某协会", "某研究会"])
+LABELS = ["企业"] * 14 + ["政府机构"] * 4 + ["其他"] * 2
+
+class StubRefiner(ClassifierBackend):
+    """
+    修订请求依次返回 refinements 中的分类；逐条分类按名称中的关键词给出编号，记录请求的名称
+    """
+    def __init__(self, refinements, keywords):
+        super().__init__()
+        self.refinements = list(refinements)
+        self.keywords = keywords
+        self.refine_calls = []
+        self.calls = []
+
+    def refine_categories(self, num2name, num2desc, issues, examples):
+        self.refine_calls.append((issues, examples))
+        return self.refinements.pop(0)
+
+    def classify_name(self, name, num2name, num2desc):
+        self.calls.append(name)
+        label = next((label for keyword, label in self.keywords if keyword in name), "其他")
+        return next(num for num, value in num2name.items() if value == label)
+
+@pytest.fixture
+def use_backend(monkeypatch):
+    previous_backend, previous_cache_dir = core.backend, input_cache.cache_dir
+    input_cache.set_cache_dir(None)
+    monkeypatch.setattr(core.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(get_class.time, "sleep", lambda seconds: None)
+    core.result_cache.clear()
+    yield core.set_backend
+    core.set_backend(previous_backend)
+    input_cache.set_cache_dir(previous_cache_dir)
+    core.result_cache.clear()
+
+def test_feedback_from_report():
+    report = {"各类别分布": {"企业": 50.0, "政府机构": 18.0, "其他": 10.0, "教育机构": 2.0}}
+    num2name = {"类别1": "企业", "类别2": "政府机构", "类别3": "教育机构", "类别4": "文化机构", "类别5": "其他"}
+    names = ["甲公司", "甲公司", "乙公司", "某协会", "某学校", "某市政府"]
+    labels = ["企业", "企业", "企业", "其他", "教育机构", "政府机构"]
+    issues, examples, problem_labels = feedback_from_report(report, num2name, names, labels)
+    assert problem_labels == ["企业", "其他", "教育机构"]
+    assert [issue.split("，")[0] for issue in issues] == [
+        '类别"企业"占比50.0%', '"其他"占比10.0%', '类别"教育机构"占比2.0%', '类别"文化机构"在样本中没有名称']
+    # 示例只取问题类别的名称并去重
+    assert examples == {"企业": ["甲公司", "乙公司"], "其他": ["某协会"], "教育机构": ["某学校"]}
+
+def test_feedback_examples_are_capped():
+    names = [f"公司{i}" for i in range(get_class.REFINE_EXAMPLES + 10)]
+    report = {"各类别分布": {"企业": 100.0}}
+    _, examples, _ = feedback_from_report(report, {"类别1": "企业"}, names, ["企业"] * len(names))
+    assert examples["企业"] == names[:get_class.REFINE_EXAMPLES]
+
+def test_problem_labels_are_resent_even_if_unchanged():
+    # 只新增了类别，"企业"的名称和描述未变，但被评估指出有问题
+    new_num2name = dict(NUM2NAME, 类别4="文化机构")
+    new_num2desc = dict(NUM2DESC, 类别4="图书馆、博物馆等文化场馆")
+    diff = diff_taxonomies(NUM2NAME, NUM2DESC, new_num2name, new_num2desc)
+    kept, resend, reasons = plan_reclassification(["甲公司", "某市财政局"], ["企业", "政府机构"], new_num2name,
+                                                  diff, problem_labels=["企业"])
+    assert kept == {"某市财政局": "政府机构"}
+    assert resend == ["甲公司"]
+    assert reasons == {"原类别有质量问题": 1}
+
+def run_refine(max_rounds=3):
+    report = evaluate_classification_quality(LABELS)
+    return report, refine_taxonomy(NUM2NAME, NUM2DESC, report, SAMPLE, list(LABELS), quality_threshold=100,
+                                   max_rounds=max_rounds, iteration=1)
+
+def test_improved_refinement_is_accepted(use_backend):
+    backend = StubRefiner([(REFINED_NUM2NAME, REFINED_NUM2DESC)] * 2,
+                          [("科技", "科技企业"), ("制造", "制造企业"), ("财政局", "政府机构")])
+    use_backend(backend)
+    report, (num2name, num2desc, refined_report, classifications, accepted) = run_refine()
+    assert accepted == 1
+    assert (num2name, num2desc) == (REFINED_NUM2NAME, REFINED_NUM2DESC)
+    assert refined_report["总分"] > report["总分"]
+    # 只重新分类原为"企业"和"其他"的名称，政府机构的结果沿用
+    assert sorted(backend.calls) == sorted(SAMPLE[:14] + SAMPLE[18:])
+    assert classifications == ["科技企业"] * 7 + ["制造企业"] * 7 + ["政府机构"] * 4 + ["其他"] * 2
+    # 第二轮模型返回同样的分类，停止修订
+    assert len(backend.refine_calls) == 2
+
+def test_worse_refinement_is_rejected(use_backend):
+    backend = StubRefiner([(REFINED_NUM2NAME, REFINED_NUM2DESC)], [("财政局", "政府机构")])
+    use_backend(backend)
+    report, (num2name, num2desc, final_report, classifications, accepted) = run_refine()
+    assert accepted == 0
+    assert (num2name, num2desc) == (NUM2NAME, NUM2DESC)
+    assert final_report is report
+    assert classifications == LABELS
+    assert len(backend.refine_calls) == 1
+
+def test_incomplete_refinement_is_discarded(use_backend):
+    backend = StubRefiner([({"类别1": "企业"}, {"类别1": "各类企业公司"})], [])
+    use_backend(backend)
+    report, (num2name, _, final_report, classifications, accepted) = run_refine()
+    assert (num2name, final_report, accepted) == (NUM2NAME, report, 0)
+    assert backend.calls == []
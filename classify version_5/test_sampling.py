@@ -0,0 +1,58 @@
+"""
+分层抽样测试
+只使用本地构造的名称，不访问网络
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from sampling import NameSampler, allocate
+
+def test_allocate_is_proportional_without_minimum():
+    assert allocate([80, 15, 3, 1, 1], 10).tolist() == [8, 2, 0, 0, 0]
+
+def test_allocate_guarantees_each_stratum():
+    # 先每层1个，其余5个按剩余数量比例分配
+    assert allocate([80, 15, 3, 1, 1], 10, min_per_stratum=1).tolist() == [5, 2, 1, 1, 1]
+    # 层数超过样本量时优先较大的层
+    assert allocate([5, 4, 3, 2, 1], 3, min_per_stratum=1).tolist() == [1, 1, 1, 0, 0]
+    # 每层的数量不超过该层大小
+    assert allocate([3, 1], 4, min_per_stratum=2).tolist() == [3, 1]
+
+NAMES = ([f"北京{i}号有限公司" for i in range(90)] + [f"上海第{i}医院" for i in range(9)] + ["某市档案馆"])
+
+def kinds(sample):
+    return Counter("公司" if name.endswith("有限公司") else "医院" if name.endswith("医院") else "档案馆"
+                   for name in sample)
+
+def test_generation_sample_covers_rare_strata():
+    sampler = NameSampler(NAMES)
+    sample = sampler.sample(10, min_per_stratum=1, rng=random.Random(0))
+    assert len(sample) == 10
+    assert kinds(sample) == {"公司": 7, "医院": 2, "档案馆": 1}
+    assert sampler.describe() == "分层抽样 10 个（覆盖 3/3 层）"
+
+def test_validation_sample_is_proportional():
+    sampler = NameSampler(NAMES)
+    sample = sampler.sample(10, rng=random.Random(0))
+    assert kinds(sample) == {"公司": 9, "医院": 1}
+    assert sampler.describe() == "分层抽样 10 个（覆盖 2/3 层）"
+
+def test_exclude_and_small_candidate_set():
+    sampler = NameSampler(NAMES)
+    first = sampler.sample(95, min_per_stratum=1, rng=random.Random(0))
+    rest = sampler.sample(10, exclude=set(first), rng=random.Random(0))
+    # 候选不足时返回全部剩余名称
+    assert sorted(rest) == sorted(set(NAMES) - set(first))
+    assert sampler.describe() == "使用全部 5 个"
+
+def test_random_mode_and_unknown_mode():
+    sampler = NameSampler(NAMES, mode="random")
+    assert len(sampler.sample(10, min_per_stratum=1, rng=random.Random(0))) == 10
+    assert sampler.describe() == "随机抽样 10 个"
+    with pytest.raises(ValueError):
+        NameSampler(NAMES, mode="cluster")
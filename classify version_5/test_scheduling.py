@@ -0,0 +1,91 @@
+"""
+按频次/优先级调度与检查点测试
+分类后端用桩代替，不访问网络
+"""
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("tqdm")
+
+import core
+import input_cache
+from backends import ClassifierBackend
+
+NUM2NAME = {"类别1": "教育机构", "类别2": "其他"}
+
+class RecordingBackend(ClassifierBackend):
+    """
+    按请求顺序记录名称
+    """
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def classify_name(self, name, num2name, num2desc):
+        self.calls.append(name)
+        return "类别1" if name.endswith("大学") else "类别2"
+
+@pytest.fixture
+def backend(monkeypatch):
+    stub = RecordingBackend()
+    previous_backend, previous_cache_dir = core.backend, input_cache.cache_dir
+    input_cache.set_cache_dir(None)
+    monkeypatch.setattr(core.time, "sleep", lambda seconds: None)
+    core.result_cache.clear()
+    core.set_backend(stub)
+    yield stub
+    core.set_backend(previous_backend)
+    input_cache.set_cache_dir(previous_cache_dir)
+    core.result_cache.clear()
+
+NAMES = ["甲公司", "清华大学", "乙公司", "清华大学", "北京大学", "乙公司", "清华大学"]
+
+def test_name_priorities_counts_rows_or_sums_weights():
+    assert core.name_priorities(NAMES) == {"甲公司": 1, "清华大学": 3, "乙公司": 2, "北京大学": 1}
+    weights = [100, 1, 5, 1, 50, 5, 1]
+    assert core.name_priorities(NAMES, weights) == {"甲公司": 100, "清华大学": 3, "乙公司": 10, "北京大学": 50}
+
+def test_prioritize_names_is_stable_for_ties():
+    scores = core.name_priorities(NAMES)
+    assert core.prioritize_names(["甲公司", "清华大学", "乙公司", "北京大学"], scores) == [
+        "清华大学", "乙公司", "甲公司", "北京大学"]
+
+def run(tmp_path, schedule="frequency", priorities=None, **kwargs):
+    df = pd.DataFrame({"Purchaser_Name": NAMES})
+    output_file = str(tmp_path / "out.csv")
+    labels = core.classify_to_file(df, NAMES, NUM2NAME, NUM2NAME, output_file, max_workers=1,
+                                   schedule=schedule, priorities=priorities, **kwargs)
+    return output_file, labels
+
+@pytest.mark.parametrize("schedule, priorities, expected", [
+    ("frequency", None, ["清华大学", "乙公司", "甲公司", "北京大学"]),
+    ("frequency", [100, 1, 5, 1, 50, 5, 1], ["甲公司", "北京大学", "乙公司", "清华大学"]),
+    ("file", None, ["甲公司", "清华大学", "乙公司", "北京大学"]),
+])
+def test_request_order(backend, tmp_path, schedule, priorities, expected):
+    output_file, labels = run(tmp_path, schedule, priorities)
+    assert backend.calls == expected
+    # 请求顺序不影响输出：按输入顺序写出全部行
+    assert list(labels) == ["其他", "教育机构", "其他", "教育机构", "教育机构", "其他", "教育机构"]
+    with open(output_file, encoding="utf-8-sig") as f:
+        assert [line.split(",")[0] for line in f.read().splitlines()[1:]] == NAMES
+
+def test_checkpoint_writes_classified_rows(backend, tmp_path):
+    snapshots = []
+
+    def checkpoint_callback():
+        partial = core.partial_output_path(str(tmp_path / "out.csv"))
+        with open(partial, encoding="utf-8-sig") as f:
+            snapshots.append(f.read().splitlines()[1:])
+
+    run(tmp_path, checkpoint_every=1, checkpoint_callback=checkpoint_callback)
+    # 4个名称，完成第1~3个后各写一次检查点，全部完成后不再写
+    assert len(snapshots) == 3
+    expected = {"甲公司": "其他", "清华大学": "教育机构", "乙公司": "其他", "北京大学": "教育机构"}
+    for completed, rows in enumerate(snapshots, 1):
+        # 检查点按输入顺序写出已得到类别的名称的全部行，未分类的行不写出
+        done = {row.split(",")[0] for row in rows}
+        assert len(done) == completed
+        assert rows == [f"{name},{expected[name]}" for name in NAMES if name in done]
+    assert core.partial_output_path("out.xlsx") == "out_partial.xlsx"
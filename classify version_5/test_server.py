@@ -0,0 +1,76 @@
+"""
+实时分类服务测试
+用桩代替 classify_batch_items，不访问网络
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import server
+
+NUM2NAME = {"类别1": "教育机构", "类别2": "其他"}
+
+@pytest.fixture
+def categories_file(tmp_path):
+    path = tmp_path / "categories.json"
+    path.write_text(json.dumps({"num2name": NUM2NAME, "num2desc": NUM2NAME}, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+@pytest.fixture
+def running_server(categories_file, monkeypatch):
+    calls = []
+
+    def classify_batch_items(names, num2name, num2desc):
+        calls.append(list(names))
+        return ["教育机构" if name.endswith("大学") else "其他" for name in names]
+
+    monkeypatch.setattr(server, "classify_batch_items", classify_batch_items)
+    httpd = server.create_server(categories_file, port=0, max_wait_ms=1)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", calls
+    httpd.shutdown()
+    httpd.server_close()
+
+def post(url, payload):
+    request = urllib.request.Request(url + "/classify", data=json.dumps(payload).encode("utf-8"), method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+@pytest.mark.parametrize("payload", [
+    {"names": "abc"},
+    {"names": [None]},
+    {"names": ["清华大学", 3]},
+    {"names": [""]},
+    {"names": []},
+    {"name": None},
+    {},
+])
+def test_invalid_names_are_rejected(running_server, payload):
+    url, calls = running_server
+    status, body = post(url, payload)
+    assert status == 400, body
+    assert calls == []
+
+def test_classify_names(running_server):
+    url, calls = running_server
+    status, body = post(url, {"names": ["清华大学", "某公司", "清华大学"]})
+    assert status == 200
+    assert body["labels"] == ["教育机构", "其他", "教育机构"]
+    # 同一请求中的重复名称只分类一次
+    assert sorted(name for batch in calls for name in batch) == ["某公司", "清华大学"]
+
+def test_overload_does_not_enqueue_partial_request(categories_file):
+    store = server.TaxonomyStore(categories_file)
+    batcher = server.MicroBatcher(store, max_pending=2)
+    with pytest.raises(server.ServerOverloaded):
+        batcher.submit_many(["甲", "乙", "丙"])
+    assert batcher.pending == []
+    assert batcher.in_flight == {}
+    assert batcher.stats["rejected"] == 3
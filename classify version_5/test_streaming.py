@@ -0,0 +1,81 @@
+"""
+流式分类测试
+用桩代替流式响应，不访问网络
+"""
+
+import json
+
+import pytest
+
+from backends import ChatBackend
+from prompts import match_category_prefix
+
+NUM2NAME = {"类别1": "政府机构", "类别2": "教育机构", "类别10": "文化机构", "类别3": "其他"}
+NUM2DESC = {num: label for num, label in NUM2NAME.items()}
+
+@pytest.mark.parametrize("content, expected", [
+    ("类别", None),
+    ("类别1", None),           # 还可能是'类别10'
+    ("类别10", None),          # 编号后还没有收到字符
+    ("类别1:", "类别1"),
+    ("类别1。政府", "类别1"),
+    ("类别10:", "类别10"),
+    ("类别2", None),
+    ("类别2\n", "类别2"),
+    ("  类别3 ", "类别3"),
+    ("类别9:", None),
+    ("我认为是类别1:", None),
+])
+def test_match_category_prefix(content, expected):
+    assert match_category_prefix(content, NUM2NAME) == expected
+
+class StubStream:
+    """
+    按行产出 SSE 数据，记录读取了多少行以及是否被关闭
+    """
+    def __init__(self, deltas, usage=None):
+        chunks = [{"choices": [{"delta": {"content": delta}}]} for delta in deltas]
+        if usage is not None:
+            chunks.append({"choices": [], "usage": usage})
+        self.lines = [f"data: {json.dumps(chunk, ensure_ascii=False)}".encode("utf-8") for chunk in chunks]
+        self.lines.append(b"data: [DONE]")
+        self.read = 0
+        self.closed = False
+
+    def iter_lines(self):
+        for line in self.lines:
+            self.read += 1
+            yield line
+
+    def close(self):
+        self.closed = True
+
+class StubStreamingChat(ChatBackend):
+    def __init__(self, stream):
+        super().__init__(stream=True)
+        self.response = stream
+        self.usages = []
+        self.usage_callback = self.usages.append
+
+    def post_chat_stream(self, data):
+        assert data["stream"] is True
+        return self.response
+
+def test_stream_closes_after_complete_code():
+    stream = StubStream(["类别", "1", "0", "：文化", "场馆"], usage={"total_tokens": 99})
+    backend = StubStreamingChat(stream)
+    assert backend.classify_name("市图书馆", NUM2NAME, NUM2DESC) == "类别10"
+    # 收到'：'即可确定编号，之后的内容不再读取
+    assert stream.read == 4
+    assert stream.closed
+    assert backend.stream_stats == {"流式请求数": 1, "识别后提前关闭": 1}
+    # 提前关闭收不到 usage，按本地估算计入
+    assert backend.usages[0]["completion_tokens"] == 4
+
+def test_stream_ending_on_prefix_code_is_parsed_in_full():
+    stream = StubStream(["类别", "1"], usage={"prompt_tokens": 90, "completion_tokens": 2, "total_tokens": 92})
+    backend = StubStreamingChat(stream)
+    assert backend.classify_name("某市人民政府", NUM2NAME, NUM2DESC) == "类别1"
+    assert stream.closed
+    assert backend.stream_stats == {"流式请求数": 1, "识别后提前关闭": 0}
+    assert backend.usages == [{"prompt_tokens": 90, "completion_tokens": 2, "total_tokens": 92}]
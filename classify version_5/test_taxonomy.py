@@ -0,0 +1,106 @@
+"""
+分类版本对比与增量重分类测试
+只使用本地文件，不访问网络
+"""
+
+import json
+
+import pytest
+
+import core
+import input_cache
+from taxonomy import (
+    archive_taxonomy, diff_taxonomies, plan_reclassification, prepare_reclassification, resolve_taxonomy,
+    taxonomy_hash, versions_dir_for,
+)
+
+OLD_NUM2NAME = {"类别1": "政府机构", "类别2": "教育机构", "类别3": "卫生部门", "类别4": "企业", "类别5": "其他"}
+OLD_NUM2DESC = {
+    "类别1": "负责行政管理的各级政府部门",
+    "类别2": "各类学校和教育单位",
+    "类别3": "医院、卫生院等医疗卫生单位",
+    "类别4": "各类企业公司",
+    "类别5": "不属于以上类别的机构",
+}
+# 编号全部打乱：比较只按类别名称进行
+NEW_NUM2NAME = {"类别1": "其他", "类别2": "医疗卫生机构", "类别3": "政府机构", "类别4": "教育机构",
+                "类别5": "文化机构"}
+NEW_NUM2DESC = {
+    "类别1": "不属于以上类别的机构",
+    "类别2": "医院、卫生院等医疗卫生单位",     # 卫生部门改名，描述不变
+    "类别3": "负责行政管理的各级政府部门",
+    "类别4": "各类学校、培训和教育单位",       # 描述修改
+    "类别5": "图书馆、博物馆等文化场馆",       # 新增
+}                                          # 企业被删除
+
+@pytest.fixture
+def diff():
+    return diff_taxonomies(OLD_NUM2NAME, OLD_NUM2DESC, NEW_NUM2NAME, NEW_NUM2DESC)
+
+def test_diff_classifies_rename_and_description_change(diff):
+    assert diff["renamed"] == {"卫生部门": "医疗卫生机构"}
+    assert diff["desc_changed"] == ["教育机构"]
+    assert diff["added"] == ["文化机构"]
+    assert diff["removed"] == ["企业"]
+    assert diff["old_hash"] == taxonomy_hash(OLD_NUM2NAME, OLD_NUM2DESC)
+    assert diff["new_hash"] != diff["old_hash"]
+
+def test_dissimilar_description_is_not_a_rename():
+    new_num2name = dict(NEW_NUM2NAME, 类别2="医疗卫生机构")
+    new_num2desc = dict(NEW_NUM2DESC, 类别2="完全不同的说明文字")
+    diff = diff_taxonomies(OLD_NUM2NAME, OLD_NUM2DESC, new_num2name, new_num2desc)
+    assert diff["renamed"] == {}
+    assert "卫生部门" in diff["removed"] and "医疗卫生机构" in diff["added"]
+
+def test_identical_versions_have_no_changes():
+    diff = diff_taxonomies(OLD_NUM2NAME, OLD_NUM2DESC, dict(OLD_NUM2NAME), dict(OLD_NUM2DESC))
+    assert not (diff["added"] or diff["removed"] or diff["renamed"] or diff["desc_changed"])
+    assert diff["old_hash"] == diff["new_hash"]
+
+def test_plan_keeps_unaffected_names(diff):
+    names = ["北京市人民政府", "北京市人民政府", "某人民医院", "清华大学", "某有限公司", "某协会", "", "市图书馆",
+             "某文化传播中心"]
+    labels = ["政府机构", "政府机构", "卫生部门", "教育机构", "企业", "其他", None, "政府机构", "政府机构"]
+    kept, resend, reasons = plan_reclassification(names, labels, NEW_NUM2NAME, diff)
+    # 改名的类别换成新名称沿用；重复名称只判断一次
+    assert kept == {"北京市人民政府": "政府机构", "某人民医院": "医疗卫生机构"}
+    assert resend == ["清华大学", "某有限公司", "某协会", "", "市图书馆", "某文化传播中心"]
+    assert reasons == {
+        "原类别已删除或修改": 2,       # 教育机构描述修改、企业被删除
+        "原为其他": 1,
+        "无历史结果": 1,
+        "可能归入新增类别": 2,         # 图书馆命中新增类别的后缀规则，"文化"是新增类别的关键词
+    }
+
+def test_plan_without_changes_keeps_other():
+    diff = diff_taxonomies(OLD_NUM2NAME, OLD_NUM2DESC, OLD_NUM2NAME, OLD_NUM2DESC)
+    kept, resend, _ = plan_reclassification(["某协会", "某有限公司"], ["其他", "企业"], OLD_NUM2NAME, diff)
+    assert kept == {"某协会": "其他", "某有限公司": "企业"}
+    assert resend == []
+
+def test_prepare_reclassification_fills_cache(tmp_path):
+    old_file, categories_file = tmp_path / "old.json", tmp_path / "categories.json"
+    old_file.write_text(json.dumps({"num2name": OLD_NUM2NAME, "num2desc": OLD_NUM2DESC}, ensure_ascii=False),
+                        encoding="utf-8")
+    previous_hash = archive_taxonomy(OLD_NUM2NAME, OLD_NUM2DESC, versions_dir_for(str(categories_file)))
+    categories_file.write_text(json.dumps({"num2name": NEW_NUM2NAME, "num2desc": NEW_NUM2DESC,
+                                           "previous_hash": previous_hash}, ensure_ascii=False), encoding="utf-8")
+    previous_output = tmp_path / "previous.csv"
+    previous_output.write_text("Purchaser_Name,Classification\n北京市人民政府,政府机构\n清华大学,教育机构\n",
+                               encoding="utf-8")
+    # 按指纹前缀也能找到归档的旧版本
+    assert resolve_taxonomy(previous_hash[:8], versions_dir_for(str(categories_file))) == (OLD_NUM2NAME, OLD_NUM2DESC)
+
+    previous_cache_dir = input_cache.cache_dir
+    input_cache.set_cache_dir(None)
+    core.result_cache.clear()
+    try:
+        summary = prepare_reclassification(NEW_NUM2NAME, NEW_NUM2DESC, str(previous_output), str(categories_file))
+        new_key = taxonomy_hash(NEW_NUM2NAME, NEW_NUM2DESC)
+        assert core.lookup_cache(new_key, "北京市人民政府") == "政府机构"
+        assert core.lookup_cache(new_key, "清华大学") is None
+    finally:
+        input_cache.set_cache_dir(previous_cache_dir)
+        core.result_cache.clear()
+    assert summary["沿用结果数"] == 1
+    assert summary["需重新分类数"] == 1
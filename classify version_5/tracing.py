@@ -0,0 +1,286 @@
+"""
+阶段级耗时追踪与性能分析
+- span("阶段名")：记录一段代码的起止时间，导出为 Chrome trace / Perfetto 可读的JSON
+  （chrome://tracing 或 https://ui.perfetto.dev 打开）
+- 单个请求拆分为：任务排队（queue_wait）、后端池锁等待（pool.lock_wait）、限速等待（pool.slot_wait）、
+  建立连接（http.connect）、首字节（http.ttfb）、读取响应体（http.body）、解析（parse）；
+  流式请求另记从发起分类到识别出类别编号的耗时（time_to_label）
+- LatencyRecorder：按名称保留最近的耗时样本并计算分位数（实时服务的接口延迟、逐条分类的出类别耗时）
+- --profile cprofile：用 cProfile 包裹整次运行，输出 .prof 文件并打印耗时最多的函数（只统计主线程）
+- --profile sampling：后台线程定期采样所有线程（含分类工作线程）的调用栈，输出 flamegraph 可用的折叠栈文件
+
+未启用时 span() 只做一次全局变量判断并返回共享的空上下文，几乎没有开销。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+_tracer = None
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    def __init__(self):
+        self.events = []
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.thread_names = {}
+
+    def add(self, name, start, end, args=None):
+        """
+        记录一段已结束的区间（start/end 为 time.perf_counter() 读数）
+        """
+        thread = threading.current_thread()
+        self.thread_names.setdefault(thread.ident, thread.name)
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": self.pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        # list.append 在GIL下是原子操作，多线程记录无需加锁
+        self.events.append(event)
+
+    def export(self, filename):
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self.thread_names.items()
+        ]
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    def summary(self):
+        """
+        按名称汇总：次数、总耗时、平均耗时
+        """
+        totals = {}
+        for event in self.events:
+            count, total = totals.get(event["name"], (0, 0.0))
+            totals[event["name"]] = (count + 1, total + event["dur"] / 1e6)
+        return {
+            name: {"次数": count, "总耗时(秒)": round(total, 3), "平均(毫秒)": round(total / count * 1000, 3)}
+            for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1])
+        }
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        self.tracer.add(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+def enabled():
+    return _tracer is not None
+
+def span(name, **args):
+    """
+    with span("load_input"): ...   未启用追踪时返回空上下文
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _Span(_tracer, name, args)
+
+def add_span(name, start, end, **args):
+    """
+    记录已测得的区间（用于起止点不在同一代码块中的阶段，如任务排队）
+    """
+    if _tracer is not None:
+        _tracer.add(name, start, end, args)
+
+def _instrument_connections():
+    """
+    包裹 urllib3 的建立连接方法，记录 http.connect（只在启用追踪时安装）
+    """
+    try:
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+    except ImportError:
+        return
+    for cls in (HTTPConnection, HTTPSConnection):
+        original = cls.connect
+        if getattr(original, "_traced", False):
+            continue
+
+        def connect(self, _original=original):
+            with span("http.connect", host=getattr(self, "host", None)):
+                return _original(self)
+        connect._traced = True
+        cls.connect = connect
+
+def enable_tracing():
+    global _tracer
+    _tracer = Tracer()
+    _instrument_connections()
+    return _tracer
+
+def disable_tracing():
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+class SamplingProfiler:
+    """
+    纯Python采样分析器：每隔 interval 秒记录所有线程的调用栈，统计相同调用栈出现的次数
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def export(self, filename):
+        """
+        折叠栈格式（每行"调用栈 次数"），可用 flamegraph.pl 或 speedscope 查看
+        """
+        with open(filename, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+    def print_top(self, limit=15):
+        leaf_counts = {}
+        for stack, count in self.counts.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            leaf_counts[leaf] = leaf_counts.get(leaf, 0) + count
+        total = sum(leaf_counts.values()) or 1
+        print(f"\n🔬 采样分析：共 {self.samples} 次采样，占用最多的位置:")
+        for leaf, count in sorted(leaf_counts.items(), key=lambda item: -item[1])[:limit]:
+            print(f"   {count / total:6.1%}  {leaf}")
+
+class LatencyRecorder:
+    """
+    按接口记录最近的请求耗时，并计算分位数
+    """
+    def __init__(self, window=10000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.counts = {}
+
+    def record(self, endpoint, seconds):
+        with self.lock:
+            self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def summary(self):
+        with self.lock:
+            snapshot = {endpoint: sorted(values) for endpoint, values in self.samples.items()}
+            counts = dict(self.counts)
+        report = {}
+        for endpoint, values in snapshot.items():
+            def percentile(p):
+                return round(values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000, 2)
+            report[endpoint] = {
+                "请求数": counts[endpoint],
+                "p50(ms)": percentile(50),
+                "p90(ms)": percentile(90),
+                "p99(ms)": percentile(99),
+                "max(ms)": round(values[-1] * 1000, 2),
+            }
+        return report
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+def add_arguments(parser):
+    """
+    为命令行添加 --trace / --profile / --profile-output 参数
+    """
+    parser.add_argument("--trace", help="记录各阶段耗时并导出为 Chrome trace / Perfetto JSON 文件")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="用 cProfile 或采样分析器包裹整次运行")
+    parser.add_argument("--profile-output", help="分析结果文件（默认 profile.prof 或 profile.folded）")
+
+def print_trace_summary(tracer, limit=15):
+    print(f"\n⏱️ 各阶段耗时:")
+    for name, stats in list(tracer.summary().items())[:limit]:
+        details = ", ".join(f"{k}: {v}" for k, v in stats.items())
+        print(f"   {name} - {details}")
+
+def run_instrumented(func, args):
+    """
+    按 args.trace / args.profile 启用追踪和性能分析后执行 func(args)，结束时导出结果
+    """
+    trace_file = getattr(args, "trace", None)
+    profile_mode = getattr(args, "profile", None)
+    if not trace_file and not profile_mode:
+        return func(args)
+
+    tracer = enable_tracing() if trace_file else None
+    profiler = None
+    if profile_mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile_mode == "sampling":
+        profiler = SamplingProfiler()
+        profiler.start()
+    try:
+        with span("run"):
+            return func(args)
+    finally:
+        if profile_mode == "cprofile":
+            import pstats
+            profiler.disable()
+            output = args.profile_output or "profile.prof"
+            profiler.dump_stats(output)
+            print(f"\n🔬 cProfile 结果已保存到 {output}（python -m pstats {output} 或 snakeviz 查看）")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+        elif profile_mode == "sampling":
+            profiler.stop()
+            output = args.profile_output or "profile.folded"
+            profiler.export(output)
+            profiler.print_top()
+            print(f"🔬 折叠调用栈已保存到 {output}（可用 speedscope 或 flamegraph.pl 查看）")
+        if tracer is not None:
+            disable_tracing()
+            tracer.export(trace_file)
+            print_trace_summary(tracer)
+            print(f"📈 追踪结果已保存到 {trace_file}（chrome://tracing 或 ui.perfetto.dev 打开）")
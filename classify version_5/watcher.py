@@ -0,0 +1,229 @@
+"""
+监听文件夹的增量分类守护进程
+每天导出的招投标文件放入同一目录，内容与之前的文件大量重叠。守护进程常驻运行：
+- 定时扫描目录，按 (修改时间, 大小) 和内容指纹识别新增或修改过的文件，写入中的文件等稳定后再处理
+- 每行按名称在当前分类体系下的结果缓存中查找，只有从未分类过的名称才请求API
+- 每个文件单独写出结果，index.json 汇总全部文件的状态、增量行数和类别分布
+- 处理失败的文件记录修改时间和大小，文件改动（或分类更新）之前不再重试
+- 分类文件更新后自动换用新分类，旧分类下处理过的文件会重新输出
+- 进程、HTTP会话、请求频率控制和结果缓存始终复用，不必每个文件冷启动一次 classify.py
+
+用法：python watcher.py 导出目录 --categories categories.json --output-dir 导出目录/classified
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+import core
+import rate_limiter
+from core import load_result_cache, save_result_cache, run_stats, set_api_pool, set_backend
+from api_pool import load_backend_pool
+from backends import BACKEND_KINDS, DEFAULT_LOCAL_URL, create_backend
+from budget import BudgetExceeded
+from rules import build_rule_table
+from labels import count_labels
+from input_cache import set_cache_dir as set_input_cache_dir
+from server import TaxonomyStore
+
+INPUT_EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.csv', '.tsv', '.txt', '.jsonl', '.ndjson', '.parquet', '.pq')
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """
+    文件内容指纹（分块读取，大文件也不会整体读入内存）
+    """
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FolderWatcher:
+    def __init__(self, watch_dir, store, output_dir=None, cache_file=None, index_file=None,
+                 column="Purchaser_Name", id_column=None, output_format=None, excel_split="sheets",
+                 use_rules=False, settle_seconds=5.0):
+        self.watch_dir = watch_dir
+        self.store = store
+        self.output_dir = output_dir or os.path.join(watch_dir, "classified")
+        self.cache_file = cache_file or os.path.join(self.output_dir, "label_cache.json")
+        self.index_file = index_file or os.path.join(self.output_dir, "index.json")
+        self.column = column
+        self.id_column = id_column
+        self.output_format = output_format
+        self.excel_split = excel_split
+        self.use_rules = use_rules
+        self.settle_seconds = settle_seconds
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.index = self._load_index()
+        loaded = load_result_cache(self.cache_file)
+        print(f"💾 已加载 {loaded} 条历史分类缓存，索引中已有 {len(self.index['files'])} 个文件")
+
+    def _load_index(self):
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"files": {}}
+
+    def _save_index(self):
+        self.index["更新时间"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.index["汇总"] = self.summary()
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.index_file)
+
+    def _save_cache(self):
+        tmp_file = self.cache_file + ".tmp"
+        save_result_cache(tmp_file)
+        os.replace(tmp_file, self.cache_file)
+
+    def scan(self):
+        """
+        返回需要处理的文件：新增、内容变化，或上次处理时使用的是旧分类
+        上次处理失败的文件在内容变化前跳过，不在每轮扫描中反复失败
+        """
+        taxonomy_key = self.store.snapshot()[0]
+        now = time.time()
+        seen, pending = set(), []
+        for entry in sorted(os.scandir(self.watch_dir), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith(INPUT_EXTENSIONS):
+                continue
+            # 跳过Excel临时文件、隐藏文件和本程序写出的结果文件
+            if entry.name.startswith(("~$", ".")) or os.path.splitext(entry.name)[0].endswith("_classified"):
+                continue
+            seen.add(entry.path)
+            stat = entry.stat()
+            if now - stat.st_mtime < self.settle_seconds:
+                continue  # 可能仍在写入，下一轮再处理
+            record = self.index["files"].get(entry.path)
+            if record and record.get("taxonomy") == taxonomy_key:
+                if (record["mtime"], record["size"]) == (stat.st_mtime, stat.st_size):
+                    continue
+                fingerprint = file_fingerprint(entry.path)
+                if fingerprint == record["fingerprint"]:
+                    # 只是被重新保存，内容未变
+                    record["mtime"], record["size"] = stat.st_mtime, stat.st_size
+                    continue
+            pending.append((entry.path, stat))
+        # 已从目录中删除的文件不再保留在索引里
+        for path in list(self.index["files"]):
+            if path not in seen:
+                del self.index["files"][path]
+        return pending
+
+    def process(self, path, stat):
+        from batch import classify_file
+
+        taxonomy_key, num2name, num2desc = self.store.snapshot()
+        rule_table = build_rule_table(num2name) if self.use_rules else None
+        record = {
+            "fingerprint": file_fingerprint(path),
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "taxonomy": taxonomy_key,
+            "处理时间": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        try:
+            entry, classifications = classify_file(path, num2name, num2desc, self.output_dir, self.column,
+                                                   self.output_format, self.excel_split, self.id_column, rule_table)
+            # 复用行只统计本次运行前已有结果的名称，文件内重复的新名称计入新分类
+            record.update(entry)
+            record["类别分布"] = dict(Counter(count_labels(classifications)).most_common())
+            print(f"♻️ 复用 {record['复用结果行数']} 行，新分类 {record['新增分类行数']} 行")
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            print(f"❌ 处理文件 {path} 失败（文件修改后重试）: {e}")
+            record["状态"] = f"失败: {e}"
+        self.index["files"][path] = record
+        self._save_cache()
+        self._save_index()
+
+    def run_once(self):
+        pending = self.scan()
+        for path, stat in pending:
+            self.process(path, stat)
+        if not pending:
+            self._save_index()
+        return len(pending)
+
+    def run_forever(self, interval=30.0):
+        print(f"👀 正在监听 {self.watch_dir}（每 {interval:g} 秒扫描一次，Ctrl+C 退出）")
+        while True:
+            processed = self.run_once()
+            if processed:
+                print(f"✅ 本轮处理 {processed} 个文件，索引已更新: {self.index_file}")
+            time.sleep(interval)
+
+    def summary(self):
+        records = self.index["files"].values()
+        label_counts = Counter()
+        for record in records:
+            label_counts.update(record.get("类别分布", {}))
+        return {
+            "文件数": len(self.index["files"]),
+            "成功文件数": sum(1 for record in records if record.get("状态") == "成功"),
+            "失败文件数": sum(1 for record in records if record.get("状态", "").startswith("失败")),
+            "总数据量": sum(record.get("数据量", 0) for record in records),
+            "复用结果行数": sum(record.get("复用结果行数", 0) for record in records),
+            "新增分类行数": sum(record.get("新增分类行数", 0) for record in records),
+            "本进程API请求数": run_stats["api_requests"],
+            "本进程API请求次数(含重试)": run_stats["api_calls"],
+            "类别分布": dict(label_counts.most_common()),
+        }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="招投标机构分类系统 - 监听文件夹增量分类")
+    parser.add_argument("watch_dir", help="监听的导出目录")
+    parser.add_argument("--categories", default="categories.json", help="分类文件路径（修改后自动热加载）")
+    parser.add_argument("--output-dir", help="输出目录（默认为 <监听目录>/classified）")
+    parser.add_argument("--cache-file", help="结果缓存文件（默认为 <输出目录>/label_cache.json）")
+    parser.add_argument("--index", help="汇总索引文件（默认为 <输出目录>/index.json）")
+    parser.add_argument("--column", default="Purchaser_Name", help="采购方名称所在列")
+    parser.add_argument("--id-column", help="可选的ID列，与名称列一起读取并写入输出")
+    parser.add_argument("--output-format", choices=["xlsx", "csv", "jsonl", "parquet"],
+                        help="输出格式（默认与输入文件相同）")
+    parser.add_argument("--excel-split", choices=["sheets", "files"], default="sheets")
+    parser.add_argument("--rules", action="store_true", help="命中本地后缀规则的名称不再请求API")
+    parser.add_argument("--interval", type=float, default=30.0, help="扫描间隔（秒）")
+    parser.add_argument("--settle", type=float, default=5.0, help="文件修改后至少等待多少秒再处理（避免读到写了一半的文件）")
+    parser.add_argument("--once", action="store_true", help="只扫描处理一轮后退出")
+    parser.add_argument("--backend", choices=BACKEND_KINDS, default="remote")
+    parser.add_argument("--local-url", default=DEFAULT_LOCAL_URL, help="本地推理服务地址")
+    parser.add_argument("--local-model", default="local", help="本地推理服务的模型名")
+    parser.add_argument("--backends", help="多后端配置文件（JSON）")
+    rate_limiter.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 每天的新文件一般只读取一次，不需要输入列式缓存
+    set_input_cache_dir(None)
+    rate_limiter.configure(args)
+    if args.backends:
+        set_api_pool(load_backend_pool(args.backends, core.REQUEST_INTERVAL))
+    if args.backend != "remote":
+        set_backend(create_backend(args.backend, core.api_pool, local_url=args.local_url, local_model=args.local_model))
+    watcher = FolderWatcher(args.watch_dir, TaxonomyStore(args.categories), args.output_dir, args.cache_file,
+                            args.index, args.column, args.id_column, args.output_format, args.excel_split,
+                            args.rules, args.settle)
+    try:
+        if args.once:
+            watcher.run_once()
+        else:
+            watcher.run_forever(args.interval)
+    except BudgetExceeded as e:
+        print(f"\n⛔ {e}")
+    except KeyboardInterrupt:
+        print("\n👋 已停止监听")
+    finally:
+        watcher._save_cache()
+        watcher._save_index()
+    summary = watcher.summary()
+    print(f"📊 累计 {summary['文件数']} 个文件，复用 {summary['复用结果行数']} 行，新分类 {summary['新增分类行数']} 行")
+
+if __name__ == "__main__":
+    main()